@@ -272,7 +272,11 @@ def add_vehicle_page():
                     st.error("Por favor, complete todos los campos obligatorios.")
                 else:
                     # Procesar archivos PDF si los hay
-                    pdf_files_json = db.process_pdf_files(uploaded_files) if uploaded_files else None
+                    try:
+                        pdf_files_json = db.process_pdf_files(uploaded_files) if uploaded_files else None
+                    except Exception as e:
+                        st.error(f"Error al guardar los archivos PDF: {e}")
+                        st.stop()
                     
                     result = db.add_vehicle(
                         patente, area, tipo, marca, modelo, año, estado, 
@@ -426,7 +430,11 @@ def edit_vehicle_page():
                     # Procesar archivos PDF si los hay
                     pdf_files_json = None
                     if uploaded_files:
-                        pdf_files_json = db.process_pdf_files(uploaded_files)
+                        try:
+                            pdf_files_json = db.process_pdf_files(uploaded_files)
+                        except Exception as e:
+                            st.error(f"Error al guardar los archivos PDF: {e}")
+                            st.stop()
                     
                     updated_fields = {
                         'area': area,
@@ -494,7 +502,7 @@ def add_service_page():
         patente = st.selectbox("Seleccionar vehículo:", [""] + patentes)
     
     if patente:
-        vehicle = db.get_vehicle_by_patente(patente)
+        vehicle = db.get_vehicle_by_patente(patente, columns=('marca', 'modelo', 'año', 'km'))
         if vehicle:
             st.subheader(f"Registrando Service para: {patente}")
             st.write(f"**Vehículo:** {vehicle['marca']} {vehicle['modelo']} ({vehicle['año']})")
@@ -527,7 +535,11 @@ def add_service_page():
                         st.error("Por favor, complete todos los campos obligatorios.")
                     else:
                         # Procesar archivos PDF si los hay
-                        pdf_files_json = db.process_pdf_files(uploaded_files) if uploaded_files else None
+                        try:
+                            pdf_files_json = db.process_pdf_files(uploaded_files) if uploaded_files else None
+                        except Exception as e:
+                            st.error(f"Error al guardar los archivos PDF: {e}")
+                            st.stop()
                         
                         result = db.add_service_record(
                             patente, fecha_str, km, tipo_service, taller, costo, descripcion, pdf_files_json
@@ -627,7 +639,7 @@ def add_incident_page():
     patente = st.selectbox("Seleccionar vehículo:", [""] + patentes)
     
     if patente:
-        vehicle = db.get_vehicle_by_patente(patente)
+        vehicle = db.get_vehicle_by_patente(patente, columns=('marca', 'modelo', 'año'))
         if vehicle:
             st.subheader(f"Registrando Incidente para: {patente}")
             st.write(f"**Vehículo:** {vehicle['marca']} {vehicle['modelo']} ({vehicle['año']})")
@@ -655,7 +667,11 @@ def add_incident_page():
                         st.error("Por favor, complete todos los campos.")
                     else:
                         # Procesar archivos PDF si los hay
-                        pdf_files_json = db.process_pdf_files(uploaded_files) if uploaded_files else None
+                        try:
+                            pdf_files_json = db.process_pdf_files(uploaded_files) if uploaded_files else None
+                        except Exception as e:
+                            st.error(f"Error al guardar los archivos PDF: {e}")
+                            st.stop()
                         
                         result = db.add_incident(
                             patente, fecha_str, tipo, descripcion, estado, pdf_files_json
@@ -755,6 +771,14 @@ def view_incidents_page():
         else:
             st.info("No hay incidentes registrados.")
 
+def _dias_restantes(vencimientos):
+    """Días de calendario hasta cada vencimiento, contados desde la medianoche de hoy.
+
+    Con la hora actual (como antes) un vencimiento de mañana figuraba a 0 días y uno de
+    hoy a -1; contando desde la medianoche son 1 y 0.
+    """
+    return (pd.to_datetime(vencimientos) - pd.Timestamp.today().normalize()).dt.days
+
 def fleet_stats_page():
     st.title("Estadísticas de Flota")
     
@@ -1081,7 +1105,7 @@ def fleet_stats_page():
             if vtv_proximos is not None and not vtv_proximos.empty:
                 # Formatear los datos para mejor visualización
                 display_df = vtv_proximos[['patente', 'marca', 'modelo', 'area', 'vtv_vencimiento']].copy()
-                display_df['días_restantes'] = (pd.to_datetime(display_df['vtv_vencimiento']) - pd.to_datetime('today')).dt.days
+                display_df['días_restantes'] = _dias_restantes(display_df['vtv_vencimiento'])
                 display_df = display_df.sort_values('días_restantes')
                 
                 # Mostrar con colorización por cercanía a la fecha de vencimiento
@@ -1134,6 +1158,243 @@ def fleet_stats_page():
     except Exception as e:
         st.error(f"Error al cargar las estadísticas: {str(e)}")
 
+# Las secciones de recordatorios se definen como fragmentos: cada una solo se
+# vuelve a ejecutar ante la interacción con sus propios widgets, evitando que
+# agregar/eliminar un correo vuelva a consultar las tablas de vista previa.
+@st.fragment
+def email_recipients_fragment():
+    # Configuración de correos electrónicos para notificaciones
+    # Diccionario {correo normalizado: correo ingresado}; conserva el orden de alta
+    if 'email_recipients' not in st.session_state:
+        st.session_state.email_recipients = {}
+    recipients = st.session_state.email_recipients
+    
+    # Mostrar los correos electrónicos actuales
+    if recipients:
+        st.write("Correos electrónicos configurados:")
+        for i, (key, email) in enumerate(recipients.items()):
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.text(email)
+            with col2:
+                if st.button("Eliminar", key=f"delete_email_{i}"):
+                    del recipients[key]
+                    st.rerun(scope="fragment")
+    
+    # Agregar nuevo correo electrónico
+    with st.form("email_form"):
+        new_email = st.text_input("Agregar correo electrónico:")
+        submitted = st.form_submit_button("Agregar")
+        
+        if submitted and new_email:
+            key = new_email.strip().lower()
+            if key in recipients:
+                st.warning(f"El correo {new_email} ya está en la lista.")
+            else:
+                recipients[key] = new_email.strip()
+                st.success(f"Correo {new_email} agregado correctamente.")
+                st.rerun(scope="fragment")
+
+# Cantidad de recordatorios enviados que se marcan juntos en la base
+REMINDER_MARK_BATCH = 10
+
+@st.fragment
+def maintenance_reminders_fragment(email_configured):
+    if st.button("Recordatorios de Mantenimiento", use_container_width=True):
+        if not st.session_state.email_recipients:
+            st.warning("No ha configurado ningún correo electrónico para notificaciones.")
+        elif not email_configured:
+            st.error("No se pueden enviar correos sin configurar las credenciales SMTP primero.")
+        else:
+            # Recorrer los recordatorios pendientes a medida que se leen de la base
+            total = 0
+            email_sent = 0
+            email_failed = 0
+            sent_ids = []
+            mark_failed = False
+
+            try:
+                for reminder in db.iter_maintenance_reminders():
+                    total += 1
+                    patente = reminder['patente']
+
+                    # Construir asunto
+                    asunto = f"RECORDATORIO: Mantenimiento programado para vehículo {patente}"
+
+                    # Construir cuerpo del mensaje HTML
+                    mensaje = f"""
+                    <html>
+                    <body>
+                    <h2>Recordatorio de Mantenimiento</h2>
+                    <p>El vehículo <strong>{patente}</strong> ({reminder['marca']} {reminder['modelo']}) tiene mantenimiento programado.</p>
+
+                    <h3>Detalles:</h3>
+                    <ul>
+                    """
+
+                    # Agregar detalles según el tipo de recordatorio (fecha o km)
+                    if pd.notna(reminder['fecha_programada']):
+                        mensaje += f"<li>Tiene programado un service de tipo <strong>'{reminder['tipo_service']}'</strong> para el <strong>{reminder['fecha_programada']}</strong></li>"
+
+                    if pd.notna(reminder['km_programado']) and reminder['km_programado'] > 0:
+                        mensaje += f"<li>Debe realizarse un service al alcanzar <strong>{reminder['km_programado']} km</strong>. Actualmente: {reminder['km_actual']} km</li>"
+
+                    # Agregar área del vehículo si está disponible
+                    if reminder['area']:
+                        mensaje += f"<li>Área asignada: <strong>{reminder['area']}</strong></li>"
+
+                    # Agregar descripción si existe
+                    if pd.notna(reminder['descripcion']) and reminder['descripcion']:
+                        mensaje += f"<li>Detalles adicionales: {reminder['descripcion']}</li>"
+
+                    mensaje += """
+                    </ul>
+                    <p>Este es un mensaje automático del Sistema de Gestión de Flota Vehicular.</p>
+                    </body>
+                    </html>
+                    """
+
+                    # Enviar el correo a cada destinatario
+                    enviado = False
+                    for email in st.session_state.email_recipients.values():
+                        if db.send_email_notification(email, asunto, mensaje):
+                            email_sent += 1
+                            enviado = True
+                        else:
+                            email_failed += 1
+
+                    # Marcar el recordatorio como enviado solo si llegó al menos a un destinatario
+                    if enviado:
+                        sent_ids.append(reminder['id'])
+
+                    # Marcar por tandas: si el envío se interrumpe no se reenvía lo ya entregado
+                    if len(sent_ids) >= REMINDER_MARK_BATCH:
+                        if not db.bulk_mark_reminders_sent(sent_ids):
+                            mark_failed = True
+                        sent_ids.clear()
+            finally:
+                # Marcar lo que quedó pendiente, también si hubo una excepción o un rerun
+                if sent_ids and not db.bulk_mark_reminders_sent(sent_ids):
+                    mark_failed = True
+            
+            if mark_failed:
+                st.warning("No se pudieron marcar algunos recordatorios como enviados; podrían volver a enviarse.")
+            
+            if total == 0:
+                st.info("No hay recordatorios de mantenimiento pendientes para procesar.")
+            else:
+                # Mostrar resultados
+                st.success(f"Se procesaron {total} recordatorios pendientes.")
+                
+                if email_sent > 0:
+                    st.success(f"Se enviaron {email_sent} correos electrónicos correctamente.")
+                if email_failed > 0:
+                    st.warning(f"No se pudieron enviar {email_failed} correos. Verifique la configuración.")
+
+@st.fragment
+def vtv_alerts_fragment(email_configured):
+    if st.button("Verificar Vencimientos VTV", use_container_width=True):
+        if not st.session_state.email_recipients:
+            st.warning("No ha configurado ningún correo electrónico para notificaciones.")
+        elif not email_configured:
+            st.error("No se pueden enviar correos sin configurar las credenciales SMTP primero.")
+        else:
+            # Verificar vehículos con VTV próxima a vencer
+            vtv_df = db.get_vtv_proximos_vencer(dias=30)
+            
+            if vtv_df.empty:
+                st.info("No hay vehículos con VTV próxima a vencer en los próximos 30 días.")
+            else:
+                email_sent = 0
+                email_failed = 0
+                
+                # Construir asunto
+                asunto = f"ALERTA: Vehículos con VTV próxima a vencer"
+                
+                # Construir cuerpo del mensaje HTML
+                mensaje = f"""
+                <html>
+                <body>
+                <h2>Alerta de VTV próxima a vencer</h2>
+                <p>Los siguientes vehículos tienen la VTV próxima a vencer en los próximos 30 días:</p>
+                
+                <table border="1" cellpadding="5" cellspacing="0">
+                    <tr style="background-color:#f0f0f0">
+                        <th>Patente</th>
+                        <th>Marca</th>
+                        <th>Modelo</th>
+                        <th>Área</th>
+                        <th>Vencimiento VTV</th>
+                    </tr>
+                """
+                
+                # Calcular días restantes para colorizar (una sola conversión de la columna)
+                vtv_display = vtv_df[['patente', 'marca', 'modelo', 'area', 'vtv_vencimiento']].copy()
+                vtv_display['dias_restantes'] = _dias_restantes(vtv_display['vtv_vencimiento'])
+                for _, row in vtv_display.iterrows():
+                    dias_restantes = row['dias_restantes']
+                    bg_color = "#ffcccc" if dias_restantes < 7 else "#ffffff"
+                    
+                    mensaje += f"""
+                    <tr style="background-color:{bg_color}">
+                        <td>{row['patente']}</td>
+                        <td>{row['marca']}</td>
+                        <td>{row['modelo']}</td>
+                        <td>{row['area']}</td>
+                        <td>{row['vtv_vencimiento']} ({dias_restantes} días)</td>
+                    </tr>
+                    """
+                
+                mensaje += """
+                </table>
+                <p>Este es un mensaje automático del Sistema de Gestión de Flota Vehicular.</p>
+                </body>
+                </html>
+                """
+                
+                # Enviar el correo a cada destinatario
+                for email in st.session_state.email_recipients.values():
+                    if db.send_email_notification(email, asunto, mensaje):
+                        email_sent += 1
+                    else:
+                        email_failed += 1
+                
+                # Mostrar resultados
+                if email_sent > 0:
+                    st.success(f"Se enviaron {email_sent} alertas de VTV por correo electrónico.")
+                if email_failed > 0:
+                    st.warning(f"No se pudieron enviar {email_failed} correos. Verifique la configuración.")
+
+@st.fragment
+def upcoming_reminders_fragment():
+    # Sección para ver y configurar próximos recordatorios
+    st.subheader("Próximos Recordatorios")
+    
+    # Mostrar próximos mantenimientos programados
+    prox_mant = db.get_maintenance_schedules(estado="PENDIENTE", proximos_dias=30)
+    if not prox_mant.empty:
+        st.write("Mantenimientos programados para los próximos 30 días:")
+        display_mant = prox_mant[['patente', 'marca', 'modelo', 'fecha_programada', 'tipo_service']].copy()
+        st.dataframe(display_mant, use_container_width=True)
+        
+        if st.button("Ver todos los mantenimientos"):
+            st.session_state.page = 'view_schedules'
+            st.rerun()
+    else:
+        st.info("No hay mantenimientos programados para los próximos 30 días.")
+    
+    # Mostrar próximos vencimientos de VTV
+    vtv_proximos = db.get_vtv_proximos_vencer(30)
+    if not vtv_proximos.empty:
+        st.write("Vehículos con VTV próxima a vencer:")
+        display_vtv = vtv_proximos[['patente', 'marca', 'modelo', 'area', 'vtv_vencimiento']].copy()
+        display_vtv['días_restantes'] = _dias_restantes(display_vtv['vtv_vencimiento'])
+        display_vtv = display_vtv.sort_values('días_restantes')
+        
+        st.dataframe(display_vtv, use_container_width=True)
+    else:
+        st.info("No hay vehículos con VTV próxima a vencer en los próximos 30 días.")
+
 def admin_settings_page():
     st.title("Configuración del Sistema")
     
@@ -1222,35 +1483,8 @@ def admin_settings_page():
             st.warning("La funcionalidad de recordatorios por correo electrónico requiere configurar las credenciales SMTP.")
             st.info("Para enviar correos, necesita agregar las siguientes variables de entorno: EMAIL_HOST, EMAIL_PORT, EMAIL_USER, EMAIL_PASSWORD")
         
-        # Configuración de correos electrónicos para notificaciones
         try:
-            if 'email_recipients' not in st.session_state:
-                st.session_state.email_recipients = []
-            
-            # Mostrar los correos electrónicos actuales
-            if st.session_state.email_recipients:
-                st.write("Correos electrónicos configurados:")
-                for i, email in enumerate(st.session_state.email_recipients):
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        st.text(email)
-                    with col2:
-                        if st.button("Eliminar", key=f"delete_email_{i}"):
-                            st.session_state.email_recipients.pop(i)
-                            st.rerun()
-            
-            # Agregar nuevo correo electrónico
-            with st.form("email_form"):
-                new_email = st.text_input("Agregar correo electrónico:")
-                submitted = st.form_submit_button("Agregar")
-                
-                if submitted and new_email:
-                    if new_email in st.session_state.email_recipients:
-                        st.warning(f"El correo {new_email} ya está en la lista.")
-                    else:
-                        st.session_state.email_recipients.append(new_email)
-                        st.success(f"Correo {new_email} agregado correctamente.")
-                        st.rerun()
+            email_recipients_fragment()
             
             # Separador
             st.markdown("---")
@@ -1260,185 +1494,15 @@ def admin_settings_page():
             
             col1, col2 = st.columns(2)
             with col1:
-                if st.button("Recordatorios de Mantenimiento", use_container_width=True):
-                    if not st.session_state.email_recipients:
-                        st.warning("No ha configurado ningún correo electrónico para notificaciones.")
-                    elif not email_configured:
-                        st.error("No se pueden enviar correos sin configurar las credenciales SMTP primero.")
-                    else:
-                        # Obtener recordatorios pendientes
-                        reminders_df = db.get_maintenance_reminders()
-                        
-                        if reminders_df.empty:
-                            st.info("No hay recordatorios de mantenimiento pendientes para procesar.")
-                        else:
-                            total = len(reminders_df)
-                            email_sent = 0
-                            email_failed = 0
-                            
-                            for _, reminder in reminders_df.iterrows():
-                                # Marcar el recordatorio como enviado
-                                db.update_maintenance_schedule(
-                                    reminder['id'],
-                                    recordatorio_enviado=True
-                                )
-                                
-                                patente = reminder['patente']
-                                vehicle = db.get_vehicle_by_patente(patente)
-                                
-                                # Construir asunto
-                                asunto = f"RECORDATORIO: Mantenimiento programado para vehículo {patente}"
-                                
-                                # Construir cuerpo del mensaje HTML
-                                mensaje = f"""
-                                <html>
-                                <body>
-                                <h2>Recordatorio de Mantenimiento</h2>
-                                <p>El vehículo <strong>{patente}</strong> ({reminder['marca']} {reminder['modelo']}) tiene mantenimiento programado.</p>
-                                
-                                <h3>Detalles:</h3>
-                                <ul>
-                                """
-                                
-                                # Agregar detalles según el tipo de recordatorio (fecha o km)
-                                if pd.notna(reminder['fecha_programada']):
-                                    mensaje += f"<li>Tiene programado un service de tipo <strong>'{reminder['tipo_service']}'</strong> para el <strong>{reminder['fecha_programada']}</strong></li>"
-                                
-                                if pd.notna(reminder['km_programado']) and reminder['km_programado'] > 0:
-                                    mensaje += f"<li>Debe realizarse un service al alcanzar <strong>{reminder['km_programado']} km</strong>. Actualmente: {reminder['km_actual']} km</li>"
-                                
-                                # Agregar área del vehículo si está disponible
-                                if vehicle and 'area' in vehicle and vehicle['area']:
-                                    mensaje += f"<li>Área asignada: <strong>{vehicle['area']}</strong></li>"
-                                    
-                                # Agregar descripción si existe
-                                if pd.notna(reminder['descripcion']) and reminder['descripcion']:
-                                    mensaje += f"<li>Detalles adicionales: {reminder['descripcion']}</li>"
-                                    
-                                mensaje += """
-                                </ul>
-                                <p>Este es un mensaje automático del Sistema de Gestión de Flota Vehicular.</p>
-                                </body>
-                                </html>
-                                """
-                                        
-                                # Enviar el correo a cada destinatario
-                                for email in st.session_state.email_recipients:
-                                    if db.send_email_notification(email, asunto, mensaje):
-                                        email_sent += 1
-                                    else:
-                                        email_failed += 1
-                            
-                            # Mostrar resultados
-                            st.success(f"Se procesaron {total} recordatorios pendientes.")
-                            
-                            if email_sent > 0:
-                                st.success(f"Se enviaron {email_sent} correos electrónicos correctamente.")
-                            if email_failed > 0:
-                                st.warning(f"No se pudieron enviar {email_failed} correos. Verifique la configuración.")
+                maintenance_reminders_fragment(email_configured)
             
             with col2:
-                if st.button("Verificar Vencimientos VTV", use_container_width=True):
-                    if not st.session_state.email_recipients:
-                        st.warning("No ha configurado ningún correo electrónico para notificaciones.")
-                    elif not email_configured:
-                        st.error("No se pueden enviar correos sin configurar las credenciales SMTP primero.")
-                    else:
-                        # Verificar vehículos con VTV próxima a vencer
-                        vtv_df = db.get_vtv_proximos_vencer(dias=30)
-                        
-                        if vtv_df.empty:
-                            st.info("No hay vehículos con VTV próxima a vencer en los próximos 30 días.")
-                        else:
-                            email_sent = 0
-                            email_failed = 0
-                            
-                            # Construir asunto
-                            asunto = f"ALERTA: Vehículos con VTV próxima a vencer"
-                            
-                            # Construir cuerpo del mensaje HTML
-                            mensaje = f"""
-                            <html>
-                            <body>
-                            <h2>Alerta de VTV próxima a vencer</h2>
-                            <p>Los siguientes vehículos tienen la VTV próxima a vencer en los próximos 30 días:</p>
-                            
-                            <table border="1" cellpadding="5" cellspacing="0">
-                                <tr style="background-color:#f0f0f0">
-                                    <th>Patente</th>
-                                    <th>Marca</th>
-                                    <th>Modelo</th>
-                                    <th>Área</th>
-                                    <th>Vencimiento VTV</th>
-                                </tr>
-                            """
-                            
-                            vtv_display = vtv_df[['patente', 'marca', 'modelo', 'area', 'vtv_vencimiento']]
-                            for _, row in vtv_display.iterrows():
-                                # Calcular días restantes para colorizar
-                                dias_restantes = (pd.to_datetime(row['vtv_vencimiento']) - pd.to_datetime('today')).days
-                                bg_color = "#ffcccc" if dias_restantes < 7 else "#ffffff"
-                                
-                                mensaje += f"""
-                                <tr style="background-color:{bg_color}">
-                                    <td>{row['patente']}</td>
-                                    <td>{row['marca']}</td>
-                                    <td>{row['modelo']}</td>
-                                    <td>{row['area']}</td>
-                                    <td>{row['vtv_vencimiento']} ({dias_restantes} días)</td>
-                                </tr>
-                                """
-                            
-                            mensaje += """
-                            </table>
-                            <p>Este es un mensaje automático del Sistema de Gestión de Flota Vehicular.</p>
-                            </body>
-                            </html>
-                            """
-                            
-                            # Enviar el correo a cada destinatario
-                            for email in st.session_state.email_recipients:
-                                if db.send_email_notification(email, asunto, mensaje):
-                                    email_sent += 1
-                                else:
-                                    email_failed += 1
-                            
-                            # Mostrar resultados
-                            if email_sent > 0:
-                                st.success(f"Se enviaron {email_sent} alertas de VTV por correo electrónico.")
-                            if email_failed > 0:
-                                st.warning(f"No se pudieron enviar {email_failed} correos. Verifique la configuración.")
+                vtv_alerts_fragment(email_configured)
             
             # Separador
             st.markdown("---")
             
-            # Sección para ver y configurar próximos recordatorios
-            st.subheader("Próximos Recordatorios")
-            
-            # Mostrar próximos mantenimientos programados
-            prox_mant = db.get_maintenance_schedules(estado="PENDIENTE", proximos_dias=30)
-            if not prox_mant.empty:
-                st.write("Mantenimientos programados para los próximos 30 días:")
-                display_mant = prox_mant[['patente', 'marca', 'modelo', 'fecha_programada', 'tipo_service']].copy()
-                st.dataframe(display_mant, use_container_width=True)
-                
-                if st.button("Ver todos los mantenimientos"):
-                    st.session_state.page = 'view_schedules'
-                    st.rerun()
-            else:
-                st.info("No hay mantenimientos programados para los próximos 30 días.")
-            
-            # Mostrar próximos vencimientos de VTV
-            vtv_proximos = db.get_vtv_proximos_vencer(30)
-            if not vtv_proximos.empty:
-                st.write("Vehículos con VTV próxima a vencer:")
-                display_vtv = vtv_proximos[['patente', 'marca', 'modelo', 'area', 'vtv_vencimiento']].copy()
-                display_vtv['días_restantes'] = (pd.to_datetime(display_vtv['vtv_vencimiento']) - pd.to_datetime('today')).dt.days
-                display_vtv = display_vtv.sort_values('días_restantes')
-                
-                st.dataframe(display_vtv, use_container_width=True)
-            else:
-                st.info("No hay vehículos con VTV próxima a vencer en los próximos 30 días.")
+            upcoming_reminders_fragment()
                 
         except Exception as e:
             st.error(f"Error al cargar configuración de recordatorios: {e}")
@@ -1449,7 +1513,7 @@ def schedule_maintenance_page():
     # Si hay un vehículo seleccionado, usar ese, de lo contrario mostrar selector
     if 'selected_vehicle' in st.session_state:
         patente = st.session_state.selected_vehicle
-        vehicle = db.get_vehicle_by_patente(patente)
+        vehicle = db.get_vehicle_by_patente(patente, columns=('marca', 'modelo', 'km'))
         st.subheader(f"Programar mantenimiento para: {patente} - {vehicle['marca']} {vehicle['modelo']}")
         del st.session_state.selected_vehicle
     else:
@@ -1462,7 +1526,7 @@ def schedule_maintenance_page():
             st.info("Por favor seleccione un vehículo para programar su mantenimiento.")
             return
         
-        vehicle = db.get_vehicle_by_patente(patente)
+        vehicle = db.get_vehicle_by_patente(patente, columns=('marca', 'modelo', 'km'))
         st.subheader(f"Programar mantenimiento para: {patente} - {vehicle['marca']} {vehicle['modelo']}")
     
     # Formulario para programar mantenimiento
@@ -1,5 +1,9 @@
+import functools
+
 import streamlit as st
 
+_ROLES = {"admin": "admin", "manager": "manager"}
+
 def check_authentication():
     """Simple authentication method using session state."""
     if 'authenticated' not in st.session_state:
@@ -41,11 +45,7 @@ def check_authentication():
             st.session_state.name, 
             st.session_state.username)
 
+@functools.lru_cache(maxsize=64)
 def get_user_role(username):
     """Determine the user's role based on username."""
-    if username == "admin":
-        return "admin"
-    elif username == "manager":
-        return "manager"
-    else:
-        return "operator"
+    return _ROLES.get(username, "operator")
\ No newline at end of file
@@ -23,7 +23,8 @@ def check_authentication():
             submit = st.form_submit_button("Iniciar Sesión")
 
             if submit:
-                if username in USERS_DB and bcrypt.checkpw(password.encode(), USERS_DB[username]):
+                stored = USERS_DB.get(username)
+                if stored is not None and bcrypt.checkpw(password.encode(), stored):
                     st.session_state.authenticated = True
                     st.session_state.username = username
                     st.session_state.name = username.capitalize()
@@ -1,10 +1,22 @@
+import io
 import os
+import base64
+import csv
+import json
+import errno
 import sqlite3
+import re
 import shutil
-import zipfile
 import datetime
 import uuid
-import pandas as pd
+import tempfile
+import pathlib
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, as_completed
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 import streamlit as st
 from logger import get_logger
 
@@ -15,6 +27,346 @@ logger = get_logger('backup_manager')
 BACKUP_DIR = os.path.join(os.getcwd(), 'backups')
 os.makedirs(BACKUP_DIR, exist_ok=True)
 
+# Formato del timestamp en los nombres de backup y exportaciones (p. ej. 20240131_235959)
+FORMATO_TIMESTAMP = "%Y%m%d_%H%M%S"
+_PATRON_TIMESTAMP = re.compile(r"(\d{4})(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])_([01]\d|2[0-3])([0-5]\d)([0-5]\d)")
+
+# Sufijo de los archivos en escritura; se renombran al nombre final solo al completarse
+PARTIAL_SUFFIX = ".partial"
+
+# Tamaño del buffer para copiar archivos de base de datos (1 MB)
+COPY_BUFSIZE = 1 << 20
+
+# Cantidad de filas leídas/escritas por lote al exportar e importar CSV
+CSV_BATCH_SIZE = 10000
+
+# Nivel de compresión DEFLATE de las exportaciones: 1 prioriza velocidad y ya reduce
+# mucho el tamaño de los CSV
+ZIP_COMPRESSLEVEL = 1
+
+# Hilos usados para exportar tablas en paralelo y tamaño máximo en memoria de cada CSV
+# antes de pasar a disco (8 MB)
+EXPORT_MAX_WORKERS = 8
+CSV_SPOOL_SIZE = 8 << 20
+
+# Errores que indican que la copia en el kernel no está disponible para estos archivos
+_ERRORES_SIN_SOPORTE = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.ENOTSUP,
+                        errno.EOPNOTSUPP, getattr(errno, 'ENOTSOCK', errno.EINVAL)}
+
+# ioctl FICLONE de Linux: clona un archivo compartiendo sus bloques (btrfs, XFS)
+FICLONE = 0x40049409
+
+def _try_reflink(fd_in, fd_out):
+    """
+    Intenta clonar un archivo con FICLONE (copy-on-write, sin copiar datos).
+    
+    Args:
+        fd_in: Descriptor del archivo de origen
+        fd_out: Descriptor del archivo de destino, abierto para escritura
+    
+    Returns:
+        bool: True si se creó el clon, False si el sistema de archivos no lo soporta
+    """
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(fd_out, FICLONE, fd_in)
+        return True
+    except OSError as e:
+        if e.errno in _ERRORES_SIN_SOPORTE or e.errno in (errno.ENOTTY, errno.EBADF, errno.EPERM):
+            return False
+        raise
+
+def _zero_copy(src, dst):
+    """
+    Copia un archivo delegando la transferencia de datos al kernel.
+    
+    Intenta un reflink (FICLONE), luego os.copy_file_range, os.sendfile y, si
+    ninguno está disponible, una copia con buffer de COPY_BUFSIZE.
+    
+    Args:
+        src: Ruta del archivo de origen
+        dst: Ruta del archivo de destino
+    """
+    size = os.stat(src).st_size
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fd_in, fd_out = fsrc.fileno(), fdst.fileno()
+        if _try_reflink(fd_in, fd_out):
+            return
+        offset = 0
+        
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while offset < size:
+                    copiados = os.copy_file_range(fd_in, fd_out, size - offset)
+                    if copiados == 0:
+                        break
+                    offset += copiados
+            except OSError as e:
+                if e.errno not in _ERRORES_SIN_SOPORTE:
+                    raise
+        
+        if offset < size and hasattr(os, 'sendfile'):
+            try:
+                while offset < size:
+                    copiados = os.sendfile(fd_out, fd_in, offset, size - offset)
+                    if copiados == 0:
+                        break
+                    offset += copiados
+            except OSError as e:
+                if e.errno not in _ERRORES_SIN_SOPORTE:
+                    raise
+        
+        # Completar con copia en espacio de usuario lo que falte
+        fsrc.seek(offset)
+        fdst.seek(offset)
+        shutil.copyfileobj(fsrc, fdst, length=COPY_BUFSIZE)
+
+def _fast_copy(src, dst):
+    """
+    Copia un archivo sin pasar los datos por Python y conserva sus metadatos.
+    
+    Args:
+        src: Ruta del archivo de origen
+        dst: Ruta del archivo de destino
+    """
+    _zero_copy(src, dst)
+    shutil.copystat(src, dst)
+
+def _backup_reflink(db_path, backup_path):
+    """
+    Genera el backup como un clon copy-on-write (reflink) del archivo de base de datos.
+    
+    Es casi instantáneo en btrfs/XFS, pero el clon comparte bloques con el original
+    y queda en el mismo dispositivo: no protege ante fallas del disco. Solo se usa
+    en modo de journal de rollback; con WAL los cambios confirmados pueden estar
+    todavía fuera del archivo principal.
+    
+    Args:
+        db_path: Ruta al archivo de base de datos SQLite
+        backup_path: Ruta del archivo de backup a generar
+    
+    Returns:
+        bool: True si se creó el clon, False si no es posible y hay que copiar
+    """
+    if fcntl is None:
+        return False
+    
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() == 'wal':
+            return False
+        
+        # Bloquear escrituras mientras se clona para obtener una copia consistente
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            with open(db_path, 'rb') as fsrc, open(backup_path, 'wb') as fdst:
+                clonado = _try_reflink(fsrc.fileno(), fdst.fileno())
+        finally:
+            conn.execute("ROLLBACK")
+    finally:
+        conn.close()
+    
+    if not clonado:
+        os.remove(backup_path)
+    return clonado
+
+def _backup_vacuum(db_path, backup_path):
+    """
+    Genera el backup con VACUUM INTO (SQLite 3.27+).
+    
+    Produce una copia consistente y compactada: solo se escriben las páginas en uso,
+    por lo que el backup queda desfragmentado y suele ser más chico que el original.
+    
+    Args:
+        db_path: Ruta al archivo de base de datos SQLite
+        backup_path: Ruta del archivo de backup a generar (no debe existir)
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("VACUUM INTO ?", (backup_path,))
+    finally:
+        conn.close()
+
+def _backup_online(db_path, backup_path):
+    """
+    Copia la base de datos con la API de backup en línea de SQLite.
+    
+    Obtiene una instantánea consistente aunque haya conexiones escribiendo,
+    copiando por bloques de páginas.
+    
+    Args:
+        db_path: Ruta al archivo de base de datos SQLite
+        backup_path: Ruta del archivo de backup a generar
+    """
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(backup_path)
+    try:
+        # Volcar el WAL (si lo hay) al archivo principal antes de copiar
+        src.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        src.backup(dst, pages=1024)
+    finally:
+        dst.close()
+        src.close()
+
+def _restaurar_online(backup_path, db_path):
+    """
+    Copia un backup sobre la base de datos con la API de backup en línea de SQLite.
+    
+    Args:
+        backup_path: Ruta al archivo de backup
+        db_path: Ruta al archivo de base de datos a restaurar
+    """
+    # Solo lectura: abrir el backup no debe crearle un -wal ni modificarlo
+    src = sqlite3.connect(pathlib.Path(backup_path).resolve().as_uri() + "?mode=ro", uri=True)
+    dst = sqlite3.connect(db_path)
+    try:
+        src.backup(dst, pages=1024)
+        # Llevar lo restaurado al archivo principal y vaciar el WAL
+        dst.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        dst.close()
+        src.close()
+
+def _tablas_usuario(conn):
+    """
+    Obtiene los nombres de las tablas de usuario de una base de datos.
+    
+    Args:
+        conn: Conexión SQLite abierta
+    
+    Returns:
+        list: Nombres de tablas, excluyendo las internas de SQLite (sqlite_*)
+    """
+    cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table';")
+    return [row[0] for row in cursor.fetchall() if not row[0].startswith("sqlite_")]
+
+def _citar_identificador(nombre):
+    """
+    Cita un identificador SQL (tabla o columna) para interpolarlo en una sentencia.
+    
+    Args:
+        nombre: Nombre del identificador
+    
+    Returns:
+        str: Identificador entre comillas dobles, con las comillas internas escapadas
+    """
+    return '"' + nombre.replace('"', '""') + '"'
+
+def _columnas_blob(conn, table_name):
+    """
+    Devuelve las columnas declaradas como BLOB de una tabla.
+    
+    En los CSV esas columnas viajan en base64: csv.writer escribiría los bytes
+    como su repr ("b'...'") y al importarlos se guardaría ese texto.
+    
+    Args:
+        conn: Conexión SQLite abierta
+        table_name: Nombre de la tabla
+    
+    Returns:
+        set: Nombres de las columnas BLOB
+    """
+    return {fila[1] for fila in conn.execute(f"PRAGMA table_info({_citar_identificador(table_name)})")
+            if (fila[2] or '').upper() == 'BLOB'}
+
+def _contar_registros(db_path, usar_estadisticas=False):
+    """
+    Cuenta los registros de cada tabla de una base de datos SQLite.
+    
+    Con usar_estadisticas toma los conteos de sqlite_stat1, que solo son exactos
+    si ANALYZE acaba de ejecutarse sobre el archivo (como en crear_backup_sqlite);
+    las tablas sin estadísticas se cuentan con COUNT(*).
+    
+    Args:
+        db_path: Ruta al archivo de base de datos SQLite
+        usar_estadisticas: Usar sqlite_stat1 en lugar de COUNT(*) cuando sea posible
+    
+    Returns:
+        dict: {nombre_tabla: cantidad_de_registros}
+    """
+    tablas = {}
+    conn = sqlite3.connect(db_path)
+    try:
+        # Solo lectura: el conteo nunca debe modificar el backup
+        conn.execute("PRAGMA query_only=ON")
+        cursor = conn.cursor()
+        
+        # Enumerar las tablas una sola vez (incluye sqlite_stat1 si existe)
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+        nombres = [row[0] for row in cursor.fetchall()]
+        table_names = [name for name in nombres if not name.startswith("sqlite_")]
+        
+        # Cantidad de filas registrada por ANALYZE: primer entero de la columna stat, en la
+        # fila de la tabla o de un índice completo (un índice parcial solo cuenta las filas
+        # que cubre)
+        estadisticas = {}
+        if usar_estadisticas and 'sqlite_stat1' in nombres:
+            parciales = set()
+            for table_name in table_names:
+                for _, idx_name, _, _, partial in cursor.execute(
+                        f"PRAGMA index_list({_citar_identificador(table_name)})").fetchall():
+                    if partial:
+                        parciales.add(idx_name)
+            
+            for tbl, idx, stat in cursor.execute("SELECT tbl, idx, stat FROM sqlite_stat1").fetchall():
+                if stat and idx not in parciales:
+                    estadisticas[tbl] = max(estadisticas.get(tbl, 0), int(stat.split()[0]))
+        
+        # Contar registros de las tablas sin estadísticas
+        for table_name in table_names:
+            if table_name in estadisticas:
+                tablas[table_name] = estadisticas[table_name]
+                continue
+            
+            cursor.execute(f"SELECT COUNT(*) FROM {_citar_identificador(table_name)}")
+            tablas[table_name] = cursor.fetchone()[0]
+    finally:
+        conn.close()
+    
+    return tablas
+
+def _leer_metadatos(backup_path):
+    """
+    Lee los metadatos de un backup.
+    
+    Usa el archivo .meta.json; si no existe, interpreta el formato anterior
+    (.meta con líneas clave=valor).
+    
+    Args:
+        backup_path: Ruta al archivo de backup
+    
+    Returns:
+        dict: Metadatos del backup (vacío si no hay metadatos)
+    """
+    try:
+        with open(backup_path + '.meta.json', 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    
+    metadata = {}
+    legacy_path = backup_path + '.meta'
+    if os.path.exists(legacy_path):
+        with open(legacy_path, 'r') as f:
+            for line in f:
+                key, sep, value = line.rstrip("\n").partition("=")
+                if not sep:
+                    continue
+                metadata[key] = json.loads(value) if key == 'tablas' else value.strip()
+    return metadata
+
+def _guardar_metadatos(backup_path, metadata):
+    """
+    Guarda los metadatos de un backup en formato JSON.
+    
+    Args:
+        backup_path: Ruta al archivo de backup
+        metadata: Diccionario de metadatos
+    """
+    with open(backup_path + '.meta.json', 'w') as f:
+        json.dump(metadata, f, ensure_ascii=False)
+
 def crear_backup_sqlite(db_path):
     """
     Crea un backup completo de la base de datos SQLite.
@@ -31,32 +383,67 @@ def crear_backup_sqlite(db_path):
             return False, f"No se encontró el archivo de base de datos en {db_path}"
         
         # Generar nombre de archivo único para el backup
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.datetime.now().strftime(FORMATO_TIMESTAMP)
         backup_name = f"backup_{timestamp}.db"
         backup_path = os.path.join(BACKUP_DIR, backup_name)
         
-        # Hacer una copia completa del archivo
-        shutil.copy2(db_path, backup_path)
+        # Escribir primero en un archivo .partial y renombrarlo al terminar, para que
+        # un backup interrumpido nunca aparezca en el listado
+        partial_path = backup_path + PARTIAL_SUFFIX
+        
+        # VACUUM INTO no sobrescribe archivos: descartar restos de un intento anterior
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
         
-        # Crear archivo de metadatos
+        # Clon copy-on-write si el sistema de archivos lo permite; si no, copia
+        # consistente y compactada con VACUUM INTO o, en versiones anteriores de
+        # SQLite, API de backup en línea
+        if _backup_reflink(db_path, partial_path):
+            tipo = 'reflink'
+        elif sqlite3.sqlite_version_info >= (3, 27, 0):
+            _backup_vacuum(db_path, partial_path)
+            tipo = 'vacuum'
+        elif sqlite3.sqlite_version_info >= (3, 6, 11):
+            _backup_online(db_path, partial_path)
+            tipo = 'online'
+        else:
+            _fast_copy(db_path, partial_path)
+            tipo = 'copia'
+
+        
+        # Generar estadísticas en el backup para obtener los conteos sin recorrer las tablas
+        conn = sqlite3.connect(partial_path)
+        try:
+            conn.execute("ANALYZE")
+            conn.commit()
+        finally:
+            conn.close()
+        
+        os.replace(partial_path, backup_path)
+        
+        # Crear archivo de metadatos, con los conteos de registros calculados una sola vez
         metadata = {
             'timestamp': timestamp,
             'source_db': db_path,
             'backup_path': backup_path,
-            'description': f"Backup completo creado el {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            'description': f"Backup completo creado el {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            'kind': tipo,
+            'tablas': _contar_registros(backup_path, usar_estadisticas=True)
         }
         
         # Guardar metadatos
-        metadata_path = backup_path + '.meta'
-        with open(metadata_path, 'w') as f:
-            for key, value in metadata.items():
-                f.write(f"{key}={value}\n")
+        _guardar_metadatos(backup_path, metadata)
         
         logger.info(f"Backup creado exitosamente en {backup_path}")
         return True, backup_path
     
     except Exception as e:
         logger.error(f"Error al crear backup: {str(e)}")
+        
+        # Eliminar la copia incompleta si llegó a crearse
+        if 'partial_path' in locals() and os.path.exists(partial_path):
+            os.remove(partial_path)
+        
         return False, f"Error al crear backup: {str(e)}"
 
 def restaurar_backup_sqlite(backup_path, db_path):
@@ -76,18 +463,25 @@ def restaurar_backup_sqlite(backup_path, db_path):
             return False, f"No se encontró el archivo de backup en {backup_path}"
         
         # Crear copia de seguridad antes de restaurar (por si acaso)
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.datetime.now().strftime(FORMATO_TIMESTAMP)
         safety_backup = os.path.join(BACKUP_DIR, f"pre_restore_{timestamp}.db")
         
-        # Si existe la base de datos actual, hacer backup de seguridad
+        # Si existe la base de datos actual, hacer backup de seguridad con la API de
+        # backup: una copia del archivo perdería lo confirmado que sigue en el -wal
         if os.path.exists(db_path):
-            shutil.copy2(db_path, safety_backup)
+            _backup_online(db_path, safety_backup)
+        
+        # Cerrar las conexiones del pool de la aplicación para que no sigan leyendo
+        # páginas cacheadas de la base anterior
+        import database as db  # Importar aquí para evitar dependencias circulares
+        db.dispose_connections()
         
-        # Detener conexiones activas (no podemos hacerlo programáticamente en Python)
-        # En una aplicación real, esto requeriría detener servicios o cerrar conexiones
+        # Restaurar el backup escribiendo a través de SQLite (y no sobre el archivo): el
+        # WAL y el -shm de la base quedan coherentes con el contenido restaurado
+        _restaurar_online(backup_path, db_path)
         
-        # Restaurar el backup
-        shutil.copy2(backup_path, db_path)
+        # Los listados y estadísticas cacheados muestran la base anterior hasta que vencen
+        db.invalidate_cached_reads()
         
         logger.info(f"Backup restaurado exitosamente desde {backup_path}")
         return True, f"Backup restaurado exitosamente. Se creó una copia de seguridad en {safety_backup}"
@@ -96,91 +490,181 @@ def restaurar_backup_sqlite(backup_path, db_path):
         logger.error(f"Error al restaurar backup: {str(e)}")
         return False, f"Error al restaurar backup: {str(e)}"
 
+def _firma_directorio():
+    """
+    Calcula una firma del directorio de backups para invalidar la caché.
+    
+    Cambia cuando se crea, elimina o modifica un backup o sus metadatos.
+    
+    Returns:
+        tuple: (mtime del directorio, tupla de (archivo, mtime, tamaño))
+    """
+    archivos = []
+    with os.scandir(BACKUP_DIR) as it:
+        for entry in it:
+            if entry.name.startswith("backup_") and not entry.name.endswith(PARTIAL_SUFFIX):
+                stat = entry.stat()
+                archivos.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    archivos.sort()
+    return os.stat(BACKUP_DIR).st_mtime_ns, tuple(archivos)
+
 def listar_backups():
     """
     Lista todos los backups disponibles.
     
+    El resultado se cachea mientras el contenido del directorio de backups no cambie.
+    
+    Returns:
+        list: Lista de diccionarios con información de cada backup
+    """
+    try:
+        return _listar_backups_cache(_firma_directorio())
+    except Exception as e:
+        logger.error(f"Error al listar backups: {str(e)}")
+        return []
+
+@st.cache_data(show_spinner=False)
+def _listar_backups_cache(firma):
+    """
+    Recorre el directorio de backups y arma la lista de backups.
+    
+    Args:
+        firma: Firma del directorio (ver _firma_directorio), usada como clave de caché
+    
     Returns:
         list: Lista de diccionarios con información de cada backup
     """
     backups = []
     
-    try:
-        # Buscar archivos de backup
-        for file in os.listdir(BACKUP_DIR):
-            if file.startswith("backup_") and file.endswith(".db"):
-                backup_path = os.path.join(BACKUP_DIR, file)
-                metadata_path = backup_path + '.meta'
-                
-                # Extraer timestamp del nombre
-                timestamp = file.replace("backup_", "").replace(".db", "")
-                
-                # Formatear fecha para mostrar
-                try:
-                    fecha = datetime.datetime.strptime(timestamp, "%Y%m%d_%H%M%S")
-                    fecha_str = fecha.strftime("%d/%m/%Y %H:%M:%S")
-                except:
-                    fecha_str = "Desconocida"
-                    fecha = datetime.datetime.fromtimestamp(0)
-                
-                # Obtener tamaño
-                size_bytes = os.path.getsize(backup_path)
-                size_mb = size_bytes / (1024 * 1024)
-                
-                # Obtener descripción si existe
-                description = ""
-                if os.path.exists(metadata_path):
-                    with open(metadata_path, 'r') as f:
-                        for line in f:
-                            if line.startswith("description="):
-                                description = line.replace("description=", "").strip()
-                                break
-                
-                # Contar tablas y registros
-                tablas = {}
+    # Buscar archivos de backup (DirEntry reutiliza el stat obtenido al recorrer)
+    with os.scandir(BACKUP_DIR) as it:
+        entries = list(it)
+    
+    for entry in entries:
+        file = entry.name
+        if file.startswith("backup_") and file.endswith(".db"):
+            backup_path = entry.path
+            stat = entry.stat()
+            
+            # Extraer timestamp del nombre
+            timestamp = file[len("backup_"):-len(".db")]
+            
+            # Formatear fecha para mostrar; si el nombre no trae un timestamp válido
+            # se usa la fecha de modificación del archivo
+            partes = _PATRON_TIMESTAMP.fullmatch(timestamp)
+            if partes:
+                fecha = datetime.datetime(*map(int, partes.groups()))
+            else:
+                fecha = datetime.datetime.fromtimestamp(stat.st_mtime)
+            fecha_str = fecha.strftime("%d/%m/%Y %H:%M:%S")
+            
+            # Obtener tamaño
+            size_bytes = stat.st_size
+            size_mb = size_bytes / (1024 * 1024)
+            
+            # Obtener descripción y conteos guardados si existen
+            metadata = _leer_metadatos(backup_path)
+            description = metadata.get('description', "")
+            tablas = metadata.get('tablas')
+            
+            # Contar tablas y registros solo para backups sin conteos guardados
+            if tablas is None:
                 try:
-                    conn = sqlite3.connect(backup_path)
-                    cursor = conn.cursor()
-                    
-                    # Obtener lista de tablas
-                    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-                    table_names = cursor.fetchall()
-                    
-                    for table in table_names:
-                        table_name = table[0]
-                        if table_name.startswith("sqlite_"):
-                            continue
-                        
-                        # Contar registros
-                        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-                        count = cursor.fetchone()[0]
-                        tablas[table_name] = count
+                    tablas = _contar_registros(backup_path)
                     
-                    conn.close()
-                except:
-                    pass
-                
-                # Añadir información del backup
-                backups.append({
-                    'filename': file,
-                    'path': backup_path,
-                    'timestamp': timestamp,
-                    'fecha': fecha,
-                    'fecha_str': fecha_str,
-                    'size_bytes': size_bytes,
-                    'size_mb': size_mb,
-                    'description': description,
-                    'tablas': tablas
-                })
-        
-        # Ordenar por fecha (más reciente primero)
-        backups.sort(key=lambda x: x['fecha'], reverse=True)
-        
-        return backups
+                    # Guardar los conteos para no volver a abrir el backup
+                    metadata['tablas'] = tablas
+                    _guardar_metadatos(backup_path, metadata)
+                except Exception:
+                    tablas = {}
+            
+            # Añadir información del backup
+            backups.append({
+                'filename': file,
+                'path': backup_path,
+                'timestamp': timestamp,
+                'fecha': fecha,
+                'fecha_str': fecha_str,
+                'size_bytes': size_bytes,
+                'size_mb': size_mb,
+                'description': description,
+                'tablas': tablas,
+                'mtime': stat.st_mtime
+            })
     
-    except Exception as e:
-        logger.error(f"Error al listar backups: {str(e)}")
-        return []
+    # Ordenar por fecha de modificación (más reciente primero)
+    backups.sort(key=lambda x: x['mtime'], reverse=True)
+    
+    return backups
+
+@st.cache_data(show_spinner=False)
+def _backups_dataframe(firma):
+    """
+    Arma la tabla de backups disponibles para mostrar en la interfaz.
+    
+    Args:
+        firma: Firma del directorio (ver _firma_directorio), usada como clave de caché
+    
+    Returns:
+        DataFrame: Una fila por backup con fecha, tamaño, tablas, registros y descripción
+    """
+    # Importación diferida: pandas demora el arranque en frío de la aplicación
+    import pandas as pd
+    
+    data = []
+    for backup in _listar_backups_cache(firma):
+        # Contar registros totales
+        total_registros = sum(backup['tablas'].values())
+        
+        data.append({
+            "Fecha": backup['fecha_str'],
+            "Tamaño": f"{backup['size_mb']:.2f} MB",
+            "Tablas": len(backup['tablas']),
+            "Registros": total_registros,
+            "Descripción": backup['description']
+        })
+    
+    return pd.DataFrame(data)
+
+def _volcar_tabla_csv(db_path, table_name):
+    """
+    Vuelca una tabla a un CSV temporal usando una conexión propia.
+    
+    Pensada para ejecutarse en un hilo del pool de exportación: cada hilo
+    abre su propia conexión de solo lectura sobre el mismo archivo.
+    
+    Args:
+        db_path: Ruta al archivo de base de datos SQLite
+        table_name: Nombre de la tabla a exportar
+    
+    Returns:
+        SpooledTemporaryFile: CSV en modo texto, posicionado al inicio
+    """
+    salida = tempfile.SpooledTemporaryFile(max_size=CSV_SPOOL_SIZE, mode='w+',
+                                           encoding='utf-8', newline='')
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    try:
+        table_cursor = conn.execute(f"SELECT * FROM {_citar_identificador(table_name)}")
+        columnas = [col[0] for col in table_cursor.description]
+        blobs = _columnas_blob(conn, table_name)
+        indices_blob = {i for i, col in enumerate(columnas) if col in blobs}
+        writer = csv.writer(salida)
+        writer.writerow(columnas)
+        while rows := table_cursor.fetchmany(CSV_BATCH_SIZE):
+            if indices_blob:
+                rows = [tuple(base64.b64encode(valor).decode('ascii')
+                              if i in indices_blob and isinstance(valor, bytes) else valor
+                              for i, valor in enumerate(row))
+                        for row in rows]
+            writer.writerows(rows)
+    except Exception:
+        salida.close()
+        raise
+    finally:
+        conn.close()
+    
+    salida.seek(0)
+    return salida
 
 def exportar_tablas_csv(db_path, directorio_destino=None):
     """
@@ -193,52 +677,39 @@ def exportar_tablas_csv(db_path, directorio_destino=None):
     Returns:
         tuple: (éxito, ruta_zip o mensaje_error)
     """
+    import zipfile
+    
     try:
         # Verificar que el archivo existe
         if not os.path.exists(db_path):
             return False, f"No se encontró el archivo de base de datos en {db_path}"
         
-        # Crear directorio temporal
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        temp_dir = os.path.join(BACKUP_DIR, f"temp_export_{timestamp}")
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Conectar a la base de datos
-        conn = sqlite3.connect(db_path)
-        
-        # Obtener lista de tablas
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        table_names = cursor.fetchall()
-        
-        # Exportar cada tabla
-        for table in table_names:
-            table_name = table[0]
-            if table_name.startswith("sqlite_"):
-                continue
-            
-            # Leer tabla como DataFrame
-            df = pd.read_sql(f"SELECT * FROM {table_name}", conn)
-            
-            # Guardar como CSV
-            csv_path = os.path.join(temp_dir, f"{table_name}.csv")
-            df.to_csv(csv_path, index=False)
-        
-        conn.close()
-        
-        # Crear archivo ZIP con todos los CSV
+        # Ruta del archivo ZIP a generar
+        timestamp = datetime.datetime.now().strftime(FORMATO_TIMESTAMP)
         zip_name = f"export_{timestamp}.zip"
         zip_path = os.path.join(BACKUP_DIR, zip_name)
+        partial_path = zip_path + PARTIAL_SUFFIX
+        
+        # Obtener lista de tablas
+        conn = sqlite3.connect(db_path)
+        try:
+            table_names = _tablas_usuario(conn)
+        finally:
+            conn.close()
         
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
-            for root, _, files in os.walk(temp_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, temp_dir)
-                    zipf.write(file_path, arcname)
+        # Volcar las tablas en paralelo (una conexión por hilo); el ZIP solo se escribe
+        # desde este hilo, a medida que cada tabla termina, porque ZipFile no es thread-safe
+        with zipfile.ZipFile(partial_path, 'w', compression=zipfile.ZIP_DEFLATED,
+                             compresslevel=ZIP_COMPRESSLEVEL) as zipf, \
+                ThreadPoolExecutor(max_workers=max(1, min(EXPORT_MAX_WORKERS, len(table_names)))) as pool:
+            futuros = {pool.submit(_volcar_tabla_csv, db_path, t): t for t in table_names}
+            for futuro in as_completed(futuros):
+                with futuro.result() as origen:
+                    entrada = zipf.open(f"{futuros[futuro]}.csv", 'w', force_zip64=True)
+                    with io.TextIOWrapper(entrada, encoding='utf-8', newline='') as destino:
+                        shutil.copyfileobj(origen, destino, COPY_BUFSIZE)
         
-        # Limpiar directorio temporal
-        shutil.rmtree(temp_dir)
+        os.replace(partial_path, zip_path)
         
         logger.info(f"Exportación a CSV completada en {zip_path}")
         return True, zip_path
@@ -246,12 +717,30 @@ def exportar_tablas_csv(db_path, directorio_destino=None):
     except Exception as e:
         logger.error(f"Error al exportar tablas a CSV: {str(e)}")
         
-        # Limpiar directorio temporal si existe
-        if 'temp_dir' in locals() and os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
+        # Eliminar el ZIP incompleto si llegó a crearse
+        if 'partial_path' in locals() and os.path.exists(partial_path):
+            os.remove(partial_path)
         
         return False, f"Error al exportar tablas: {str(e)}"
 
+def _limpiar_temporal(temp_dir, archivos):
+    """
+    Elimina un directorio temporal plano y los archivos conocidos que contiene.
+    
+    Los errores solo se registran, para que la limpieza no oculte el resultado
+    de la operación principal.
+    
+    Args:
+        temp_dir: Directorio temporal a eliminar
+        archivos: Rutas de los archivos escritos en el directorio
+    """
+    try:
+        for path in archivos:
+            os.unlink(path)
+        os.rmdir(temp_dir)
+    except OSError as e:
+        logger.warning(f"No se pudo limpiar el directorio temporal {temp_dir}: {str(e)}")
+
 def importar_desde_zip(zip_path, db_path):
     """
     Importa datos desde un archivo ZIP que contiene CSVs de tablas.
@@ -263,6 +752,10 @@ def importar_desde_zip(zip_path, db_path):
     Returns:
         tuple: (éxito, mensaje)
     """
+    import zipfile
+    
+    temp_dir = None
+    extraidos = []
     try:
         # Verificar que el archivo ZIP existe
         if not os.path.exists(zip_path):
@@ -272,63 +765,101 @@ def importar_desde_zip(zip_path, db_path):
         temp_dir = os.path.join(BACKUP_DIR, f"temp_import_{uuid.uuid4().hex}")
         os.makedirs(temp_dir, exist_ok=True)
         
-        # Extraer ZIP
+        # Extraer solo los CSV de primer nivel, registrando las rutas escritas
         with zipfile.ZipFile(zip_path, 'r') as zipf:
-            zipf.extractall(temp_dir)
+            for nombre in zipf.namelist():
+                if nombre.endswith(".csv") and "/" not in nombre:
+                    extraidos.append(zipf.extract(nombre, temp_dir))
         
         # Crear backup antes de importar
         success, backup_result = crear_backup_sqlite(db_path)
         if not success:
             return False, f"Error al crear backup antes de importar: {backup_result}"
         
-        # Conectar a la base de datos
-        conn = sqlite3.connect(db_path)
+        # Conectar a la base de datos en modo autocommit para controlar la transacción
+        conn = sqlite3.connect(db_path, isolation_level=None)
         cursor = conn.cursor()
         
+        # Ajustar PRAGMAs para la carga masiva; solo afectan a esta conexión, que se
+        # cierra al terminar (ya existe un backup recién creado si la importación se
+        # interrumpe). journal_mode no se toca: salir de WAL exige que no haya otras
+        # conexiones abiertas, y la aplicación mantiene las suyas en un pool
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        
         # Lista para registrar resultados
         importados = []
         errores = []
         
-        # Procesar cada CSV
-        for file in os.listdir(temp_dir):
-            if file.endswith(".csv"):
-                table_name = os.path.splitext(file)[0]
-                csv_path = os.path.join(temp_dir, file)
+        try:
+            # Una sola transacción para toda la importación
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            # Tablas existentes, consultadas una sola vez; solo estas se aceptan como destino
+            tablas_validas = set(_tablas_usuario(conn))
+            
+            # Procesar cada CSV extraído
+            for csv_path in extraidos:
+                table_name = os.path.splitext(os.path.basename(csv_path))[0]
+                
+                # Verificar si la tabla existe
+                if table_name not in tablas_validas:
+                    # La tabla no existe, ignorar este CSV
+                    errores.append(f"La tabla {table_name} no existe en la base de datos")
+                    continue
                 
+                # Cada tabla en su propio savepoint: un error deshace solo esa tabla
+                cursor.execute("SAVEPOINT importar_tabla")
                 try:
-                    # Leer CSV
-                    df = pd.read_csv(csv_path)
+                    tabla_sql = _citar_identificador(table_name)
                     
-                    # Verificar si la tabla existe
-                    cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}';")
-                    table_exists = cursor.fetchone() is not None
-                    
-                    if table_exists:
-                        # Verificar si hay datos en la tabla
-                        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-                        count = cursor.fetchone()[0]
-                        
-                        if count > 0:
-                            # Si hay datos, truncar la tabla
-                            cursor.execute(f"DELETE FROM {table_name}")
-                    else:
-                        # La tabla no existe, ignorar este CSV
-                        errores.append(f"La tabla {table_name} no existe en la base de datos")
-                        continue
+                    # Truncar la tabla
+                    cursor.execute(f"DELETE FROM {tabla_sql}")
                     
-                    # Insertar datos
-                    df.to_sql(table_name, conn, if_exists='append', index=False)
+                    # Insertar datos por lotes leyendo el CSV directamente, sin pasar por
+                    # pandas; las celdas vacías se guardan como NULL y la afinidad de
+                    # tipos de SQLite convierte los valores numéricos
+                    registros = 0
+                    with open(csv_path, newline='', encoding='utf-8') as f:
+                        reader = csv.reader(f)
+                        encabezado = next(reader, None)
+                        if encabezado:
+                            columnas = ", ".join(_citar_identificador(col) for col in encabezado)
+                            marcadores = ", ".join("?" * len(encabezado))
+                            insert_sql = f"INSERT INTO {tabla_sql} ({columnas}) VALUES ({marcadores})"
+                            
+                            filas = ([valor if valor != '' else None for valor in fila] for fila in reader)
+                            
+                            # Las columnas BLOB se exportan en base64
+                            blobs = _columnas_blob(conn, table_name)
+                            indices_blob = {i for i, col in enumerate(encabezado) if col in blobs}
+                            if indices_blob:
+                                filas = ([base64.b64decode(valor) if i in indices_blob and valor is not None else valor
+                                          for i, valor in enumerate(fila)]
+                                         for fila in filas)
+                            while lote := list(islice(filas, CSV_BATCH_SIZE)):
+                                cursor.executemany(insert_sql, lote)
+                                registros += len(lote)
                     
-                    importados.append(f"Tabla {table_name}: {len(df)} registros importados")
+                    cursor.execute("RELEASE importar_tabla")
+                    importados.append(f"Tabla {table_name}: {registros} registros importados")
                     
                 except Exception as e:
+                    cursor.execute("ROLLBACK TO importar_tabla")
+                    cursor.execute("RELEASE importar_tabla")
                     errores.append(f"Error al importar tabla {table_name}: {str(e)}")
+            
+            cursor.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
         
-        conn.commit()
-        conn.close()
-        
-        # Limpiar directorio temporal
-        shutil.rmtree(temp_dir)
+        # Los listados y estadísticas cacheados muestran los datos anteriores hasta que vencen
+        import database as db  # Importar aquí para evitar dependencias circulares
+        db.invalidate_cached_reads()
         
         # Generar mensaje de resultado
         resultado = f"Importación completada:\n- {len(importados)} tablas importadas\n"
@@ -340,12 +871,13 @@ def importar_desde_zip(zip_path, db_path):
     
     except Exception as e:
         logger.error(f"Error al importar desde ZIP: {str(e)}")
-        
-        # Limpiar directorio temporal si existe
-        if 'temp_dir' in locals() and os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
-        
         return False, f"Error al importar desde ZIP: {str(e)}"
+    
+    finally:
+        # Limpiar el directorio temporal en todos los casos, también si falla el backup
+        # previo a la importación
+        if temp_dir is not None and os.path.exists(temp_dir):
+            _limpiar_temporal(temp_dir, extraidos)
 
 def interfaz_backup_sqlite(db_path):
     """
@@ -377,17 +909,9 @@ def interfaz_backup_sqlite(db_path):
                 if success:
                     # Añadir descripción personalizada si se proporcionó
                     if descripcion:
-                        metadata_path = result + '.meta'
-                        if os.path.exists(metadata_path):
-                            with open(metadata_path, 'r') as f:
-                                lines = f.readlines()
-                            
-                            with open(metadata_path, 'w') as f:
-                                for line in lines:
-                                    if line.startswith("description="):
-                                        f.write(f"description={descripcion}\n")
-                                    else:
-                                        f.write(line)
+                        metadata = _leer_metadatos(result)
+                        metadata['description'] = descripcion
+                        _guardar_metadatos(result, metadata)
                     
                     st.success(f"Backup creado exitosamente en:\n{result}")
                 else:
@@ -403,22 +927,8 @@ def interfaz_backup_sqlite(db_path):
         if not backups:
             st.info("No hay backups disponibles.")
         else:
-            # Crear tabla con backups
-            data = []
-            for backup in backups:
-                # Contar registros totales
-                total_registros = sum(backup['tablas'].values())
-                
-                data.append({
-                    "Fecha": backup['fecha_str'],
-                    "Tamaño": f"{backup['size_mb']:.2f} MB",
-                    "Tablas": len(backup['tablas']),
-                    "Registros": total_registros,
-                    "Descripción": backup['description']
-                })
-            
-            # Mostrar como dataframe
-            st.dataframe(pd.DataFrame(data), use_container_width=True)
+            # Mostrar como dataframe (cacheado mientras el directorio no cambie)
+            st.dataframe(_backups_dataframe(_firma_directorio()), use_container_width=True)
     
     # Tab: Restaurar Backup
     with tabs[1]:
@@ -506,9 +1016,12 @@ def interfaz_backup_sqlite(db_path):
             # Guardar archivo temporal
             temp_zip = os.path.join(BACKUP_DIR, f"temp_import_{uuid.uuid4().hex}.zip")
             with open(temp_zip, "wb") as f:
-                f.write(uploaded_file.getbuffer())
+                # Copiar por bloques en lugar de materializar otra copia del archivo en memoria
+                uploaded_file.seek(0)
+                shutil.copyfileobj(uploaded_file, f, COPY_BUFSIZE)
             
             # Verificar y mostrar contenido
+            import zipfile
             try:
                 with zipfile.ZipFile(temp_zip, 'r') as zipf:
                     csv_files = [f for f in zipf.namelist() if f.endswith('.csv')]
@@ -517,8 +1030,8 @@ def interfaz_backup_sqlite(db_path):
                     st.error("El archivo ZIP no contiene archivos CSV.")
                 else:
                     st.write(f"El archivo contiene {len(csv_files)} tablas:")
-                    for csv in csv_files:
-                        st.write(f"- {os.path.basename(csv)}")
+                    for archivo_csv in csv_files:
+                        st.write(f"- {os.path.basename(archivo_csv)}")
                     
                     # Confirmar importación
                     confirmar = st.checkbox("Confirmo que quiero importar estos datos y sobrescribir los actuales", key="confirm_import")
@@ -2,111 +2,151 @@ import os
 import shutil
 import subprocess
 import sys
+import argparse
+import hashlib
+import importlib.metadata
+import re
 
-def build_executable():
+# Sin --clean: PyInstaller reutiliza el análisis y los binarios cacheados en build/
+# y --noconfirm sobrescribe dist/ sin preguntar. Con -OO el bytecode empaquetado se
+# compila sin asserts ni docstrings (PYZ y base_library.zip más chicos)
+PYINSTALLER_ARGS = [sys.executable, "-OO", "-m", "PyInstaller", "gestflota.spec", "--noconfirm"]
+
+# Caché de binarios procesados (UPX) propia del proyecto: permite ejecutar builds de
+# distintas copias del repositorio en paralelo sin compartir ni corromper la caché global
+PYINSTALLER_CONFIG_DIR = os.path.join("build", "pyinstaller_cache")
+
+# Plantillas de los archivos generados para el empaquetado
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+# Caché de ejecutables ya generados, indexada por el hash de las entradas del build
+BUILD_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "flotav_pyi")
+BUILD_CACHE_MAX = 3
+
+# Archivos que determinan el contenido del ejecutable además de los `datas` del .spec
+ENTRADAS_BUILD = ["launcher.py", "gestflota.spec", "requirements.txt"]
+
+def _datas_spec(spec="gestflota.spec"):
+    """Devuelve las rutas de origen de la lista `datas` del .spec generado."""
+    with open(spec, encoding="utf-8") as f:
+        bloque = re.search(r"datas=\[(.*?)\]", f.read(), re.S)
+    return re.findall(r"\(\s*'([^']+)'\s*,", bloque.group(1)) if bloque else []
+
+def _clave_build():
+    """Calcula el hash de las entradas del build (archivos, paquetes, versión de Python, opciones)."""
+    h = hashlib.blake2b(sys.version.encode())
+    h.update(" ".join(PYINSTALLER_ARGS[1:]).encode())
+    # Versiones instaladas de streamlit, pandas, etc.: se empaquetan en el ejecutable
+    for paquete in sorted(f"{dist.metadata['Name']}=={dist.version}"
+                          for dist in importlib.metadata.distributions()):
+        h.update(paquete.encode())
+    for entrada in ENTRADAS_BUILD + _datas_spec():
+        if os.path.isdir(entrada):
+            archivos = sorted(os.path.join(raiz, nombre)
+                              for raiz, _, nombres in os.walk(entrada) for nombre in nombres)
+        else:
+            archivos = [entrada] if os.path.exists(entrada) else []
+        for archivo in archivos:
+            h.update(archivo.encode())
+            with open(archivo, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+def _guardar_en_cache(clave):
+    """Copia dist/ a la caché y elimina las entradas menos usadas."""
+    destino = os.path.join(BUILD_CACHE_DIR, clave)
+    temporal = destino + ".partial"
+    if os.path.exists(temporal):
+        shutil.rmtree(temporal)
+    shutil.copytree("dist", os.path.join(temporal, "dist"))
+    if os.path.exists(destino):
+        shutil.rmtree(destino)
+    os.replace(temporal, destino)
+
+    # LRU: conservar solo las BUILD_CACHE_MAX entradas usadas más recientemente
+    entradas = sorted((os.path.join(BUILD_CACHE_DIR, nombre) for nombre in os.listdir(BUILD_CACHE_DIR)
+                       if not nombre.endswith(".partial")),
+                      key=os.path.getmtime, reverse=True)
+    for vieja in entradas[BUILD_CACHE_MAX:]:
+        shutil.rmtree(vieja, ignore_errors=True)
+
+def write_if_changed(path, content):
+    """Escribe content en path solo si el archivo no existe o su contenido difiere.
+
+    Conservar el archivo (y su fecha de modificación) permite que PyInstaller
+    reutilice el análisis cacheado de las entradas que no cambiaron.
+
+    Returns:
+        bool: True si se escribió el archivo
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return True
+
+def render(src, dst, **valores):
+    """Genera dst a partir de la plantilla src (ver write_if_changed)."""
+    with open(os.path.join(TEMPLATES_DIR, src), encoding="utf-8") as f:
+        contenido = f.read()
+    if valores:
+        contenido = contenido.format(**valores)
+    return write_if_changed(dst, contenido)
+
+def build_executable(fresh=False, release=False):
     print("🚗 Iniciando empaquetado de la aplicación...")
     
-    # Limpiar builds anteriores
-    for dir in ["dist", "build"]:
-        if os.path.exists(dir):
-            shutil.rmtree(dir)
-            print(f"🗑️ Directorio {dir} eliminado")
+    # Eliminar el ejecutable anterior solo si se pidió un build desde cero
+    if fresh and os.path.exists("dist"):
+        shutil.rmtree("dist")
+        print("🗑️ Directorio dist eliminado")
 
     # Configuración básica
     os.makedirs("standalone_assets", exist_ok=True)
     
     # 1. Crear archivo de configuración de autenticación
-    with open("standalone_assets/config.yaml", "w") as f:
-        f.write("""credentials:
-  usernames:
-    admin:
-      name: Administrador
-      password: $2b$12$Pb0ZxrCHNTPQoLsdBR1UGe6O.3n7ECVIcqiPXHH7qn.zpb2NnLoGK
-      role: admin
-    user:
-      name: Usuario Básico
-      password: $2b$12$lQOXx1.mfQz5GD9DJM.8SeWP1tCJ.2F/hPrtrrm85w7e6ATUlwglu
-      role: user
-cookie:
-  expiry_days: 30
-  key: flota_vehicular_app
-  name: flota_cookie
-""")
+    render("config.yaml", "standalone_assets/config.yaml")
 
     # 2. Generar launcher optimizado
-    with open("launcher.py", "w") as f:
-        f.write("""import os
-import sys
-import streamlit.web.cli as stcli
-
-def main():
-    # Configuración del entorno
-    os.environ.update({
-        'STREAMLIT_SERVER_PORT': '8501',
-        'STREAMLIT_SERVER_HEADLESS': 'false',
-        'STREAMLIT_SERVER_ADDRESS': 'localhost'
-    })
-    
-    # Configurar base de datos
-    data_dir = os.path.join(os.path.dirname(__file__), "data")
-    os.makedirs(data_dir, exist_ok=True)
-    os.environ['DATABASE_FILE'] = os.path.join(data_dir, "flota_vehicular.db")
-    
-    # Iniciar aplicación
-    sys.argv = ["streamlit", "run", "app.py"]
-    stcli.main()
+    render("launcher.py.tmpl", "launcher.py")
 
-if __name__ == "__main__":
-    main()
-""")
-
-    # 3. Crear archivo .spec optimizado
-    spec_content = """# -*- mode: python -*-
-block_cipher = None
-
-a = Analysis(
-    ['launcher.py'],
-    pathex=[],
-    binaries=[],
-    datas=[
-        ('app.py', '.'),
-        ('database.py', '.'),  
-        ('auth.py', '.'),
-        ('config.yaml', '.'),
-        ('standalone_assets/config.yaml', 'standalone_assets'),
-        ('.streamlit', '.streamlit')
-    ],
-    hiddenimports=[
-        'streamlit',
-        'pandas',
-        'sqlalchemy',
-        'sqlite3',
-        'streamlit.runtime',
-        'importlib.metadata'
-    ],
-    hookspath=[],
-    runtime_hooks=[],
-    excludes=[],
-    win_no_prefer_redirects=False,
-    cipher=block_cipher
-)
-
-pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
-exe = EXE(pyz, a.scripts, [], name='Gestion_Flota_Vehicular', debug=False, bootloader_ignore_signals=False, strip=False, upx=True, console=True)
-coll = COLLECT(exe, a.binaries, a.zipfiles, a.datas, strip=False, upx=True, name='Gestion_Flota_Vehicular')"""
-    
-    with open("gestflota.spec", "w") as f:
-        f.write(spec_content)
+    # 3. Crear archivo .spec optimizado (UPX solo en builds de distribución)
+    render("gestflota.spec.tmpl", "gestflota.spec", use_upx=release)
+
+    # 4. Reutilizar el ejecutable cacheado si ninguna entrada cambió
+    clave = _clave_build()
+    cache_dist = os.path.join(BUILD_CACHE_DIR, clave, "dist")
+    if not fresh and os.path.isdir(cache_dist):
+        print("♻️ Sin cambios desde el último build: se reutiliza el ejecutable cacheado")
+        if os.path.exists("dist"):
+            shutil.rmtree("dist")
+        shutil.copytree(cache_dist, "dist")
+        os.utime(os.path.join(BUILD_CACHE_DIR, clave))
+        print("📦 Ejecutable disponible en: dist/Gestion_Flota_Vehicular")
+        return
 
-    # 4. Ejecutar PyInstaller
+    # 5. Ejecutar PyInstaller
     print("🔨 Ejecutando PyInstaller...")
-    result = subprocess.call(["pyinstaller", "gestflota.spec", "--noconfirm"])
+    env = dict(os.environ, PYINSTALLER_CONFIG_DIR=os.path.abspath(PYINSTALLER_CONFIG_DIR))
+    result = subprocess.call(PYINSTALLER_ARGS, env=env)
     
     if result == 0:
+        _guardar_en_cache(clave)
         print("\n✅ ¡Empaquetado exitoso!")
         print("📦 Ejecutable generado en: dist/Gestion_Flota_Vehicular")
     else:
         print("\n❌ Error en el proceso. Revise los logs.")
 
 if __name__ == "__main__":
-    build_executable()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Empaqueta la aplicación con PyInstaller")
+    parser.add_argument("--fresh", action="store_true",
+                        help="eliminar dist/ antes de empaquetar")
+    parser.add_argument("--release", action="store_true",
+                        help="comprimir los binarios con UPX (más lento, ejecutable más chico)")
+    args = parser.parse_args()
+    build_executable(fresh=args.fresh, release=args.release)
\ No newline at end of file
@@ -1,12 +1,58 @@
+import io
 import os
 import json
+import mmap
+import time
+import zlib
+import atexit
 import pickle
+import inspect
 import hashlib
+import threading
+import weakref
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from logger import get_logger
 
+# Hash no criptográfico para las claves del caché; xxhash si está instalado
+try:
+    import xxhash
+    _new_hasher = xxhash.xxh3_64
+except ImportError:
+    def _new_hasher():
+        return hashlib.blake2b(digest_size=16)
+
+# Serialización de los datos cacheados: msgpack y zstd son opcionales, pickle queda
+# como respaldo para los tipos que msgpack no representa
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Estado del caché en JSON compacto; orjson si está instalado
+try:
+    import orjson
+    _dump_state = orjson.dumps
+    _load_state = orjson.loads
+except ImportError:
+    def _dump_state(obj):
+        return json.dumps(obj, separators=(',', ':')).encode()
+    _load_state = json.loads
+
 # Configurar logger
 logger = get_logger('cache_manager')
 
@@ -17,44 +63,209 @@ os.makedirs(CACHE_DIR, exist_ok=True)
 # Archivo para guardar el estado del caché
 CACHE_STATE_FILE = os.path.join(CACHE_DIR, 'cache_state.json')
 
+# Archivo único con los datos serializados de todos los elementos; el estado guarda
+# la posición (offset, longitud, crc32) de cada uno dentro de él
+CACHE_BLOB_FILE = os.path.join(CACHE_DIR, 'cache.bin')
+
+# Registro de cambios (una línea JSON por operación) entre escrituras completas del estado
+CACHE_WAL_FILE = os.path.join(CACHE_DIR, 'cache.wal')
+
+# Cantidad de locks entre los que se reparten las claves (potencia de 2)
+LOCK_BUCKETS = 16
+
 # Valores por defecto
 DEFAULT_CACHE_TTL = 3600  # 1 hora en segundos
 DEFAULT_CACHE_SIZE = 100  # Número máximo de elementos en caché
 DEFAULT_CACHE_ENABLED = True
+FLUSH_INTERVAL = 5  # Segundos entre escrituras del estado del caché a disco
+PERSIST_THRESHOLD = 300  # TTL mínimo (segundos) para que un elemento se guarde en disco
+SERIALIZE_MAX_WORKERS = 4  # Hilos para serializar en paralelo los items pendientes
+ZSTD_LEVEL = 3
+MEMO_SIZE = 128  # Llamadas recordadas por cada función decorada con cached()
+WAL_MAX_ENTRIES = 1000  # Operaciones en cache.wal antes de reescribir el estado completo
+WAL_MAX_AGE = 600  # Segundos máximos entre escrituras completas del estado
+COMPACT_DEAD_RATIO = 1.0  # Compactar cache.bin cuando los huecos superan esta fracción de los datos vigentes
+COMPACT_MIN_DEAD = 1024 * 1024  # ...y suman al menos estos bytes
+
+# Primer byte de cada archivo de datos: indica cómo decodificar el resto
+_FMT_PICKLE = b'P'
+_FMT_MSGPACK = b'M'
+_FMT_ARROW = b'A'
+_FMT_NUMPY = b'N'
+_FMT_ZSTD = b'Z'  # El resto es otro bloque etiquetado, comprimido con zstd
+
+# Extensiones de los archivos individuales de datos de versiones anteriores
+LEGACY_SUFFIXES = ('.dat', '.pkl')
+
+def _legacy_files(key):
+    """Archivos individuales de datos escritos por versiones anteriores del caché"""
+    return tuple(os.path.join(CACHE_DIR, f"{key}{suffix}") for suffix in LEGACY_SUFFIXES)
+
+def _read_legacy(key):
+    """Lee los datos de un archivo individual; devuelve (datos, ruta) o None si no hay"""
+    data_file, pickle_file = _legacy_files(key)
+    try:
+        with open(data_file, 'rb') as f:
+            return _deserialize(f.read()), data_file
+    except FileNotFoundError:
+        pass
+    try:
+        with open(pickle_file, 'rb') as f:
+            return pickle.load(f), pickle_file
+    except FileNotFoundError:
+        return None
+
+def _remove_file(path):
+    """Elimina un archivo si existe (un solo syscall, sin comprobar antes)"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _serialize(obj):
+    """Serializa obj con el formato más compacto disponible, precedido de su etiqueta"""
+    # Los DataFrames se guardan en formato Feather (Arrow), que ya va comprimido
+    if isinstance(obj, pd.DataFrame) and pyarrow is not None:
+        try:
+            buffer = io.BytesIO()
+            obj.to_feather(buffer)
+            return _FMT_ARROW + buffer.getvalue()
+        except Exception:
+            pass
+    
+    data = None
+    # Los arrays numéricos se guardan con su buffer tal cual (formato .npy)
+    if isinstance(obj, np.ndarray) and not obj.dtype.hasobject:
+        buffer = io.BytesIO()
+        np.save(buffer, obj, allow_pickle=False)
+        data = _FMT_NUMPY + buffer.getvalue()
+    
+    if data is None and msgpack is not None:
+        try:
+            # strict_types: las tuplas y subclases van a pickle en lugar de cambiar de tipo
+            data = _FMT_MSGPACK + msgpack.packb(obj, use_bin_type=True, strict_types=True)
+        except (TypeError, ValueError, OverflowError):
+            data = None
+    if data is None:
+        data = _FMT_PICKLE + pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    if zstandard is not None:
+        data = _FMT_ZSTD + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return data
+
+def _try_serialize(obj):
+    """Como _serialize, pero devuelve la excepción en lugar de lanzarla"""
+    try:
+        return _serialize(obj)
+    except Exception as e:
+        return e
+
+def _deserialize(buf):
+    """Decodifica un bloque generado por _serialize según su etiqueta"""
+    tag, payload = buf[:1], buf[1:]
+    if tag == _FMT_ZSTD:
+        return _deserialize(zstandard.ZstdDecompressor().decompress(payload))
+    if tag == _FMT_ARROW:
+        return pd.read_feather(io.BytesIO(payload))
+    if tag == _FMT_NUMPY:
+        return np.load(io.BytesIO(payload), allow_pickle=False)
+    if tag == _FMT_MSGPACK:
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    if tag == _FMT_PICKLE:
+        return pickle.loads(payload)
+    raise ValueError(f"Formato de caché desconocido: {tag!r}")
+
+def _feed(hasher, obj):
+    """Alimenta el hasher con una forma canónica de obj, sin armar un string intermedio"""
+    if isinstance(obj, dict):
+        hasher.update(b'{')
+        for k, v in sorted(obj.items(), key=lambda kv: repr(kv[0])):
+            hasher.update(repr(k).encode())
+            hasher.update(b':')
+            _feed(hasher, v)
+            hasher.update(b',')
+        hasher.update(b'}')
+    elif isinstance(obj, (list, tuple)):
+        hasher.update(b'(' if isinstance(obj, tuple) else b'[')
+        for v in obj:
+            _feed(hasher, v)
+            hasher.update(b',')
+        hasher.update(b')' if isinstance(obj, tuple) else b']')
+    elif isinstance(obj, (pd.DataFrame, pd.Series)):
+        # Hash vectorizado de pandas en lugar de convertir todo el contenido a texto
+        hasher.update(f"{type(obj).__name__}{obj.shape}".encode())
+        if isinstance(obj, pd.DataFrame):
+            hasher.update(repr(list(obj.columns)).encode())
+        try:
+            hasher.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+        except TypeError:
+            # Celdas no hashables (listas, diccionarios)
+            hasher.update(repr(obj.values.tolist()).encode())
+    elif isinstance(obj, np.ndarray) and not obj.dtype.hasobject:
+        # El buffer del array ya es una forma canónica de su contenido
+        hasher.update(f"ndarray{obj.dtype}{obj.shape}".encode())
+        hasher.update(np.ascontiguousarray(obj).tobytes())
+    else:
+        hasher.update(repr(obj).encode())
 
 class CacheItem:
     """Clase para manejar un elemento en caché con metadatos"""
     
-    def __init__(self, key, data, ttl=DEFAULT_CACHE_TTL):
+    # Sin __dict__ por instancia: menos memoria y acceso a atributos más rápido
+    # (__weakref__ para que el nivel en memoria de cached() no los mantenga vivos)
+    __slots__ = ('key', 'data', 'persist', 'ttl', 'created_at', 'expires_at',
+                 'last_accessed', 'access_count', '__weakref__')
+    
+    def __init__(self, key, data, ttl=DEFAULT_CACHE_TTL, persist=None):
         self.key = key
         self.data = data
-        self.created_at = datetime.now()
-        self.expires_at = self.created_at + timedelta(seconds=ttl)
-        self.last_accessed = self.created_at
+        # Los elementos de vida corta sólo se guardan en memoria: vencerían antes de
+        # volver a leerse desde disco
+        self.persist = ttl >= PERSIST_THRESHOLD if persist is None else persist
+        # Vencimiento y último acceso en segundos de time.monotonic(): comparar floats es
+        # mucho más barato que crear un datetime en cada get. created_at es la hora real
+        self.ttl = ttl
+        self.created_at = time.time()
+        self.expires_at = time.monotonic() + ttl
+        self.last_accessed = time.monotonic()
         self.access_count = 0
     
     def is_expired(self):
         """Verifica si el elemento ha expirado"""
-        return datetime.now() > self.expires_at
+        return time.monotonic() > self.expires_at
     
-    def to_dict(self):
-        """Convierte el objeto a un diccionario para serialización"""
+    def to_dict(self, offset=None):
+        """
+        Convierte el objeto a un diccionario para serialización.
+        
+        Args:
+            offset: Diferencia entre time.time() y time.monotonic(); al guardar muchos
+                items se calcula una sola vez y se pasa a cada uno
+        """
+        # El reloj monotónico no sobrevive a un reinicio: en disco se guarda la hora real
+        if offset is None:
+            offset = time.time() - time.monotonic()
         return {
             'key': self.key,
-            'created_at': self.created_at.isoformat(),
-            'expires_at': self.expires_at.isoformat(),
-            'last_accessed': self.last_accessed.isoformat(),
+            'created_at': self.created_at,
+            'expires_at': self.expires_at + offset,
+            'last_accessed': self.last_accessed + offset,
             'access_count': self.access_count,
-            'ttl': (self.expires_at - self.created_at).total_seconds()
+            'ttl': self.ttl
         }
     
     @classmethod
     def from_dict(cls, data_dict):
         """Crea un objeto CacheItem desde un diccionario"""
-        item = cls(data_dict['key'], None)
-        item.created_at = datetime.fromisoformat(data_dict['created_at'])
-        item.expires_at = datetime.fromisoformat(data_dict['expires_at'])
-        item.last_accessed = datetime.fromisoformat(data_dict['last_accessed'])
+        def wall(value):
+            # Estados guardados por versiones anteriores usan fechas ISO
+            return datetime.fromisoformat(value).timestamp() if isinstance(value, str) else value
+        
+        offset = time.time() - time.monotonic()
+        item = cls(data_dict['key'], None, data_dict.get('ttl', DEFAULT_CACHE_TTL))
+        item.created_at = wall(data_dict['created_at'])
+        item.expires_at = wall(data_dict['expires_at']) - offset
+        item.last_accessed = wall(data_dict['last_accessed']) - offset
         item.access_count = data_dict['access_count']
         return item
 
@@ -74,16 +285,62 @@ class CacheManager:
         if self._initialized:
             return
         
-        self.cache = {}
+        # Orden de inserción = orden LRU: el primero es el usado hace más tiempo
+        self.cache = OrderedDict()
         self.max_size = DEFAULT_CACHE_SIZE
         self.enabled = DEFAULT_CACHE_ENABLED
+        self.flush_interval = FLUSH_INTERVAL
         self._initialized = True
         
-        # Cargar caché existente
+        # Locks por grupo de claves: las operaciones sobre claves de grupos distintos no se
+        # bloquean entre sí. Las escrituras a disco usan su propio lock, así que nunca
+        # hacen esperar a get/set
+        self._locks = [threading.RLock() for _ in range(LOCK_BUCKETS)]
+        self._io_lock = threading.RLock()
+        
+        # Protege la contabilidad de disco (_offsets, _persisted, _removed, _legacy), que
+        # comparten todas las claves: delete y set la modifican mientras un flush la recorre.
+        # Sólo se toma durante operaciones cortas en memoria, nunca durante E/S
+        self._state_lock = threading.Lock()
+        
+        # Las modificaciones sólo marcan el caché como sucio; un hilo en segundo plano
+        # lo escribe a disco cada flush_interval segundos y una última vez al salir
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        
+        # Los flush agregan los cambios a cache.wal; el estado completo se reescribe
+        # (y cache.wal se vacía) cada WAL_MAX_ENTRIES operaciones o WAL_MAX_AGE segundos
+        self._wal_fd = None
+        self._wal_entries = 0
+        self._removed = set()
+        
+        # Items cuyos datos ya están escritos en cache.bin (por identidad: created_at
+        # puede repetirse si una clave se reemplaza dentro de la resolución del reloj)
+        self._persisted = {}
+        self._offsets = {}
+        self._blob = None
+        
+        # Bytes de cache.bin que ya no pertenecen a ningún elemento (eliminados o
+        # reemplazados); deciden cuándo compactar
+        self._dead_bytes = 0
+        
+        # Archivos individuales leídos al cargar, a eliminar una vez migrados a cache.bin
+        self._legacy = {}
+        
+        # Cargar caché existente (lo que no se cargó de cache.bin cuenta como hueco)
         self.load_cache_from_disk()
+        self._dead_bytes = max(self._blob_size() - self._live_bytes(), 0)
         
         # Limpiar caché al inicializar (eliminar items expirados)
         self.cleanup_expired()
+        
+        self._flusher = threading.Thread(target=self._flush_loop, name='cache-flush', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+    
+    def _bucket(self, key):
+        """Lock del grupo al que pertenece la clave"""
+        return self._locks[hash(key) & (LOCK_BUCKETS - 1)]
     
     def generate_key(self, base_key, params=None):
         """
@@ -99,20 +356,10 @@ class CacheManager:
         key = str(base_key)
         
         if params:
-            # Si params es un diccionario, ordenarlo para consistencia
-            if isinstance(params, dict):
-                # Convertir a string ordenado
-                params_str = json.dumps(params, sort_keys=True)
-            else:
-                # Intentar serializar directamente
-                try:
-                    params_str = str(params)
-                except:
-                    params_str = str(hash(params))
-            
-            # Generar hash para los parámetros
-            params_hash = hashlib.md5(params_str.encode()).hexdigest()
-            key = f"{key}_{params_hash}"
+            # Hash incremental de los parámetros (los diccionarios se recorren ordenados)
+            hasher = _new_hasher()
+            _feed(hasher, params)
+            key = f"{key}_{hasher.hexdigest()}"
         
         return key
     
@@ -129,23 +376,46 @@ class CacheManager:
         if not self.enabled:
             return None
         
-        # Verificar si la clave existe
-        if key not in self.cache:
-            return None
-        
-        # Obtener el item y verificar si expiró
-        item = self.cache[key]
-        if item.is_expired():
-            self.delete(key)
-            return None
+        with self._bucket(key):
+            # Verificar si la clave existe
+            if key not in self.cache:
+                return None
+            
+            # Obtener el item y verificar si expiró
+            item = self.cache[key]
+            if item.is_expired():
+                self.delete(key)
+                return None
+            
+            # Actualizar metadatos de acceso
+            item.last_accessed = time.monotonic()
+            item.access_count += 1
+            self.cache.move_to_end(key)
+            
+            return item.data
+    
+    def touch(self, key, item):
+        """
+        Registra un acceso a item si sigue siendo el valor vigente de key, como lo haría get.
         
-        # Actualizar metadatos de acceso
-        item.last_accessed = datetime.now()
-        item.access_count += 1
+        Args:
+            key: Clave del elemento
+            item: CacheItem recordado por el nivel en memoria de cached()
         
-        return item.data
+        Returns:
+            bool: False si la clave se eliminó, se reemplazó o venció
+        """
+        with self._bucket(key):
+            if self.cache.get(key) is not item or item.is_expired():
+                return False
+            
+            item.last_accessed = time.monotonic()
+            item.access_count += 1
+            self.cache.move_to_end(key)
+            
+            return True
     
-    def set(self, key, data, ttl=DEFAULT_CACHE_TTL):
+    def set(self, key, data, ttl=DEFAULT_CACHE_TTL, persist=None):
         """
         Almacena un valor en el caché.
         
@@ -153,6 +423,7 @@ class CacheManager:
             key: Clave para identificar el valor
             data: Datos a almacenar (deben ser serializables)
             ttl: Tiempo de vida en segundos (por defecto 1 hora)
+            persist: Guardar también en disco (por defecto, si ttl >= PERSIST_THRESHOLD)
         
         Returns:
             bool: True si se almacenó correctamente
@@ -160,15 +431,29 @@ class CacheManager:
         if not self.enabled:
             return False
         
-        # Verificar si estamos en el límite de tamaño
+        # Verificar si estamos en el límite de tamaño (fuera del lock de esta clave: la
+        # eliminada toma el de la suya y así no se esperan dos locks cruzados)
         if len(self.cache) >= self.max_size and key not in self.cache:
             self.evict_oldest()
         
-        # Almacenar el elemento
-        self.cache[key] = CacheItem(key, data, ttl)
-        
-        # Guardar estado actual en disco
-        self.save_cache_to_disk()
+        with self._bucket(key):
+            # Almacenar el elemento
+            item = CacheItem(key, data, ttl, persist)
+            self.cache[key] = item
+            self.cache.move_to_end(key)
+            
+            # Si reemplaza a uno guardado en disco por otro que no se guarda, el registro
+            # de cambios debe eliminar el anterior
+            if not item.persist:
+                with self._state_lock:
+                    location = self._offsets.pop(key, None)
+                    if location is not None:
+                        self._persisted.pop(key, None)
+                        self._removed.add(key)
+                        self._dead_bytes += location[1]
+            
+            # Se guardará en disco en el próximo flush
+            self._dirty = True
         
         return True
     
@@ -182,42 +467,68 @@ class CacheManager:
         Returns:
             bool: True si se eliminó correctamente
         """
-        if key in self.cache:
-            del self.cache[key]
-            
-            # Eliminar también el archivo de datos si existe
-            data_file = os.path.join(CACHE_DIR, f"{key}.pkl")
-            if os.path.exists(data_file):
-                os.remove(data_file)
-            
-            # Guardar estado actual
-            self.save_cache_to_disk()
+        with self._bucket(key):
+            if key in self.cache:
+                del self.cache[key]
+                
+                # Sus datos quedan como un hueco en cache.bin hasta la próxima compactación
+                with self._state_lock:
+                    self._persisted.pop(key, None)
+                    location = self._offsets.pop(key, None)
+                    if location is not None:
+                        self._removed.add(key)
+                        self._dead_bytes += location[1]
+                    legacy_file = self._legacy.pop(key, None)
+                if legacy_file:
+                    _remove_file(legacy_file)
+                
+                # Se guardará en disco en el próximo flush
+                self._dirty = True
+                
+                return True
             
-            return True
-        
-        return False
+            return False
     
     def clear(self):
         """Limpia completamente el caché"""
-        # Eliminar todos los archivos de datos
-        for key in self.cache.keys():
-            data_file = os.path.join(CACHE_DIR, f"{key}.pkl")
-            if os.path.exists(data_file):
-                os.remove(data_file)
-        
-        # Limpiar el diccionario de caché
-        self.cache.clear()
-        
-        # Guardar estado vacío
-        self.save_cache_to_disk()
+        with self._io_lock:
+            # Eliminar todos los archivos de datos
+            self._close_blob()
+            _remove_file(CACHE_BLOB_FILE)
+            
+            # Archivos individuales de versiones anteriores: un solo recorrido del directorio
+            # (también elimina los que ya no tienen clave en el caché)
+            with os.scandir(CACHE_DIR) as entries:
+                for entry in entries:
+                    if entry.name.endswith(LEGACY_SUFFIXES):
+                        _remove_file(entry.path)
+            
+            # Limpiar el diccionario de caché
+            self.cache.clear()
+            with self._state_lock:
+                self._persisted.clear()
+                self._offsets.clear()
+                self._legacy.clear()
+                self._removed = set()
+                self._dead_bytes = 0
+            
+            # Guardar estado vacío
+            self.save_cache_to_disk()
     
     def cleanup_expired(self):
         """Elimina elementos expirados del caché"""
-        keys_to_delete = [key for key, item in self.cache.items() if item.is_expired()]
+        # Una sola lectura del reloj para todo el recorrido
+        now = time.monotonic()
+        keys_to_delete = [key for key, item in list(self.cache.items()) if item.expires_at < now]
         
+        # delete() sólo marca el caché como sucio: el próximo flush registra las eliminaciones
         for key in keys_to_delete:
             self.delete(key)
         
+        # Recuperar el espacio de los datos eliminados o reemplazados cuando los huecos ya
+        # pesan (compact guarda el estado si reescribió cache.bin)
+        self.compact_if_needed()
+        
         return len(keys_to_delete)
     
     def evict_oldest(self):
@@ -225,69 +536,297 @@ class CacheManager:
         if not self.cache:
             return
         
-        # Ordenar por último acceso (más antiguo primero)
-        oldest_key = min(
-            self.cache.keys(),
-            key=lambda k: self.cache[k].last_accessed
-        )
+        # El primer elemento es el de acceso más antiguo
+        oldest_key = next(iter(self.cache))
         
         self.delete(oldest_key)
     
+    def _open_blob(self):
+        """Abre cache.bin para agregar datos al final"""
+        if self._blob is None:
+            self._blob = open(CACHE_BLOB_FILE, 'a+b')
+        return self._blob
+    
+    def _close_blob(self):
+        if self._blob is not None:
+            self._blob.close()
+            self._blob = None
+    
+    def _blob_size(self):
+        try:
+            return os.path.getsize(CACHE_BLOB_FILE)
+        except FileNotFoundError:
+            return 0
+    
+    def _live_bytes(self):
+        with self._state_lock:
+            return sum(length for _, length, _ in self._offsets.values())
+    
+    def compact_if_needed(self):
+        """Compacta cache.bin si los huecos superan COMPACT_DEAD_RATIO de los datos vigentes"""
+        dead = self._dead_bytes
+        if dead < COMPACT_MIN_DEAD or dead <= self._live_bytes() * COMPACT_DEAD_RATIO:
+            return False
+        return self.compact()
+    
+    def compact(self):
+        """Reescribe cache.bin sin los huecos de los elementos eliminados o reemplazados"""
+        with self._io_lock:
+            try:
+                with self._state_lock:
+                    live = [(key, self._offsets[key]) for key in list(self.cache) if key in self._offsets]
+                used = sum(length for _, (_, length, _) in live)
+                if self._blob_size() == used:
+                    self._dead_bytes = 0
+                    return False
+                
+                offsets = {}
+                temp_file = f"{CACHE_BLOB_FILE}.tmp"
+                with open(CACHE_BLOB_FILE, 'rb') as src, open(temp_file, 'wb') as dst:
+                    for key, (offset, length, crc) in live:
+                        src.seek(offset)
+                        offsets[key] = (dst.tell(), length, crc)
+                        dst.write(src.read(length))
+                
+                self._close_blob()
+                os.replace(temp_file, CACHE_BLOB_FILE)
+                with self._state_lock:
+                    # Las claves eliminadas mientras se copiaba no vuelven a aparecer
+                    self._offsets = {key: location for key, location in offsets.items()
+                                     if key in self._offsets}
+                    self._dead_bytes = sum(length for key, (_, length, _) in offsets.items()
+                                           if key not in self._offsets)
+                
+                # Si el proceso termina antes de guardar el estado, el crc32 descarta las
+                # posiciones viejas en lugar de leer datos equivocados
+                self.save_cache_to_disk()
+                return True
+            except Exception as e:
+                logger.error(f"Error al compactar el caché: {str(e)}")
+                return False
+    
+    def _flush_loop(self):
+        """Escribe periódicamente el caché a disco si hubo modificaciones"""
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+            # Sin esto los elementos vencidos ocupan memoria y disco hasta reiniciar (get sólo
+            # los oculta) y cache.bin sólo crece mientras el proceso sigue vivo
+            self.cleanup_expired()
+    
+    def flush(self):
+        """Guarda el caché en disco sólo si cambió desde la última escritura"""
+        if self._dirty:
+            if (self._wal_entries >= WAL_MAX_ENTRIES
+                    or time.monotonic() - self._last_flush >= WAL_MAX_AGE):
+                self.save_cache_to_disk()
+            else:
+                self.append_changes_to_disk()
+    
+    def _write_pending(self, items):
+        """
+        Agrega al final de cache.bin los datos de los items que todavía no están escritos.
+        
+        Args:
+            items: Lista de (clave, CacheItem) a persistir
+        
+        Returns:
+            list: Los (clave, CacheItem) escritos en esta llamada
+        """
+        with self._state_lock:
+            pending = [(key, item) for key, item in items
+                       if item.data is not None and self._persisted.get(key) is not item]
+        
+        # Serializar en paralelo (Arrow y zstd liberan el GIL); la escritura es
+        # secuencial porque todos los datos van al mismo archivo
+        serialized = None
+        if len(pending) > 1:
+            try:
+                with ThreadPoolExecutor(max_workers=SERIALIZE_MAX_WORKERS) as executor:
+                    serialized = list(executor.map(_try_serialize, [item.data for _, item in pending]))
+            except RuntimeError:
+                # Durante el cierre del intérprete (flush de atexit) ya no se pueden
+                # crear hilos nuevos
+                serialized = None
+        if serialized is None:
+            serialized = [_try_serialize(item.data) for _, item in pending]
+        
+        written = []
+        blob = None
+        for (key, item), data in zip(pending, serialized):
+            try:
+                if isinstance(data, Exception):
+                    raise data
+                blob = self._open_blob()
+                offset = blob.seek(0, os.SEEK_END)
+                blob.write(data)
+                with self._state_lock:
+                    # Si se eliminó o reemplazó mientras se serializaba, sus datos ya son
+                    # un hueco: registrarlo dejaría un SET posterior a su DEL
+                    if self.cache.get(key) is not item:
+                        self._dead_bytes += len(data)
+                        continue
+                    # Los datos de la versión anterior de la clave quedan como hueco
+                    previous = self._offsets.get(key)
+                    if previous is not None:
+                        self._dead_bytes += previous[1]
+                    self._offsets[key] = (offset, len(data), zlib.crc32(data))
+                    self._persisted[key] = item
+                written.append((key, item))
+            except Exception as e:
+                logger.error(f"Error al guardar datos de caché para {key}: {str(e)}")
+        if blob is not None:
+            blob.flush()
+        return written
+    
+    def _remove_migrated(self):
+        """Elimina los archivos individuales ya migrados a cache.bin"""
+        with self._state_lock:
+            migrated = [self._legacy.pop(key) for key in list(self._legacy) if key in self._offsets]
+        for path in migrated:
+            _remove_file(path)
+    
+    def _close_wal(self):
+        if self._wal_fd is not None:
+            os.close(self._wal_fd)
+            self._wal_fd = None
+    
+    def append_changes_to_disk(self):
+        """Agrega a cache.wal los cambios desde la última escritura, sin reescribir el estado"""
+        with self._io_lock:
+            try:
+                self._dirty = False
+                # Se toma el conjunto actual y se deja uno nuevo: las eliminaciones que
+                # lleguen durante el flush van al siguiente, nunca se pierden
+                with self._state_lock:
+                    removed, self._removed = self._removed, set()
+                items = [(key, item) for key, item in list(self.cache.items()) if item.persist]
+                
+                # Los datos van a cache.bin antes que su registro, igual que con el estado
+                offset = time.time() - time.monotonic()
+                records = [{'op': 'DEL', 'key': key} for key in removed]
+                for key, item in self._write_pending(items):
+                    with self._state_lock:
+                        location = self._offsets.get(key)
+                    if location is not None:
+                        records.append({'op': 'SET', 'key': key, 'item': dict(item.to_dict(offset), blob=location)})
+                if not records:
+                    return True
+                
+                # Una sola escritura con O_APPEND para todas las operaciones del flush
+                if self._wal_fd is None:
+                    self._wal_fd = os.open(CACHE_WAL_FILE,
+                                           os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0))
+                os.write(self._wal_fd, b''.join(_dump_state(record) + b'\n' for record in records))
+                self._wal_entries += len(records)
+                
+                self._remove_migrated()
+                return True
+            except Exception as e:
+                logger.error(f"Error al registrar cambios del caché en disco: {str(e)}")
+                return False
+    
     def save_cache_to_disk(self):
         """Guarda el estado del caché en disco"""
-        try:
-            # Guardar metadatos en JSON
-            cache_state = {
-                'metadata': {
-                    'timestamp': datetime.now().isoformat(),
-                    'count': len(self.cache),
-                    'max_size': self.max_size
-                },
-                'items': {
-                    key: item.to_dict() for key, item in self.cache.items()
+        # Un solo hilo escribe a disco a la vez (flush periódico, compactación, salida)
+        with self._io_lock:
+            try:
+                self._dirty = False
+                with self._state_lock:
+                    self._removed = set()
+                
+                # Copia de los items: otros hilos pueden modificar el caché durante la escritura
+                # (los que no se persisten no van ni a cache.bin ni al estado)
+                items = [(key, item) for key, item in list(self.cache.items()) if item.persist]
+                
+                # Agregar al final de cache.bin los datos que todavía no están escritos
+                # (antes del estado, para que nunca apunte a datos inexistentes)
+                self._write_pending(items)
+                
+                # Guardar metadatos en JSON
+                offset = time.time() - time.monotonic()
+                with self._state_lock:
+                    locations = {key: self._offsets.get(key) for key, _ in items}
+                cache_state = {
+                    'metadata': {
+                        'timestamp': datetime.now().isoformat(),
+                        'count': len(items),
+                        'max_size': self.max_size
+                    },
+                    'items': {
+                        key: dict(item.to_dict(offset), blob=locations[key]) for key, item in items
+                    }
                 }
-            }
-            
-            with open(CACHE_STATE_FILE, 'w') as f:
-                json.dump(cache_state, f, indent=2)
-            
-            # Guardar datos en archivos individuales (para evitar un único archivo grande)
-            for key, item in self.cache.items():
-                # Evitar guardar si no hay datos o si ya existe el archivo
-                if item.data is None:
-                    continue
                 
-                data_file = os.path.join(CACHE_DIR, f"{key}.pkl")
-                if not os.path.exists(data_file):
-                    try:
-                        with open(data_file, 'wb') as f:
-                            pickle.dump(item.data, f)
-                    except Exception as e:
-                        logger.error(f"Error al guardar datos de caché para {key}: {str(e)}")
-            
-            return True
-        except Exception as e:
-            logger.error(f"Error al guardar caché en disco: {str(e)}")
-            return False
+                # Escribir en un archivo temporal y reemplazar, para no dejar un estado a medias
+                temp_file = f"{CACHE_STATE_FILE}.tmp"
+                with open(temp_file, 'wb') as f:
+                    f.write(_dump_state(cache_state))
+                os.replace(temp_file, CACHE_STATE_FILE)
+                
+                # El estado ya incluye todo lo registrado en cache.wal
+                self._close_wal()
+                _remove_file(CACHE_WAL_FILE)
+                self._wal_entries = 0
+                
+                # Los archivos individuales ya migrados a cache.bin dejan de hacer falta
+                self._remove_migrated()
+                
+                self._last_flush = time.monotonic()
+                return True
+            except Exception as e:
+                logger.error(f"Error al guardar caché en disco: {str(e)}")
+                return False
     
     def load_cache_from_disk(self):
         """Carga el estado del caché desde disco"""
         try:
-            # Verificar si existe el archivo de estado
-            if not os.path.exists(CACHE_STATE_FILE):
-                return False
-            
             # Cargar metadatos desde JSON
-            with open(CACHE_STATE_FILE, 'r') as f:
-                cache_state = json.load(f)
+            try:
+                with open(CACHE_STATE_FILE, 'rb') as f:
+                    cache_state = _load_state(f.read())
+            except FileNotFoundError:
+                cache_state = {}
             
             # Configurar tamaño máximo
             if 'metadata' in cache_state and 'max_size' in cache_state['metadata']:
                 self.max_size = cache_state['metadata']['max_size']
             
-            # Cargar elementos
-            if 'items' in cache_state:
-                for key, item_dict in cache_state['items'].items():
+            # Aplicar sobre el estado los cambios registrados después de escribirlo
+            entries = cache_state.get('items', {})
+            self._wal_entries = 0
+            try:
+                with open(CACHE_WAL_FILE, 'rb') as f:
+                    for line in f:
+                        try:
+                            record = _load_state(line)
+                        except ValueError:
+                            # Última línea incompleta si el proceso terminó mientras se escribía
+                            break
+                        if record['op'] == 'SET':
+                            entries[record['key']] = record['item']
+                        else:
+                            entries.pop(record['key'], None)
+                        self._wal_entries += 1
+            except FileNotFoundError:
+                pass
+            
+            # Sin estado ni registro de cambios no hay nada que cargar
+            if not cache_state and not self._wal_entries:
+                return False
+            
+            # Mapear cache.bin completo: una lectura secuencial en lugar de un open() por item
+            blob_view = None
+            try:
+                with open(CACHE_BLOB_FILE, 'rb') as f:
+                    if os.fstat(f.fileno()).st_size > 0:
+                        blob_view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except FileNotFoundError:
+                pass
+            
+            try:
+                # Cargar elementos
+                for key, item_dict in entries.items():
                     # Recrear el objeto CacheItem
                     item = CacheItem.from_dict(item_dict)
                     
@@ -295,15 +834,29 @@ class CacheManager:
                     if item.is_expired():
                         continue
                     
-                    # Cargar datos desde archivo individual
-                    data_file = os.path.join(CACHE_DIR, f"{key}.pkl")
-                    if os.path.exists(data_file):
-                        try:
-                            with open(data_file, 'rb') as f:
-                                item.data = pickle.load(f)
-                                self.cache[key] = item
-                        except Exception as e:
-                            logger.error(f"Error al cargar datos de caché para {key}: {str(e)}")
+                    try:
+                        location = item_dict.get('blob')
+                        if location:
+                            offset, length, crc = location
+                            data = blob_view[offset:offset + length] if blob_view is not None else b''
+                            if len(data) != length or zlib.crc32(data) != crc:
+                                raise ValueError("datos inconsistentes en cache.bin")
+                            item.data = _deserialize(data)
+                            self._offsets[key] = (offset, length, crc)
+                            self._persisted[key] = item
+                        else:
+                            # Archivo individual de versiones anteriores (.dat o .pkl)
+                            legacy = _read_legacy(key)
+                            if legacy is None:
+                                continue
+                            item.data, self._legacy[key] = legacy
+                            self._dirty = True
+                        self.cache[key] = item
+                    except Exception as e:
+                        logger.error(f"Error al cargar datos de caché para {key}: {str(e)}")
+            finally:
+                if blob_view is not None:
+                    blob_view.close()
             
             logger.info(f"Caché cargado desde disco: {len(self.cache)} elementos")
             return True
@@ -314,35 +867,102 @@ class CacheManager:
 # Crear singleton del caché
 cache_manager = CacheManager()
 
-def cached(ttl=DEFAULT_CACHE_TTL):
+# Separa los argumentos posicionales de los nombrados en las claves del nivel en memoria
+_KWARGS_MARK = object()
+
+def cached(ttl=DEFAULT_CACHE_TTL, persist=None):
     """
     Decorador para cachear el resultado de una función.
     
     Args:
         ttl: Tiempo de vida en segundos (por defecto 1 hora)
+        persist: Guardar también en disco (por defecto, si ttl >= PERSIST_THRESHOLD)
     
     Returns:
         decorator: Decorador para aplicar a funciones
     """
     def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            # Generar clave única para esta función y sus argumentos
-            base_key = f"{func.__module__}.{func.__name__}"
-            params = {'args': args, 'kwargs': kwargs}
-            cache_key = cache_manager.generate_key(base_key, params)
+        # La clave base es fija para cada función decorada: el hasher se deja alimentado
+        # con ella y en cada llamada sólo se copia y se le agregan los argumentos
+        base_key = f"{func.__module__}.{func.__name__}"
+        base_hasher = _new_hasher()
+        base_hasher.update(base_key.encode())
+        
+        # Firma resuelta una sola vez: permite que f(1), f(x=1) y f() con x=1 por
+        # defecto compartan la misma clave
+        try:
+            signature = inspect.signature(func)
+        except (TypeError, ValueError):
+            signature = None
+        
+        def lookup(args, kwargs):
+            # Generar clave única para esta función y sus argumentos (normalizados)
+            key_args, key_kwargs = args, kwargs
+            if signature is not None:
+                try:
+                    bound = signature.bind(*args, **kwargs)
+                    bound.apply_defaults()
+                    key_args, key_kwargs = bound.args, bound.kwargs
+                except TypeError:
+                    pass
+            hasher = base_hasher.copy()
+            _feed(hasher, key_args)
+            if key_kwargs:
+                _feed(hasher, key_kwargs)
+            cache_key = f"{base_key}_{hasher.hexdigest()}"
             
             # Intentar obtener del caché
             cached_result = cache_manager.get(cache_key)
-            if cached_result is not None:
-                return cached_result
+            if cached_result is None:
+                # Ejecutar la función y guardar en caché
+                cached_result = func(*args, **kwargs)
+                cache_manager.set(cache_key, cached_result, ttl, persist)
             
-            # Ejecutar la función
-            result = func(*args, **kwargs)
+            return cached_result, cache_key
+        
+        # Primer nivel en memoria: las llamadas repetidas con argumentos hashables se
+        # resuelven con un diccionario, sin calcular la clave. Guarda una referencia débil
+        # al CacheItem: no retiene datos que el gestor ya descartó, y cada acierto pasa
+        # por touch para que el orden LRU del gestor siga reflejando el uso
+        memo = OrderedDict()
+        memo_lock = threading.Lock()
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not cache_manager.enabled:
+                return func(*args, **kwargs)
             
-            # Guardar en caché
-            cache_manager.set(cache_key, result, ttl)
+            # Caso habitual, sólo argumentos posicionales: no armar la tupla de kwargs
+            memo_key = args if not kwargs else args + (_KWARGS_MARK,) + tuple(kwargs.items())
+            try:
+                entry = memo.get(memo_key)
+            except TypeError:
+                # Argumentos no hashables: sólo el caché del gestor
+                return lookup(args, kwargs)[0]
             
+            if entry is not None:
+                cache_key, ref = entry
+                item = ref()
+                if item is not None and cache_manager.touch(cache_key, item):
+                    with memo_lock:
+                        if memo_key in memo:
+                            memo.move_to_end(memo_key)
+                    return item.data
+            
+            # Sin recordar, o eliminado, reemplazado o vencido en el gestor: sólo se
+            # descarta esta llamada
+            result, cache_key = lookup(args, kwargs)
+            item = cache_manager.cache.get(cache_key)
+            with memo_lock:
+                if item is not None:
+                    memo[memo_key] = (cache_key, weakref.ref(item))
+                    memo.move_to_end(memo_key)
+                    if len(memo) > MEMO_SIZE:
+                        memo.popitem(last=False)
+                else:
+                    memo.pop(memo_key, None)
             return result
+        
+        wrapper.cache_clear = memo.clear
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
@@ -1,631 +1,1081 @@
-import os
-import json
-import base64
-import sqlite3
-import pandas as pd
-import numpy as np
-import streamlit as st
-from datetime import datetime, timedelta
-from sqlalchemy import create_engine
-
-# Función para obtener la ruta de la base de datos SQLite
-def get_database_path():
-    if 'DATABASE_FILE' in os.environ:
-        return os.environ['DATABASE_FILE']
-    # Fallback al directorio actual
-    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
-    os.makedirs(data_dir, exist_ok=True)
-    return os.path.join(data_dir, "flota_vehicular.db")
-
-def init_database():
-    """Initialize the database and create tables if they don't exist."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Create vehicles table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS vehiculos (
-        patente TEXT PRIMARY KEY,
-        area TEXT,
-        tipo TEXT,
-        marca TEXT,
-        modelo TEXT,
-        año INTEGER,
-        estado TEXT DEFAULT 'SERVICIO',
-        km INTEGER DEFAULT 0,
-        fecha_service TEXT,
-        taller TEXT,
-        observaciones TEXT,
-        pdf_files TEXT,
-        fecha_alta TEXT DEFAULT CURRENT_DATE,
-        rori TEXT,
-        id_vehiculo INTEGER,
-        vtv_vencimiento TEXT
-    )
-    ''')
-    
-    # Create service history table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS historial_service (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        patente TEXT,
-        fecha TEXT,
-        km INTEGER,
-        tipo_service TEXT,
-        taller TEXT,
-        costo REAL,
-        descripcion TEXT,
-        pdf_files TEXT,
-        FOREIGN KEY (patente) REFERENCES vehiculos (patente)
-    )
-    ''')
-    
-    # Create incidents table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS incidentes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        patente TEXT,
-        fecha TEXT,
-        tipo TEXT,
-        descripcion TEXT,
-        estado TEXT DEFAULT 'PENDIENTE',
-        pdf_files TEXT,
-        FOREIGN KEY (patente) REFERENCES vehiculos (patente)
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
-def get_connection():
-    """Get a database connection."""
-    db_path = get_database_path()
-    conn = sqlite3.connect(db_path)
-    return conn
-
-def get_sqlalchemy_engine():
-    """Get a SQLAlchemy engine."""
-    db_path = get_database_path()
-    return create_engine(f'sqlite:///{db_path}')
-
-def load_vehicles(search_term=None):
-    """Load all vehicles from the database with optional search filter."""
-    engine = get_sqlalchemy_engine()
-    
-    if search_term:
-        query = f'''
-        SELECT * FROM vehiculos
-        WHERE patente LIKE '%{search_term}%'
-        OR area LIKE '%{search_term}%'
-        OR tipo LIKE '%{search_term}%'
-        OR marca LIKE '%{search_term}%'
-        OR modelo LIKE '%{search_term}%'
-        OR estado LIKE '%{search_term}%'
-        ORDER BY patente
-        '''
-    else:
-        query = 'SELECT * FROM vehiculos ORDER BY patente'
-    
-    df = pd.read_sql(query, engine)
-    return df
-
-def add_vehicle(patente, area, tipo, marca, modelo, año, estado, km=0, fecha_service=None, taller=None, observaciones=None, pdf_files=None, rori=None, id_vehiculo=None, vtv_vencimiento=None):
-    """Add a new vehicle to the database."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-        INSERT INTO vehiculos (
-            patente, area, tipo, marca, modelo, año, estado, km, 
-            fecha_service, taller, observaciones, pdf_files,
-            rori, id_vehiculo, vtv_vencimiento
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            patente, area, tipo, marca, modelo, año, estado, km, 
-            fecha_service, taller, observaciones, pdf_files,
-            rori, id_vehiculo, vtv_vencimiento
-        ))
-        
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        st.error(f"Error al agregar vehículo: {e}")
-        return False
-    finally:
-        conn.close()
-
-def update_vehicle(patente, **kwargs):
-    """Update vehicle information."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Build update query dynamically based on provided fields
-    fields = []
-    values = []
-    
-    for key, value in kwargs.items():
-        if key not in ["area", "tipo", "marca", "modelo", "año", "estado", "km", "fecha_service", "taller", "observaciones", "pdf_files", "rori", "id_vehiculo", "vtv_vencimiento"]:
-            continue
-        fields.append(f"{key} = ?")
-        values.append(value)
-    
-    # Add patente to values for WHERE clause
-    values.append(patente)
-    
-    try:
-        query = f"UPDATE vehiculos SET {', '.join(fields)} WHERE patente = ?"
-        cursor.execute(query, values)
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return False
-    finally:
-        conn.close()
-
-def delete_vehicle(patente):
-    """Delete a vehicle from the database."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # First check if the vehicle has any related records
-        cursor.execute("SELECT COUNT(*) FROM historial_service WHERE patente = ?", (patente,))
-        has_service = cursor.fetchone()[0] > 0
-        
-        cursor.execute("SELECT COUNT(*) FROM incidentes WHERE patente = ?", (patente,))
-        has_incidents = cursor.fetchone()[0] > 0
-        
-        if has_service or has_incidents:
-            return False
-        
-        cursor.execute("DELETE FROM vehiculos WHERE patente = ?", (patente,))
-        conn.commit()
-        return cursor.rowcount > 0
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return False
-    finally:
-        conn.close()
-
-def get_vehicle_by_patente(patente):
-    """Get a vehicle by its license plate number."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("SELECT * FROM vehiculos WHERE patente = ?", (patente,))
-        row = cursor.fetchone()
-        
-        if row:
-            columns = [col[0] for col in cursor.description]
-            vehicle = dict(zip(columns, row))
-            return vehicle
-        return None
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return None
-    finally:
-        conn.close()
-
-def add_service_record(patente, fecha, km, tipo_service, taller, costo, descripcion, pdf_files=None):
-    """Add a new service record for a vehicle."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Add service record
-        cursor.execute('''
-        INSERT INTO historial_service (patente, fecha, km, tipo_service, taller, costo, descripcion, pdf_files)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (patente, fecha, km, tipo_service, taller, costo, descripcion, pdf_files))
-        
-        # Update vehicle's current km and last service date
-        cursor.execute('''
-        UPDATE vehiculos 
-        SET km = ?, fecha_service = ?, taller = ?
-        WHERE patente = ?
-        ''', (km, fecha, taller, patente))
-        
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return False
-    finally:
-        conn.close()
-
-def add_incident(patente, fecha, tipo, descripcion, estado, pdf_files=None):
-    """Add a new incident record."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-        INSERT INTO incidentes (patente, fecha, tipo, descripcion, estado, pdf_files)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ''', (patente, fecha, tipo, descripcion, estado, pdf_files))
-        
-        conn.commit()
-        return True
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return False
-    finally:
-        conn.close()
-
-def get_service_history(patente=None):
-    """Get service history for a specific vehicle or all vehicles."""
-    engine = get_sqlalchemy_engine()
-    
-    if patente:
-        query = f'''
-        SELECT h.*, v.marca, v.modelo
-        FROM historial_service h
-        JOIN vehiculos v ON h.patente = v.patente
-        WHERE h.patente = '{patente}'
-        ORDER BY h.fecha DESC, h.id DESC
-        '''
-    else:
-        query = '''
-        SELECT h.*, v.marca, v.modelo
-        FROM historial_service h
-        JOIN vehiculos v ON h.patente = v.patente
-        ORDER BY h.fecha DESC, h.id DESC
-        '''
-    
-    try:
-        df = pd.read_sql(query, engine)
-        return df
-    except Exception as e:
-        print(f"Error loading service history: {e}")
-        return pd.DataFrame()
-
-def get_incidents(patente=None, estado=None):
-    """Get incidents for a specific vehicle or all vehicles, optionally filtered by status."""
-    engine = get_sqlalchemy_engine()
-    
-    conditions = []
-    if patente:
-        conditions.append(f"i.patente = '{patente}'")
-    if estado:
-        conditions.append(f"i.estado = '{estado}'")
-    
-    where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
-    
-    query = f'''
-    SELECT i.*, v.marca, v.modelo
-    FROM incidentes i
-    JOIN vehiculos v ON i.patente = v.patente
-    {where_clause}
-    ORDER BY i.fecha DESC, i.id DESC
-    '''
-    
-    try:
-        df = pd.read_sql(query, engine)
-        return df
-    except Exception as e:
-        print(f"Error loading incidents: {e}")
-        return pd.DataFrame()
-
-def get_stats():
-    """Get fleet statistics for reports."""
-    engine = get_sqlalchemy_engine()
-    
-    try:
-        # Vehicles by status
-        status_query = '''
-        SELECT estado, COUNT(*) as cantidad
-        FROM vehiculos
-        GROUP BY estado
-        '''
-        status_df = pd.read_sql(status_query, engine)
-        
-        # Vehicles by type
-        type_query = '''
-        SELECT tipo, COUNT(*) as cantidad
-        FROM vehiculos
-        GROUP BY tipo
-        '''
-        type_df = pd.read_sql(type_query, engine)
-        
-        # Vehicles by area
-        area_query = '''
-        SELECT area, COUNT(*) as cantidad
-        FROM vehiculos
-        GROUP BY area
-        '''
-        area_df = pd.read_sql(area_query, engine)
-        
-        # Service by month (last 12 months)
-        service_query = '''
-        SELECT strftime('%Y-%m', fecha) as mes, COUNT(*) as cantidad, SUM(costo) as costo_total
-        FROM historial_service
-        WHERE fecha >= date('now', '-12 months')
-        GROUP BY strftime('%Y-%m', fecha)
-        ORDER BY mes
-        '''
-        service_df = pd.read_sql(service_query, engine)
-        
-        # Incidents by status
-        incidents_query = '''
-        SELECT estado, COUNT(*) as cantidad
-        FROM incidentes
-        GROUP BY estado
-        '''
-        incidents_df = pd.read_sql(incidents_query, engine)
-        
-        return {
-            "status": status_df,
-            "type": type_df,
-            "area": area_df,
-            "service_by_month": service_df,
-            "incidents": incidents_df
-        }
-    except Exception as e:
-        print(f"Error loading stats: {e}")
-        return {
-            "status": pd.DataFrame(),
-            "type": pd.DataFrame(),
-            "area": pd.DataFrame(),
-            "service_by_month": pd.DataFrame(),
-            "incidents": pd.DataFrame()
-        }
-
-def process_uploaded_file(uploaded_file):
-    """Process an uploaded CSV file into a pandas DataFrame."""
-    try:
-        if uploaded_file.name.endswith('.csv'):
-            # Try UTF-8 first
-            try:
-                df = pd.read_csv(uploaded_file, sep=',', encoding='utf-8')
-            except UnicodeDecodeError:
-                # Try Latin-1 encoding if UTF-8 fails
-                uploaded_file.seek(0)
-                df = pd.read_csv(uploaded_file, sep=',', encoding='latin1')
-            
-            # Clean the DataFrame: remove empty rows and columns
-            df = df.dropna(how='all').reset_index(drop=True)  # Drop rows where all values are NaN
-            df = df.dropna(axis=1, how='all')  # Drop columns where all values are NaN
-            
-            # Detección específica para formato SEC DE GOBIERNO con estructura especial
-            # Buscar la fila que contiene "patente" como encabezado
-            header_row = None
-            for i, row in df.iterrows():
-                row_values = [str(x).lower().strip() for x in row.values if pd.notna(x)]
-                if 'patente' in row_values:
-                    header_row = i
-                    break
-            
-            if header_row is not None:
-                # Usar esta fila como encabezados y usar solo los datos posteriores
-                headers = [str(x).strip() if pd.notna(x) else f"col_{i}" for i, x in enumerate(df.iloc[header_row])]
-                df = pd.DataFrame(df.iloc[header_row+1:].values, columns=headers)
-                
-                # Filtrar filas vacías o que solo tienen formato 
-                df = df[df.iloc[:, 0].notna() & (df.iloc[:, 0].astype(str).str.strip() != '')]
-            
-            # Clean and standardize column names
-            df.columns = [str(c).strip().lower() for c in df.columns]
-            
-            # Map expected columns with expanded options, específicamente para SEC DE GOBIERNO
-            column_map = {
-                'patente': ['patente', 'dominio', 'placa', 'matricula', 'pt', 'chapa patente'],
-                'area': ['area', 'dependencia', 'seccion', 'departamento', 'ubicacion'],
-                'tipo': ['tipo', 'tipo de vehiculo', 'clase', 'tipo vehiculo', 'tipo vehículo'],
-                'marca': ['marca'],
-                'modelo': ['modelo'],
-                'año': ['año', 'ano', 'year', 'modelo año', 'a? - fecha alta', 'a? - fecha alta'],
-                'estado': ['estado', 'condicion', 'status'],
-                'km': ['km', 'kilometraje', 'kilometros', 'kms'],
-                'rori': ['rori', 'ro-ri'],          # Columna 7 en SEC DE GOBIERNO
-                'id_vehiculo': ['id', 'id vehiculo'], # Columna 8 en SEC DE GOBIERNO
-                'vtv_vencimiento': ['vtv'],         # Columna 15 en SEC DE GOBIERNO
-                'taller': ['taller']                # Columna 13 en SEC DE GOBIERNO
-            }
-            
-            # Create standardized dataframe
-            std_df = pd.DataFrame()
-            
-            # Map columns based on the standard names
-            for std_col, possible_cols in column_map.items():
-                for col in possible_cols:
-                    if col in df.columns:
-                        std_df[std_col] = df[col]
-                        break
-                if std_col not in std_df.columns:
-                    # Add empty column if not found
-                    if std_col == 'estado':
-                        std_df[std_col] = 'SERVICIO'  # Default value
-                    else:
-                        std_df[std_col] = ''
-            
-            # Para el archivo SEC DE GOBIERNO, manejar columnas por posición si no las encontramos por nombre
-            if len(std_df) > 0 and 'patente' in std_df.columns and std_df['patente'].notna().any():
-                # Si tenemos al menos una patente pero faltan las columnas específicas, intentamos por posición
-                if 'rori' not in std_df.columns or std_df['rori'].isna().all():
-                    try:
-                        # RO-RI es la columna 7
-                        std_df['rori'] = df.iloc[:, 7] if df.shape[1] > 7 else ''
-                    except:
-                        std_df['rori'] = ''
-                        
-                if 'id_vehiculo' not in std_df.columns or std_df['id_vehiculo'].isna().all():
-                    try:
-                        # ID es la columna 8
-                        std_df['id_vehiculo'] = df.iloc[:, 8] if df.shape[1] > 8 else ''
-                    except:
-                        std_df['id_vehiculo'] = ''
-                        
-                if 'taller' not in std_df.columns or std_df['taller'].isna().all():
-                    try:
-                        # TALLER es la columna 13
-                        std_df['taller'] = df.iloc[:, 13] if df.shape[1] > 13 else ''
-                    except:
-                        std_df['taller'] = ''
-                        
-                if 'vtv_vencimiento' not in std_df.columns or std_df['vtv_vencimiento'].isna().all():
-                    try:
-                        # VTV es la columna 15
-                        std_df['vtv_vencimiento'] = df.iloc[:, 15] if df.shape[1] > 15 else ''
-                    except:
-                        std_df['vtv_vencimiento'] = ''
-            
-            # Ensure numeric columns
-            if 'año' in std_df.columns:
-                # Limpiar valores no numéricos y reemplazar valores como '-' con NaN
-                std_df['año'] = std_df['año'].astype(str).replace(['-', 'nan', 'null', ''], np.nan)
-                # Extraer solo dígitos si hay texto mixto
-                std_df['año'] = std_df['año'].str.extract('(\d+)').fillna(np.nan)
-                # Convertir a numérico con manejo de errores
-                std_df['año'] = pd.to_numeric(std_df['año'], errors='coerce').fillna(0).astype(int)
-                
-            if 'km' in std_df.columns:
-                # Limpiar y manejar valores no numéricos
-                std_df['km'] = std_df['km'].astype(str).replace(['-', 'nan', 'null', ''], np.nan)
-                std_df['km'] = pd.to_numeric(std_df['km'], errors='coerce').fillna(0).astype(int)
-                
-            # Manejar id_vehiculo que es donde el error ocurre principalmente
-            if 'id_vehiculo' in std_df.columns:
-                # Reemplazar cualquier valor no numérico con NaN
-                std_df['id_vehiculo'] = std_df['id_vehiculo'].astype(str).replace(['-', 'nan', 'null', ''], np.nan)
-                # Intentar extraer solo la parte numérica si hay texto mixto
-                std_df['id_vehiculo'] = std_df['id_vehiculo'].str.extract('(\d+)').fillna(np.nan)
-                # Convertir a numérico con manejo de errores
-                std_df['id_vehiculo'] = pd.to_numeric(std_df['id_vehiculo'], errors='coerce').fillna(0).astype(int)
-                
-            # Remove duplicate vehicles
-            std_df = std_df.drop_duplicates(subset=['patente'])
-            
-            # Remove rows where patente is empty or just whitespace
-            std_df = std_df[std_df['patente'].astype(str).str.strip() != '']
-            
-            # Validate estado
-            valid_states = ['SERVICIO', 'RECUPERAR', 'RADIADO']
-            std_df['estado'] = std_df['estado'].astype(str).str.strip().str.upper()
-            std_df.loc[~std_df['estado'].isin(valid_states), 'estado'] = 'SERVICIO'
-            
-            return std_df
-        else:
-            st.error("El archivo debe ser un CSV.")
-            return None
-    except Exception as e:
-        st.error(f"Error al procesar el archivo: {e}")
-        import traceback
-        st.write(traceback.format_exc())
-        return None
-
-def import_vehicles_from_df(df):
-    """Import vehicles from a DataFrame into the database."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    success_count = 0
-    error_count = 0
-    error_plates = []
-    
-    for _, row in df.iterrows():
-        try:
-            # Check if the vehicle already exists
-            cursor.execute("SELECT patente FROM vehiculos WHERE patente = ?", (row['patente'],))
-            exists = cursor.fetchone()
-            
-            if exists:
-                # Update existing vehicle
-                fields = []
-                values = []
-                
-                for col, db_col in [
-                    ('area', 'area'), ('tipo', 'tipo'), ('marca', 'marca'), ('modelo', 'modelo'),
-                    ('año', 'año'), ('estado', 'estado'), ('km', 'km'), ('taller', 'taller'),
-                    ('rori', 'rori'), ('id_vehiculo', 'id_vehiculo'), ('vtv_vencimiento', 'vtv_vencimiento')
-                ]:
-                    if col in row and not pd.isna(row[col]):
-                        fields.append(f"{db_col} = ?")
-                        values.append(row[col])
-                
-                if fields:
-                    # Add patente to values for WHERE clause
-                    values.append(row['patente'])
-                    
-                    query = f"UPDATE vehiculos SET {', '.join(fields)} WHERE patente = ?"
-                    cursor.execute(query, values)
-                    success_count += 1
-                else:
-                    error_count += 1
-                    error_plates.append(row['patente'])
-            else:
-                # Insert new vehicle
-                cursor.execute('''
-                INSERT INTO vehiculos (
-                    patente, area, tipo, marca, modelo, año, estado, km,
-                    taller, rori, id_vehiculo, vtv_vencimiento
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    row['patente'],
-                    row.get('area', ''),
-                    row.get('tipo', ''),
-                    row.get('marca', ''),
-                    row.get('modelo', ''),
-                    row.get('año', 0),
-                    row.get('estado', 'SERVICIO'),
-                    row.get('km', 0),
-                    row.get('taller', ''),
-                    row.get('rori', ''),
-                    row.get('id_vehiculo', 0),
-                    row.get('vtv_vencimiento', '')
-                ))
-                success_count += 1
-        except Exception as e:
-            print(f"Error importing vehicle {row.get('patente', 'unknown')}: {e}")
-            error_count += 1
-            error_plates.append(row.get('patente', 'unknown'))
-    
-    conn.commit()
-    conn.close()
-    
-    return success_count, error_count, error_plates
-
-def process_pdf_files(uploaded_files):
-    """Process uploaded PDF files and return a JSON string with the file data."""
-    if not uploaded_files:
-        return None
-    
-    pdf_data = []
-    
-    for uploaded_file in uploaded_files:
-        file_bytes = uploaded_file.read()
-        encoded = base64.b64encode(file_bytes).decode()
-        
-        pdf_data.append({
-            "name": uploaded_file.name,
-            "content": encoded,
-            "type": "application/pdf",
-            "size": len(file_bytes)
-        })
-    
-    return json.dumps(pdf_data)
-
-def get_pdf_download_links(pdf_files_json):
-    """Generate HTML download links for PDF files stored in the database."""
-    if not pdf_files_json:
-        return None
-    
-    try:
-        pdf_files = json.loads(pdf_files_json)
-        html_links = ""
-        
-        for i, pdf in enumerate(pdf_files):
-            # Create a download link with base64 data
-            file_name = pdf.get("name", f"documento_{i+1}.pdf")
-            b64_content = pdf.get("content", "")
-            
-            if b64_content:
-                html_links += f'<p><a href="data:application/pdf;base64,{b64_content}" download="{file_name}" target="_blank">{file_name}</a></p>'
-        
-        return html_links
-    except Exception as e:
-        print(f"Error generating PDF links: {e}")
-        return None
\ No newline at end of file
+import os
+import json
+import base64
+import sqlite3
+import threading
+import smtplib
+import time
+import zlib
+import pandas as pd
+import streamlit as st
+from datetime import datetime, timedelta
+from functools import lru_cache
+from email.mime.text import MIMEText
+from sqlalchemy import create_engine, event
+
+# Driver ADBC opcional: transfiere los resultados en formato columnar (Arrow) en lugar
+# de crear un objeto Python por celda
+try:
+    import adbc_driver_sqlite.dbapi as adbc_sqlite
+except ImportError:
+    adbc_sqlite = None
+
+# JSON de los índices de PDFs con orjson si está instalado
+try:
+    import orjson
+    def _json_dumps(obj):
+        return orjson.dumps(obj).decode()
+    _json_loads = orjson.loads
+except ImportError:
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
+# Función para obtener la ruta de la base de datos SQLite
+def get_database_path():
+    if 'DATABASE_FILE' in os.environ:
+        return os.environ['DATABASE_FILE']
+    # Fallback al directorio actual
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    os.makedirs(data_dir, exist_ok=True)
+    return os.path.join(data_dir, "flota_vehicular.db")
+
+SCHEMA_DDL = '''
+-- Create vehicles table
+CREATE TABLE IF NOT EXISTS vehiculos (
+    patente TEXT PRIMARY KEY,
+    area TEXT,
+    tipo TEXT,
+    marca TEXT,
+    modelo TEXT,
+    año INTEGER,
+    estado TEXT DEFAULT 'SERVICIO',
+    km INTEGER DEFAULT 0,
+    fecha_service TEXT,
+    taller TEXT,
+    observaciones TEXT,
+    pdf_files TEXT,
+    fecha_alta TEXT DEFAULT CURRENT_DATE,
+    rori TEXT,
+    id_vehiculo INTEGER,
+    vtv_vencimiento TEXT
+);
+
+-- Create service history table
+CREATE TABLE IF NOT EXISTS historial_service (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patente TEXT,
+    fecha TEXT,
+    km INTEGER,
+    tipo_service TEXT,
+    taller TEXT,
+    costo REAL,
+    descripcion TEXT,
+    pdf_files TEXT,
+    FOREIGN KEY (patente) REFERENCES vehiculos (patente)
+);
+
+-- Create incidents table
+CREATE TABLE IF NOT EXISTS incidentes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patente TEXT,
+    fecha TEXT,
+    tipo TEXT,
+    descripcion TEXT,
+    estado TEXT DEFAULT 'PENDIENTE',
+    pdf_files TEXT,
+    FOREIGN KEY (patente) REFERENCES vehiculos (patente)
+);
+
+-- Create maintenance schedule table
+CREATE TABLE IF NOT EXISTS programacion_mantenimiento (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patente TEXT,
+    fecha_programada TEXT,
+    km_programado INTEGER,
+    tipo_service TEXT,
+    descripcion TEXT,
+    estado TEXT DEFAULT 'PENDIENTE',
+    recordatorio_enviado BOOLEAN DEFAULT FALSE,
+    FOREIGN KEY (patente) REFERENCES vehiculos (patente)
+);
+
+-- PDF attachments are stored as raw BLOBs; the pdf_files columns only keep a small JSON index
+CREATE TABLE IF NOT EXISTS pdf_blobs (
+    id INTEGER PRIMARY KEY,
+    entity_type TEXT,
+    entity_id TEXT,
+    name TEXT,
+    content BLOB,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_pdf_blobs_entity ON pdf_blobs(entity_type, entity_id);
+
+-- Indexes for per-vehicle lookups (ordered by date) and the stats date range
+CREATE INDEX IF NOT EXISTS idx_hs_patente_fecha ON historial_service(patente, fecha DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_hs_fecha ON historial_service(fecha);
+CREATE INDEX IF NOT EXISTS idx_inc_patente_estado_fecha ON incidentes(patente, estado, fecha DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_prog_patente ON programacion_mantenimiento(patente);
+CREATE INDEX IF NOT EXISTS idx_vehiculos_vtv ON vehiculos(vtv_vencimiento);
+-- Partial index with only the schedules still waiting for a reminder, walked in id order
+-- by the keyset pagination of iter_maintenance_reminders
+CREATE INDEX IF NOT EXISTS idx_prog_pendientes ON programacion_mantenimiento(id)
+WHERE estado = 'PENDIENTE' AND (recordatorio_enviado IS NULL OR recordatorio_enviado = 0);
+'''
+
+# Stored in PRAGMA user_version: a checksum of the DDL, so the script runs again whenever
+# it changes (or the file was created by the other database module) without manual bumps
+SCHEMA_VERSION = zlib.crc32(SCHEMA_DDL.encode()) & 0x7FFFFFFF
+
+def init_database():
+    """Initialize the database and create tables if they don't exist.
+    
+    The whole schema runs as one script in a single transaction (one commit instead
+    of one per statement) and is skipped when the database is already up to date.
+    """
+    conn = get_connection()
+    
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        conn.executescript(f"BEGIN;\n{SCHEMA_DDL}\nPRAGMA user_version = {SCHEMA_VERSION};\nCOMMIT;")
+    
+    conn.close()
+
+# Per-connection SQLite settings: WAL (readers do not block the writer), one fsync per
+# checkpoint instead of per commit, temp tables in memory, 256 MB mmap and ~20 MB page cache
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-20000",
+)
+
+def get_connection():
+    """Get a database connection from the shared pool; close() returns it to the pool."""
+    return get_sqlalchemy_engine().raw_connection()
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply SQLITE_PRAGMAS once to each new pooled connection."""
+    for pragma in SQLITE_PRAGMAS:
+        dbapi_connection.execute(pragma)
+
+@st.cache_resource(show_spinner=False)
+def _create_engine(db_path):
+    engine = create_engine(f'sqlite:///{db_path}')
+    event.listen(engine, 'connect', _set_sqlite_pragmas)
+    return engine
+
+def get_sqlalchemy_engine():
+    """Get the SQLAlchemy engine for the database file, shared across reruns."""
+    return _create_engine(get_database_path())
+
+@st.cache_resource(show_spinner=False)
+def _adbc_connection(db_path):
+    """Shared ADBC connection for the database file (with its lock), set up like the pooled ones."""
+    # autocommit: sin una transacción de lectura abierta que fije una instantánea vieja del WAL
+    conn = adbc_sqlite.connect(db_path, autocommit=True)
+    with conn.cursor() as cursor:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+            cursor.fetchall()
+    return conn, threading.Lock()
+
+def dispose_connections():
+    """Close the pooled and ADBC connections, e.g. before a backup is restored over the file."""
+    db_path = get_database_path()
+    _create_engine(db_path).dispose()
+    _create_engine.clear()
+    if adbc_sqlite is not None:
+        conn, lock = _adbc_connection(db_path)
+        with lock:
+            conn.close()
+        _adbc_connection.clear()
+
+def _read_sql(query, params=()):
+    """Read a qmark-parameterized query into a DataFrame, through ADBC when the driver is installed."""
+    if adbc_sqlite is not None:
+        conn, lock = _adbc_connection(get_database_path())
+        try:
+            with lock, conn.cursor() as cursor:
+                cursor.execute(query, tuple(params) or None)
+                df = cursor.fetch_arrow_table().to_pandas()
+            # Las columnas sin ningún valor llegan como NaN (verdadero en un if); se dejan
+            # en None como las devuelve SQLAlchemy
+            for col in df.columns[df.isna().all()]:
+                df[col] = pd.Series([None] * len(df), index=df.index, dtype=object)
+            return df
+        except adbc_sqlite.Error as e:
+            # ADBC infiere el tipo de cada columna y puede fallar si una columna mezcla
+            # tipos (SQLite no los impone); se lee por SQLAlchemy
+            print(f"ADBC read failed, falling back to SQLAlchemy: {e}")
+    return pd.read_sql(query, get_sqlalchemy_engine(), params=tuple(params) or None)
+
+# Smaller integer types for the numeric vehicle columns (int64 by default)
+_SHRINK_DTYPES = {'año': 'int16', 'km': 'int32', 'id_vehiculo': 'int32'}
+
+def _shrink(df):
+    """Downcast the integer vehicle columns of a query result.
+
+    Columns with NULLs or values that do not fit the smaller type are left as read.
+    """
+    for col, dtype in _SHRINK_DTYPES.items():
+        if col in df.columns and df[col].notna().all():
+            try:
+                values = df[col].astype(dtype)
+            except (TypeError, ValueError):
+                continue
+            if (values == df[col]).all():
+                df[col] = values
+    return df
+
+# Listings and stats are cached across Streamlit reruns (every widget interaction reruns
+# the page); the write helpers below drop the cache as soon as the data changes
+READ_CACHE_TTL = 60
+
+def invalidate_cached_reads():
+    """Drop the cached vehicle listings and stats after a write.
+
+    Public so backup_manager can call it after restoring or importing a database.
+    """
+    load_vehicles.clear()
+    get_stats.clear()
+
+@st.cache_data(ttl=READ_CACHE_TTL, show_spinner=False)
+def load_vehicles(search_term=None):
+    """Load all vehicles from the database with optional search filter."""
+    if search_term:
+        query = '''
+        SELECT * FROM vehiculos
+        WHERE patente LIKE ?
+        OR area LIKE ?
+        OR tipo LIKE ?
+        OR marca LIKE ?
+        OR modelo LIKE ?
+        OR estado LIKE ?
+        ORDER BY patente
+        '''
+        params = (f'%{search_term}%',) * 6
+    else:
+        query = 'SELECT * FROM vehiculos ORDER BY patente'
+        params = ()
+    
+    df = _read_sql(query, params)
+    return _shrink(df)
+
+def add_vehicle(patente, area, tipo, marca, modelo, año, estado, km=0, fecha_service=None, taller=None, observaciones=None, pdf_files=None, rori=None, id_vehiculo=None, vtv_vencimiento=None):
+    """Add a new vehicle to the database."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+        INSERT INTO vehiculos (
+            patente, area, tipo, marca, modelo, año, estado, km, 
+            fecha_service, taller, observaciones, pdf_files,
+            rori, id_vehiculo, vtv_vencimiento
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            patente, area, tipo, marca, modelo, año, estado, km, 
+            fecha_service, taller, observaciones, pdf_files,
+            rori, id_vehiculo, vtv_vencimiento
+        ))
+        _link_pdf_blobs(cursor, pdf_files, 'vehiculos', patente)
+        
+        conn.commit()
+        invalidate_cached_reads()
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        st.error(f"Error al agregar vehículo: {e}")
+        _discard_pdf_blobs(conn, pdf_files)
+        return False
+    finally:
+        conn.close()
+
+@lru_cache(maxsize=64)
+def _update_vehicle_sql(fields):
+    """Build the UPDATE statement for a tuple of columns, memoized per column set."""
+    return f"UPDATE vehiculos SET {', '.join(f'{key} = ?' for key in fields)} WHERE patente = ?"
+
+def update_vehicle(patente, **kwargs):
+    """Update vehicle information."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    # Build update query dynamically based on provided fields
+    fields = []
+    values = []
+    
+    for key, value in kwargs.items():
+        if key not in ["area", "tipo", "marca", "modelo", "año", "estado", "km", "fecha_service", "taller", "observaciones", "pdf_files", "rori", "id_vehiculo", "vtv_vencimiento"]:
+            continue
+        fields.append(key)
+        values.append(value)
+    
+    # Add patente to values for WHERE clause
+    values.append(patente)
+    
+    try:
+        cursor.execute(_update_vehicle_sql(tuple(fields)), values)
+        if 'pdf_files' in fields:
+            # Los PDF nuevos reemplazan a los anteriores, que se borran
+            _link_pdf_blobs(cursor, kwargs['pdf_files'], 'vehiculos', patente, replace=True)
+        conn.commit()
+        invalidate_cached_reads()
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        _discard_pdf_blobs(conn, kwargs.get('pdf_files'))
+        return False
+    finally:
+        conn.close()
+
+def delete_vehicle(patente):
+    """Delete a vehicle from the database."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        # First check if the vehicle has any related records
+        cursor.execute("SELECT COUNT(*) FROM historial_service WHERE patente = ?", (patente,))
+        has_service = cursor.fetchone()[0] > 0
+        
+        cursor.execute("SELECT COUNT(*) FROM incidentes WHERE patente = ?", (patente,))
+        has_incidents = cursor.fetchone()[0] > 0
+        
+        if has_service or has_incidents:
+            return False
+        
+        cursor.execute("DELETE FROM vehiculos WHERE patente = ?", (patente,))
+        cursor.execute("DELETE FROM pdf_blobs WHERE entity_type = 'vehiculos' AND entity_id = ?", (patente,))
+        conn.commit()
+        invalidate_cached_reads()
+        return cursor.rowcount > 0
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return False
+    finally:
+        conn.close()
+
+# Columnas de vehiculos que se pueden pedir por separado en get_vehicle_by_patente;
+# los nombres se interpolan en el SQL, así que sólo se aceptan los de esta lista
+VEHICLE_COLUMNS = frozenset((
+    "patente", "area", "tipo", "marca", "modelo", "año", "estado", "km", "fecha_service",
+    "taller", "observaciones", "pdf_files", "fecha_alta", "rori", "id_vehiculo",
+    "vtv_vencimiento",
+))
+
+def get_vehicle_by_patente(patente, columns=None):
+    """Get a vehicle by its license plate number.
+
+    Pass ``columns`` to read only those fields; callers that just need a label
+    skip the pdf_files JSON and the other free-text columns that way.
+    """
+    if columns:
+        unknown = set(columns) - VEHICLE_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown vehicle columns: {sorted(unknown)}")
+        select = ", ".join(columns)
+    else:
+        select = "*"
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute(f"SELECT {select} FROM vehiculos WHERE patente = ?", (patente,))
+        row = cursor.fetchone()
+        
+        if row:
+            columns = [col[0] for col in cursor.description]
+            vehicle = dict(zip(columns, row))
+            return vehicle
+        return None
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+    finally:
+        conn.close()
+
+def add_service_record(patente, fecha, km, tipo_service, taller, costo, descripcion, pdf_files=None):
+    """Add a new service record for a vehicle."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        # Add service record
+        cursor.execute('''
+        INSERT INTO historial_service (patente, fecha, km, tipo_service, taller, costo, descripcion, pdf_files)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (patente, fecha, km, tipo_service, taller, costo, descripcion, pdf_files))
+        _link_pdf_blobs(cursor, pdf_files, 'historial_service', cursor.lastrowid)
+        
+        # Update vehicle's current km and last service date
+        cursor.execute('''
+        UPDATE vehiculos 
+        SET km = ?, fecha_service = ?, taller = ?
+        WHERE patente = ?
+        ''', (km, fecha, taller, patente))
+        
+        conn.commit()
+        invalidate_cached_reads()
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        _discard_pdf_blobs(conn, pdf_files)
+        return False
+    finally:
+        conn.close()
+
+def add_incident(patente, fecha, tipo, descripcion, estado, pdf_files=None):
+    """Add a new incident record."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+        INSERT INTO incidentes (patente, fecha, tipo, descripcion, estado, pdf_files)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', (patente, fecha, tipo, descripcion, estado, pdf_files))
+        _link_pdf_blobs(cursor, pdf_files, 'incidentes', cursor.lastrowid)
+        
+        conn.commit()
+        invalidate_cached_reads()
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        _discard_pdf_blobs(conn, pdf_files)
+        return False
+    finally:
+        conn.close()
+
+def get_service_history(patente=None):
+    """Get service history for a specific vehicle or all vehicles."""
+    if patente:
+        query = '''
+        SELECT h.*, v.marca, v.modelo
+        FROM historial_service h
+        JOIN vehiculos v ON h.patente = v.patente
+        WHERE h.patente = ?
+        ORDER BY h.fecha DESC, h.id DESC
+        '''
+        params = (patente,)
+    else:
+        query = '''
+        SELECT h.*, v.marca, v.modelo
+        FROM historial_service h
+        JOIN vehiculos v ON h.patente = v.patente
+        ORDER BY h.fecha DESC, h.id DESC
+        '''
+        params = ()
+    
+    try:
+        df = _read_sql(query, params)
+        return _shrink(df)
+    except Exception as e:
+        print(f"Error loading service history: {e}")
+        return pd.DataFrame()
+
+def get_incidents(patente=None, estado=None):
+    """Get incidents for a specific vehicle or all vehicles, optionally filtered by status."""
+    conditions = []
+    params = []
+    if patente:
+        conditions.append("i.patente = ?")
+        params.append(patente)
+    if estado:
+        conditions.append("i.estado = ?")
+        params.append(estado)
+    
+    where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+    
+    query = f'''
+    SELECT i.*, v.marca, v.modelo
+    FROM incidentes i
+    JOIN vehiculos v ON i.patente = v.patente
+    {where_clause}
+    ORDER BY i.fecha DESC, i.id DESC
+    '''
+    
+    try:
+        df = _read_sql(query, params)
+        return df
+    except Exception as e:
+        print(f"Error loading incidents: {e}")
+        return pd.DataFrame()
+
+@st.cache_data(ttl=READ_CACHE_TTL, show_spinner=False)
+def get_stats():
+    """Get fleet statistics for reports."""
+    engine = get_sqlalchemy_engine()
+    
+    try:
+        # Single round-trip: every aggregate tagged and stacked with UNION ALL
+        stats_query = '''
+        SELECT 'status' AS tag, estado AS k, COUNT(*) AS n, NULL AS total
+        FROM vehiculos
+        GROUP BY estado
+        UNION ALL
+        SELECT 'type', tipo, COUNT(*), NULL
+        FROM vehiculos
+        GROUP BY tipo
+        UNION ALL
+        SELECT 'area', area, COUNT(*), NULL
+        FROM vehiculos
+        GROUP BY area
+        UNION ALL
+        SELECT 'service', strftime('%Y-%m', fecha), COUNT(*), SUM(costo)
+        FROM historial_service
+        WHERE fecha >= date('now', '-12 months')
+        GROUP BY strftime('%Y-%m', fecha)
+        UNION ALL
+        SELECT 'incidents', estado, COUNT(*), NULL
+        FROM incidentes
+        GROUP BY estado
+        '''
+        stats = pd.read_sql(stats_query, engine)
+        if stats.empty:
+            stats = pd.DataFrame(columns=['tag', 'k', 'n', 'total'])
+        
+        def _split(tag, key, with_total=False):
+            part = stats[stats['tag'] == tag]
+            columns = {'k': key, 'n': 'cantidad'}
+            if with_total:
+                columns['total'] = 'costo_total'
+            return part[list(columns)].rename(columns=columns).reset_index(drop=True)
+        
+        status_df = _split('status', 'estado')
+        type_df = _split('type', 'tipo')
+        area_df = _split('area', 'area')
+        service_df = _split('service', 'mes', with_total=True).sort_values('mes', ignore_index=True)
+        incidents_df = _split('incidents', 'estado')
+        
+        return {
+            "status": status_df,
+            "type": type_df,
+            "area": area_df,
+            "service_by_month": service_df,
+            "incidents": incidents_df
+        }
+    except Exception as e:
+        print(f"Error loading stats: {e}")
+        return {
+            "status": pd.DataFrame(),
+            "type": pd.DataFrame(),
+            "area": pd.DataFrame(),
+            "service_by_month": pd.DataFrame(),
+            "incidents": pd.DataFrame()
+        }
+
+def get_vtv_proximos_vencer(dias=30):
+    """Get the vehicles whose VTV expires between today and ``dias`` days from now.
+    
+    vtv_vencimiento is stored as ISO text (YYYY-MM-DD), so a half-open range on the
+    raw column sorts like the dates and can seek idx_vehiculos_vtv instead of
+    wrapping every row in date().
+    """
+    today = datetime.now().date()
+    cutoff = today + timedelta(days=int(dias) + 1)
+    query = '''
+    SELECT patente, marca, modelo, area, vtv_vencimiento
+    FROM vehiculos
+    WHERE vtv_vencimiento >= ?
+    AND vtv_vencimiento < ?
+    ORDER BY vtv_vencimiento
+    '''
+    
+    try:
+        return _read_sql(query, (today.isoformat(), cutoff.isoformat()))
+    except Exception as e:
+        print(f"Error loading VTV expirations: {e}")
+        return pd.DataFrame()
+
+def iter_maintenance_reminders(dias=7, batch_size=100):
+    """Yield pending maintenance reminders one at a time as dicts.
+    
+    Rows are read in keyset-paginated batches so memory stays bounded and no
+    read lock is held on the database while the caller sends each reminder.
+    """
+    query = '''
+    SELECT m.*, v.marca, v.modelo, v.km as km_actual, v.area
+    FROM programacion_mantenimiento m
+    JOIN vehiculos v ON m.patente = v.patente
+    WHERE m.estado = 'PENDIENTE'
+    AND (m.recordatorio_enviado IS NULL OR m.recordatorio_enviado = 0)
+    AND (
+        (m.fecha_programada IS NOT NULL AND m.fecha_programada != ''
+         AND m.fecha_programada < ?)
+        OR (m.km_programado > 0 AND v.km >= m.km_programado)
+    )
+    AND m.id > ?
+    ORDER BY m.id
+    LIMIT ?
+    '''
+    # fecha_programada is ISO text: comparing the raw column against the day after the
+    # window is the same test as date(fecha_programada) <= today + dias, without the call
+    cutoff = (datetime.now().date() + timedelta(days=int(dias) + 1)).isoformat()
+    last_id = 0
+    
+    while True:
+        conn = get_connection()
+        try:
+            cursor = conn.execute(query, (cutoff, last_id, batch_size))
+            columns = [col[0] for col in cursor.description]
+            rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return
+        finally:
+            conn.close()
+        
+        for row in rows:
+            yield dict(zip(columns, row))
+        
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1][columns.index('id')]
+
+def bulk_mark_reminders_sent(ids):
+    """Flag the given maintenance schedules as reminded in a single transaction."""
+    rows = [(int(schedule_id),) for schedule_id in ids]
+    if not rows:
+        return True
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        cursor.executemany(
+            "UPDATE programacion_mantenimiento SET recordatorio_enviado = 1 WHERE id = ?",
+            rows
+        )
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return False
+    finally:
+        conn.close()
+
+def _to_int(series, extract_digits=True):
+    """Convert a column of mixed text to int32 in one pass; unparseable values become 0."""
+    values = series.astype('string')
+    if extract_digits:
+        # Extraer solo dígitos si hay texto mixto
+        values = values.str.extract(r'(\d+)', expand=False)
+    return pd.to_numeric(values, errors='coerce').fillna(0).astype('int32')
+
+def process_uploaded_file(uploaded_file):
+    """Process an uploaded CSV file into a pandas DataFrame."""
+    try:
+        if uploaded_file.name.endswith('.csv'):
+            # Try UTF-8 first
+            try:
+                df = pd.read_csv(uploaded_file, sep=',', encoding='utf-8')
+            except UnicodeDecodeError:
+                # Try Latin-1 encoding if UTF-8 fails
+                uploaded_file.seek(0)
+                df = pd.read_csv(uploaded_file, sep=',', encoding='latin1')
+            
+            # Clean the DataFrame: remove empty rows and columns
+            df = df.dropna(how='all').reset_index(drop=True)  # Drop rows where all values are NaN
+            df = df.dropna(axis=1, how='all')  # Drop columns where all values are NaN
+            
+            # Detección específica para formato SEC DE GOBIERNO con estructura especial
+            # Buscar la fila que contiene "patente" como encabezado
+            # (comparación vectorizada de todas las celdas, en lugar de recorrer fila por fila)
+            is_header = df.apply(lambda col: col.astype(str).str.strip().str.lower()).eq('patente').any(axis=1)
+            header_row = is_header.idxmax() if is_header.any() else None
+            
+            if header_row is not None:
+                # Usar esta fila como encabezados y usar solo los datos posteriores
+                headers = [str(x).strip() if pd.notna(x) else f"col_{i}" for i, x in enumerate(df.iloc[header_row])]
+                df = pd.DataFrame(df.iloc[header_row+1:].values, columns=headers)
+                
+                # Filtrar filas vacías o que solo tienen formato 
+                df = df[df.iloc[:, 0].notna() & (df.iloc[:, 0].astype(str).str.strip() != '')]
+            
+            # Clean and standardize column names
+            df.columns = [str(c).strip().lower() for c in df.columns]
+            
+            # Map expected columns with expanded options, específicamente para SEC DE GOBIERNO
+            column_map = {
+                'patente': ['patente', 'dominio', 'placa', 'matricula', 'pt', 'chapa patente'],
+                'area': ['area', 'dependencia', 'seccion', 'departamento', 'ubicacion'],
+                'tipo': ['tipo', 'tipo de vehiculo', 'clase', 'tipo vehiculo', 'tipo vehículo'],
+                'marca': ['marca'],
+                'modelo': ['modelo'],
+                'año': ['año', 'ano', 'year', 'modelo año', 'a? - fecha alta', 'a? - fecha alta'],
+                'estado': ['estado', 'condicion', 'status'],
+                'km': ['km', 'kilometraje', 'kilometros', 'kms'],
+                'rori': ['rori', 'ro-ri'],          # Columna 7 en SEC DE GOBIERNO
+                'id_vehiculo': ['id', 'id vehiculo'], # Columna 8 en SEC DE GOBIERNO
+                'vtv_vencimiento': ['vtv'],         # Columna 15 en SEC DE GOBIERNO
+                'taller': ['taller']                # Columna 13 en SEC DE GOBIERNO
+            }
+            
+            # Pick the first matching source column for each standard name in a single pass
+            available = set(df.columns)
+            source_cols = {
+                std_col: next((col for col in possible_cols if col in available), None)
+                for std_col, possible_cols in column_map.items()
+            }
+            
+            # Create standardized dataframe in one construction; columns not found get
+            # a default value (rows come from the patente column, as before)
+            std_df = pd.DataFrame(
+                {
+                    std_col: df[col] if col is not None else ('SERVICIO' if std_col == 'estado' else '')
+                    for std_col, col in source_cols.items()
+                },
+                index=df.index if source_cols['patente'] is not None else pd.RangeIndex(0)
+            )
+            
+            # Para el archivo SEC DE GOBIERNO, manejar columnas por posición si no las encontramos por nombre
+            if len(std_df) > 0 and 'patente' in std_df.columns and std_df['patente'].notna().any():
+                # Si tenemos al menos una patente pero faltan las columnas específicas, intentamos por posición
+                if 'rori' not in std_df.columns or std_df['rori'].isna().all():
+                    try:
+                        # RO-RI es la columna 7
+                        std_df['rori'] = df.iloc[:, 7] if df.shape[1] > 7 else ''
+                    except:
+                        std_df['rori'] = ''
+                        
+                if 'id_vehiculo' not in std_df.columns or std_df['id_vehiculo'].isna().all():
+                    try:
+                        # ID es la columna 8
+                        std_df['id_vehiculo'] = df.iloc[:, 8] if df.shape[1] > 8 else ''
+                    except:
+                        std_df['id_vehiculo'] = ''
+                        
+                if 'taller' not in std_df.columns or std_df['taller'].isna().all():
+                    try:
+                        # TALLER es la columna 13
+                        std_df['taller'] = df.iloc[:, 13] if df.shape[1] > 13 else ''
+                    except:
+                        std_df['taller'] = ''
+                        
+                if 'vtv_vencimiento' not in std_df.columns or std_df['vtv_vencimiento'].isna().all():
+                    try:
+                        # VTV es la columna 15
+                        std_df['vtv_vencimiento'] = df.iloc[:, 15] if df.shape[1] > 15 else ''
+                    except:
+                        std_df['vtv_vencimiento'] = ''
+            
+            # Ensure numeric columns
+            if 'año' in std_df.columns:
+                std_df['año'] = _to_int(std_df['año'])
+                
+            if 'km' in std_df.columns:
+                # Los valores no numéricos ('-', texto) quedan en 0
+                std_df['km'] = _to_int(std_df['km'], extract_digits=False)
+                
+            # Manejar id_vehiculo que es donde el error ocurre principalmente
+            if 'id_vehiculo' in std_df.columns:
+                std_df['id_vehiculo'] = _to_int(std_df['id_vehiculo'])
+                
+            # Remove duplicate vehicles
+            std_df = std_df.drop_duplicates(subset=['patente'])
+            
+            # Remove rows where patente is empty or just whitespace
+            std_df = std_df[std_df['patente'].astype(str).str.strip() != '']
+            
+            # Validate estado
+            valid_states = ['SERVICIO', 'RECUPERAR', 'RADIADO']
+            std_df['estado'] = std_df['estado'].astype(str).str.strip().str.upper()
+            std_df.loc[~std_df['estado'].isin(valid_states), 'estado'] = 'SERVICIO'
+            
+            return std_df
+        else:
+            st.error("El archivo debe ser un CSV.")
+            return None
+    except Exception as e:
+        st.error(f"Error al procesar el archivo: {e}")
+        import traceback
+        st.write(traceback.format_exc())
+        return None
+
+# Columns imported from a DataFrame and the value inserted when the column is missing
+_IMPORT_COLUMNS = [
+    ('area', ''), ('tipo', ''), ('marca', ''), ('modelo', ''), ('año', 0),
+    ('estado', 'SERVICIO'), ('km', 0), ('taller', ''), ('rori', ''),
+    ('id_vehiculo', 0), ('vtv_vencimiento', '')
+]
+
+def import_vehicles_from_df(df):
+    """Import vehicles from a DataFrame into the database.
+
+    New plates are inserted and existing ones updated with batched executemany
+    calls. Updates only overwrite the columns that have a value in the DataFrame.
+    If a batch fails it is retried row by row to report the offending plates.
+    """
+    columns = [col for col, _ in _IMPORT_COLUMNS]
+    missing = {col: default for col, default in _IMPORT_COLUMNS if col not in df.columns}
+    
+    # Python objects with None instead of NaN, ready to bind
+    data = df.reindex(columns=['patente'] + columns).astype(object)
+    data = data.where(data.notna(), None)
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    success_count = 0
+    error_count = 0
+    error_plates = []
+    
+    # Split rows into inserts and updates with a single lookup of the existing plates
+    existing = {row[0] for row in cursor.execute("SELECT patente FROM vehiculos")}
+    inserts = []
+    updates = []
+    for record in data.itertuples(index=False, name=None):
+        patente, values = record[0], record[1:]
+        if patente in existing:
+            if all(value is None for value in values):
+                error_count += 1
+                error_plates.append(patente)
+            else:
+                updates.append(values + (patente,))
+        else:
+            existing.add(patente)
+            inserts.append((patente,) + tuple(missing.get(col, value) for col, value in zip(columns, values)))
+    
+    insert_query = f'''
+    INSERT INTO vehiculos (patente, {', '.join(columns)})
+    VALUES ({', '.join('?' * (len(columns) + 1))})
+    '''
+    update_query = f'''
+    UPDATE vehiculos SET {', '.join(f"{col} = COALESCE(?, {col})" for col in columns)}
+    WHERE patente = ?
+    '''
+    
+    # Inserts first, so repeated plates in the same file update the row just inserted
+    for query, rows, patente_index in [(insert_query, inserts, 0), (update_query, updates, -1)]:
+        if not rows:
+            continue
+        cursor.execute("SAVEPOINT import_batch")
+        try:
+            cursor.executemany(query, rows)
+            cursor.execute("RELEASE import_batch")
+            success_count += len(rows)
+        except sqlite3.Error:
+            cursor.execute("ROLLBACK TO import_batch")
+            cursor.execute("RELEASE import_batch")
+            for row in rows:
+                try:
+                    cursor.execute(query, row)
+                    success_count += 1
+                except Exception as e:
+                    print(f"Error importing vehicle {row[patente_index]}: {e}")
+                    error_count += 1
+                    error_plates.append(row[patente_index])
+    
+    conn.commit()
+    invalidate_cached_reads()
+    conn.close()
+    
+    return success_count, error_count, error_plates
+
+def process_pdf_files(uploaded_files):
+    """Store uploaded PDF files as BLOBs and return a JSON string referencing them.
+    
+    The blobs stay unowned until the record that references them is saved (see
+    _link_pdf_blobs). Database errors are raised so the caller does not save the
+    record without its attachments.
+    """
+    if not uploaded_files:
+        return None
+    
+    pdf_data = []
+    conn = get_connection()
+    
+    try:
+        for uploaded_file in uploaded_files:
+            # UploadedFile expone su contenido como memoryview, sin copiarlo
+            if hasattr(uploaded_file, 'getbuffer'):
+                file_bytes = uploaded_file.getbuffer()
+            else:
+                file_bytes = uploaded_file.read()
+            
+            cursor = conn.execute(
+                "INSERT INTO pdf_blobs (name, content, size) VALUES (?, ?, ?)",
+                (uploaded_file.name, file_bytes, len(file_bytes))
+            )
+            pdf_data.append({
+                "id": cursor.lastrowid,
+                "name": uploaded_file.name,
+                "type": "application/pdf",
+                "size": len(file_bytes)
+            })
+        
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        raise
+    finally:
+        conn.close()
+    
+    return _json_dumps(pdf_data)
+
+def _pdf_blob_ids(pdf_files_json):
+    """Return the pdf_blobs ids referenced by a pdf_files JSON index."""
+    if not pdf_files_json:
+        return []
+    return [pdf["id"] for pdf in _json_loads(pdf_files_json) if pdf.get("id") is not None]
+
+def _link_pdf_blobs(cursor, pdf_files_json, entity_type, entity_id, replace=False):
+    """Assign the blobs of a pdf_files index to the record that owns them.
+    
+    Runs in the caller's transaction. With replace, blobs the record owned before
+    and that are no longer in the index are deleted.
+    """
+    blob_ids = _pdf_blob_ids(pdf_files_json)
+    placeholders = ", ".join("?" * len(blob_ids))
+    if replace:
+        cursor.execute(
+            f"DELETE FROM pdf_blobs WHERE entity_type = ? AND entity_id = ? AND id NOT IN ({placeholders})",
+            [entity_type, str(entity_id)] + blob_ids
+        )
+    if blob_ids:
+        cursor.execute(
+            f"UPDATE pdf_blobs SET entity_type = ?, entity_id = ? WHERE id IN ({placeholders})",
+            [entity_type, str(entity_id)] + blob_ids
+        )
+
+def _discard_pdf_blobs(conn, pdf_files_json):
+    """Roll back a failed write and delete the still unowned blobs of its pdf_files index."""
+    conn.rollback()
+    blob_ids = _pdf_blob_ids(pdf_files_json)
+    if not blob_ids:
+        return
+    
+    try:
+        conn.execute(
+            f"DELETE FROM pdf_blobs WHERE entity_type IS NULL AND id IN ({', '.join('?' * len(blob_ids))})",
+            blob_ids
+        )
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+
+def get_pdf_blob(blob_id):
+    """Get the name and raw bytes of a stored PDF, or None if it does not exist."""
+    conn = get_connection()
+    
+    try:
+        row = conn.execute("SELECT name, content FROM pdf_blobs WHERE id = ?", (blob_id,)).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+    finally:
+        conn.close()
+
+def _get_pdf_contents(blob_ids):
+    """Get the raw bytes of several stored PDFs in one query, keyed by id."""
+    if not blob_ids:
+        return {}
+    
+    conn = get_connection()
+    
+    try:
+        placeholders = ", ".join("?" * len(blob_ids))
+        rows = conn.execute(f"SELECT id, content FROM pdf_blobs WHERE id IN ({placeholders})", list(blob_ids))
+        return {blob_id: bytes(content) for blob_id, content in rows}
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return {}
+    finally:
+        conn.close()
+
+def get_pdf_download_links(pdf_files_json):
+    """Generate HTML download links for PDF files stored in the database."""
+    if not pdf_files_json:
+        return None
+    
+    try:
+        pdf_files = _json_loads(pdf_files_json)
+        
+        # Stored blobs are read here with a single query; entries saved before pdf_blobs
+        # still carry inline base64
+        contents = _get_pdf_contents([pdf["id"] for pdf in pdf_files
+                                      if not pdf.get("content") and pdf.get("id") is not None])
+        
+        html_links = []
+        for i, pdf in enumerate(pdf_files):
+            file_name = pdf.get("name", f"documento_{i+1}.pdf")
+            b64_content = pdf.get("content", "")
+            
+            if not b64_content and pdf.get("id") in contents:
+                b64_content = base64.b64encode(contents[pdf["id"]]).decode('ascii')
+            
+            if b64_content:
+                html_links.append(f'<p><a href="data:application/pdf;base64,{b64_content}" download="{file_name}" target="_blank">{file_name}</a></p>')
+        
+        return "".join(html_links)
+    except Exception as e:
+        print(f"Error generating PDF links: {e}")
+        return None
+
+def _smtp_connect():
+    """Open an authenticated SMTP connection using the EMAIL_* environment variables."""
+    host = os.environ["EMAIL_HOST"]
+    port = int(os.environ["EMAIL_PORT"])
+    
+    if port == 465:
+        server = smtplib.SMTP_SSL(host, port, timeout=30)
+    else:
+        server = smtplib.SMTP(host, port, timeout=30)
+        server.starttls()
+    
+    server.login(os.environ["EMAIL_USER"], os.environ["EMAIL_PASSWORD"])
+    return server
+
+def _smtp_close(server):
+    """Close an SMTP connection, ignoring errors from an already broken session."""
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+def send_email_notification(destinatario, asunto, mensaje, max_intentos=3):
+    """Send an HTML email, retrying transient SMTP failures with exponential backoff."""
+    if not all(key in os.environ for key in ["EMAIL_HOST", "EMAIL_PORT", "EMAIL_USER", "EMAIL_PASSWORD"]):
+        print("Email error: SMTP credentials are not configured")
+        return False
+    
+    msg = MIMEText(mensaje, "html", "utf-8")
+    msg["Subject"] = asunto
+    msg["From"] = os.environ["EMAIL_USER"]
+    msg["To"] = destinatario
+    
+    server = None
+    try:
+        for intento in range(max_intentos):
+            try:
+                if server is None:
+                    server = _smtp_connect()
+                server.sendmail(os.environ["EMAIL_USER"], [destinatario], msg.as_string())
+                return True
+            except smtplib.SMTPRecipientsRefused:
+                raise
+            except smtplib.SMTPResponseException as e:
+                # Solo las respuestas 4xx son transitorias (RFC 5321); las 5xx (autenticación,
+                # destinatario inválido, transacción rechazada) fallarían igual al reintentar
+                if not 400 <= e.smtp_code < 500 or intento == max_intentos - 1:
+                    raise
+            except OSError:
+                # Desconexión o timeout de red
+                if intento == max_intentos - 1:
+                    raise
+            
+            # Reconectar tras una espera exponencial
+            if server is not None:
+                _smtp_close(server)
+                server = None
+            time.sleep(2 ** intento)
+        return False
+    except Exception as e:
+        print(f"Error sending email to {destinatario}: {e}")
+        return False
+    finally:
+        if server is not None:
+            _smtp_close(server)
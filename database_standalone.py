@@ -2,11 +2,35 @@ import os
 import json
 import base64
 import sqlite3
+import atexit
+import threading
+import zlib
 import pandas as pd
-import numpy as np
 import streamlit as st
 from datetime import datetime, timedelta
-from sqlalchemy import create_engine
+from functools import lru_cache
+
+# Codificación base64 y JSON aceleradas si están instaladas (pybase64 usa SIMD,
+# orjson serializa sin volver a escapar el texto base64)
+try:
+    import pybase64
+    _b64encode = pybase64.b64encode_as_string
+except ImportError:
+    def _b64encode(data):
+        return base64.b64encode(data).decode('ascii')
+
+try:
+    import orjson
+    def _json_dumps(obj):
+        return orjson.dumps(obj).decode()
+    _json_loads = orjson.loads
+except ImportError:
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
+# Conexiones SQLite ociosas que se conservan para reutilizar (Streamlit ejecuta cada
+# rerun en un hilo nuevo, así que no se pueden atar a los hilos)
+POOL_SIZE = 4
 
 # Función para obtener la ruta de la base de datos SQLite
 def get_database_path():
@@ -17,97 +41,249 @@ def get_database_path():
     os.makedirs(data_dir, exist_ok=True)
     return os.path.join(data_dir, "flota_vehicular.db")
 
+SCHEMA_DDL = '''
+-- Create vehicles table
+CREATE TABLE IF NOT EXISTS vehiculos (
+    patente TEXT PRIMARY KEY,
+    area TEXT,
+    tipo TEXT,
+    marca TEXT,
+    modelo TEXT,
+    año INTEGER,
+    estado TEXT DEFAULT 'SERVICIO',
+    km INTEGER DEFAULT 0,
+    fecha_service TEXT,
+    taller TEXT,
+    observaciones TEXT,
+    pdf_files TEXT,
+    fecha_alta TEXT DEFAULT CURRENT_DATE,
+    rori TEXT,
+    id_vehiculo INTEGER,
+    vtv_vencimiento TEXT
+);
+
+-- Create service history table
+CREATE TABLE IF NOT EXISTS historial_service (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patente TEXT,
+    fecha TEXT,
+    km INTEGER,
+    tipo_service TEXT,
+    taller TEXT,
+    costo REAL,
+    descripcion TEXT,
+    pdf_files TEXT,
+    FOREIGN KEY (patente) REFERENCES vehiculos (patente)
+);
+
+-- Create incidents table
+CREATE TABLE IF NOT EXISTS incidentes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    patente TEXT,
+    fecha TEXT,
+    tipo TEXT,
+    descripcion TEXT,
+    estado TEXT DEFAULT 'PENDIENTE',
+    pdf_files TEXT,
+    FOREIGN KEY (patente) REFERENCES vehiculos (patente)
+);
+
+-- PDF attachments are stored as raw BLOBs; the pdf_files columns only keep a small JSON index
+CREATE TABLE IF NOT EXISTS pdf_blobs (
+    id INTEGER PRIMARY KEY,
+    entity_type TEXT,
+    entity_id TEXT,
+    name TEXT,
+    content BLOB,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_pdf_blobs_entity ON pdf_blobs(entity_type, entity_id);
+
+-- Indexes for per-vehicle history lookups (ordered by date) and the stats GROUP BYs
+CREATE INDEX IF NOT EXISTS idx_hs_patente_fecha ON historial_service(patente, fecha DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_hs_fecha ON historial_service(fecha);
+CREATE INDEX IF NOT EXISTS idx_inc_patente_estado_fecha ON incidentes(patente, estado, fecha DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_veh_estado ON vehiculos(estado);
+CREATE INDEX IF NOT EXISTS idx_veh_tipo ON vehiculos(tipo);
+CREATE INDEX IF NOT EXISTS idx_veh_area ON vehiculos(area);
+'''
+
+# Stored in PRAGMA user_version: a checksum of the DDL, so the script runs again whenever
+# it changes (or the file was created by the other database module) without manual bumps
+SCHEMA_VERSION = zlib.crc32(SCHEMA_DDL.encode()) & 0x7FFFFFFF
+
 def init_database():
-    """Initialize the database and create tables if they don't exist."""
+    """Initialize the database and create tables if they don't exist.
+    
+    The whole schema runs as one script in a single transaction (one commit instead
+    of one per statement) and is skipped when the database is already up to date.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
     
-    # Create vehicles table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS vehiculos (
-        patente TEXT PRIMARY KEY,
-        area TEXT,
-        tipo TEXT,
-        marca TEXT,
-        modelo TEXT,
-        año INTEGER,
-        estado TEXT DEFAULT 'SERVICIO',
-        km INTEGER DEFAULT 0,
-        fecha_service TEXT,
-        taller TEXT,
-        observaciones TEXT,
-        pdf_files TEXT,
-        fecha_alta TEXT DEFAULT CURRENT_DATE,
-        rori TEXT,
-        id_vehiculo INTEGER,
-        vtv_vencimiento TEXT
-    )
-    ''')
-    
-    # Create service history table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS historial_service (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        patente TEXT,
-        fecha TEXT,
-        km INTEGER,
-        tipo_service TEXT,
-        taller TEXT,
-        costo REAL,
-        descripcion TEXT,
-        pdf_files TEXT,
-        FOREIGN KEY (patente) REFERENCES vehiculos (patente)
-    )
-    ''')
-    
-    # Create incidents table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS incidentes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        patente TEXT,
-        fecha TEXT,
-        tipo TEXT,
-        descripcion TEXT,
-        estado TEXT DEFAULT 'PENDIENTE',
-        pdf_files TEXT,
-        FOREIGN KEY (patente) REFERENCES vehiculos (patente)
-    )
-    ''')
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        conn.executescript(f"BEGIN;\n{SCHEMA_DDL}\nPRAGMA user_version = {SCHEMA_VERSION};\nCOMMIT;")
     
-    conn.commit()
-    conn.close()
+    release_connection(conn)
+
+# Per-connection SQLite settings: WAL (readers do not block the writer), one fsync per
+# checkpoint instead of per commit, temp tables in memory, 256 MB mmap and ~20 MB page cache
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-20000",
+)
+
+class _ConnectionPool:
+    """Bounded pool of sqlite3 connections shared by every script thread.
+
+    Checking out never blocks: when no idle connection is left a new one is opened,
+    and connections returned beyond ``size`` are closed instead of kept.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+        self._reader = None
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._open()
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def reader(self):
+        """Shared connection for pd.read_sql callers, which never release it."""
+        with self._lock:
+            if self._reader is None:
+                self._reader = self._open()
+            return self._reader
+
+    def close(self):
+        with self._lock:
+            connections, self._idle = self._idle, []
+            if self._reader is not None:
+                connections.append(self._reader)
+                self._reader = None
+        for conn in connections:
+            conn.close()
+
+@st.cache_resource(show_spinner=False)
+def _get_pool(db_path):
+    pool = _ConnectionPool(db_path)
+    atexit.register(pool.close)
+    return pool
+
+def dispose_connections():
+    """Close the pooled connections, e.g. before a backup is restored over the file."""
+    _get_pool(get_database_path()).close()
+    _get_pool.clear()
 
 def get_connection():
-    """Get a database connection."""
-    db_path = get_database_path()
-    conn = sqlite3.connect(db_path)
-    return conn
+    """Check out a database connection from the shared pool; hand it back with release_connection()."""
+    return _get_pool(get_database_path()).acquire()
+
+def release_connection(conn):
+    """Return a connection from get_connection() to the pool, discarding uncommitted changes.
+
+    Rolling back here keeps a failed call from leaving a transaction open for the
+    next user of the connection.
+    """
+    _get_pool(get_database_path()).release(conn)
 
 def get_sqlalchemy_engine():
-    """Get a SQLAlchemy engine."""
-    db_path = get_database_path()
-    return create_engine(f'sqlite:///{db_path}')
+    """Get a connectable for pd.read_sql.
+    
+    The standalone build does not ship SQLAlchemy: pandas reads directly from a shared
+    sqlite3 connection, so callers shared with the PostgreSQL backend keep working.
+    """
+    return _get_pool(get_database_path()).reader()
+
+def _read_query(query, params=()):
+    """Run a parameterized query on a raw sqlite3 connection and return a DataFrame."""
+    conn = get_connection()
+    try:
+        cursor = conn.execute(query, params)
+        columns = [col[0] for col in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+    finally:
+        release_connection(conn)
 
+# Smaller integer types for the numeric vehicle columns (int64 by default)
+_SHRINK_DTYPES = {'año': 'int16', 'km': 'int32', 'id_vehiculo': 'int32'}
+
+def _shrink(df):
+    """Downcast the integer vehicle columns of a query result.
+
+    Columns with NULLs or values that do not fit the smaller type are left as read.
+    """
+    for col, dtype in _SHRINK_DTYPES.items():
+        if col in df.columns and df[col].notna().all():
+            try:
+                values = df[col].astype(dtype)
+            except (TypeError, ValueError):
+                continue
+            if (values == df[col]).all():
+                df[col] = values
+    return df
+
+# Listing columns: everything except pdf_files, which is only needed in the detail view
+_VEHICLE_LIST_COLUMNS = (
+    "patente, area, tipo, marca, modelo, año, estado, km, fecha_service, taller, "
+    "observaciones, fecha_alta, rori, id_vehiculo, vtv_vencimiento"
+)
+
+# Listings and stats are cached across Streamlit reruns (every widget interaction reruns
+# the page); the write helpers below drop the cache as soon as the data changes
+READ_CACHE_TTL = 60
+
+def invalidate_cached_reads():
+    """Drop the cached vehicle listings and stats after a write.
+
+    Public so backup_manager can call it after restoring or importing a database.
+    """
+    load_vehicles.clear()
+    get_stats.clear()
+
+@st.cache_data(ttl=READ_CACHE_TTL, show_spinner=False)
 def load_vehicles(search_term=None):
     """Load all vehicles from the database with optional search filter."""
-    engine = get_sqlalchemy_engine()
-    
     if search_term:
         query = f'''
-        SELECT * FROM vehiculos
-        WHERE patente LIKE '%{search_term}%'
-        OR area LIKE '%{search_term}%'
-        OR tipo LIKE '%{search_term}%'
-        OR marca LIKE '%{search_term}%'
-        OR modelo LIKE '%{search_term}%'
-        OR estado LIKE '%{search_term}%'
+        SELECT {_VEHICLE_LIST_COLUMNS} FROM vehiculos
+        WHERE patente LIKE ?
+        OR area LIKE ?
+        OR tipo LIKE ?
+        OR marca LIKE ?
+        OR modelo LIKE ?
+        OR estado LIKE ?
         ORDER BY patente
         '''
+        params = (f'%{search_term}%',) * 6
     else:
-        query = 'SELECT * FROM vehiculos ORDER BY patente'
+        query = f'SELECT {_VEHICLE_LIST_COLUMNS} FROM vehiculos ORDER BY patente'
+        params = ()
     
-    df = pd.read_sql(query, engine)
-    return df
+    df = _read_query(query, params)
+    return _shrink(df)
 
 def add_vehicle(patente, area, tipo, marca, modelo, año, estado, km=0, fecha_service=None, taller=None, observaciones=None, pdf_files=None, rori=None, id_vehiculo=None, vtv_vencimiento=None):
     """Add a new vehicle to the database."""
@@ -126,15 +302,23 @@ def add_vehicle(patente, area, tipo, marca, modelo, año, estado, km=0, fecha_se
             fecha_service, taller, observaciones, pdf_files,
             rori, id_vehiculo, vtv_vencimiento
         ))
+        _link_pdf_blobs(cursor, pdf_files, 'vehiculos', patente)
         
         conn.commit()
+        invalidate_cached_reads()
         return True
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         st.error(f"Error al agregar vehículo: {e}")
+        _discard_pdf_blobs(conn, pdf_files)
         return False
     finally:
-        conn.close()
+        release_connection(conn)
+
+@lru_cache(maxsize=64)
+def _update_vehicle_sql(fields):
+    """Build the UPDATE statement for a tuple of columns, memoized per column set."""
+    return f"UPDATE vehiculos SET {', '.join(f'{key} = ?' for key in fields)} WHERE patente = ?"
 
 def update_vehicle(patente, **kwargs):
     """Update vehicle information."""
@@ -146,22 +330,26 @@ def update_vehicle(patente, **kwargs):
     values = []
     
     for key, value in kwargs.items():
-        fields.append(f"{key} = ?")
+        fields.append(key)
         values.append(value)
     
     # Add patente to values for WHERE clause
     values.append(patente)
     
     try:
-        query = f"UPDATE vehiculos SET {', '.join(fields)} WHERE patente = ?"
-        cursor.execute(query, values)
+        cursor.execute(_update_vehicle_sql(tuple(fields)), values)
+        if 'pdf_files' in fields:
+            # Los PDF nuevos reemplazan a los anteriores, que se borran
+            _link_pdf_blobs(cursor, kwargs['pdf_files'], 'vehiculos', patente, replace=True)
         conn.commit()
+        invalidate_cached_reads()
         return True
     except sqlite3.Error as e:
         print(f"Database error: {e}")
+        _discard_pdf_blobs(conn, kwargs.get('pdf_files'))
         return False
     finally:
-        conn.close()
+        release_connection(conn)
 
 def delete_vehicle(patente):
     """Delete a vehicle from the database."""
@@ -180,21 +368,43 @@ def delete_vehicle(patente):
             return False
         
         cursor.execute("DELETE FROM vehiculos WHERE patente = ?", (patente,))
+        cursor.execute("DELETE FROM pdf_blobs WHERE entity_type = 'vehiculos' AND entity_id = ?", (patente,))
         conn.commit()
+        invalidate_cached_reads()
         return cursor.rowcount > 0
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return False
     finally:
-        conn.close()
+        release_connection(conn)
+
+# Columnas de vehiculos que se pueden pedir por separado en get_vehicle_by_patente;
+# los nombres se interpolan en el SQL, así que sólo se aceptan los de esta lista
+VEHICLE_COLUMNS = frozenset((
+    "patente", "area", "tipo", "marca", "modelo", "año", "estado", "km", "fecha_service",
+    "taller", "observaciones", "pdf_files", "fecha_alta", "rori", "id_vehiculo",
+    "vtv_vencimiento",
+))
+
+def get_vehicle_by_patente(patente, columns=None):
+    """Get a vehicle by its license plate number.
+
+    Pass ``columns`` to read only those fields; callers that just need a label
+    skip the pdf_files JSON and the other free-text columns that way.
+    """
+    if columns:
+        unknown = set(columns) - VEHICLE_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown vehicle columns: {sorted(unknown)}")
+        select = ", ".join(columns)
+    else:
+        select = "*"
 
-def get_vehicle_by_patente(patente):
-    """Get a vehicle by its license plate number."""
     conn = get_connection()
     cursor = conn.cursor()
     
     try:
-        cursor.execute("SELECT * FROM vehiculos WHERE patente = ?", (patente,))
+        cursor.execute(f"SELECT {select} FROM vehiculos WHERE patente = ?", (patente,))
         row = cursor.fetchone()
         
         if row:
@@ -206,7 +416,7 @@ def get_vehicle_by_patente(patente):
         print(f"Database error: {e}")
         return None
     finally:
-        conn.close()
+        release_connection(conn)
 
 def add_service_record(patente, fecha, km, tipo_service, taller, costo, descripcion, pdf_files=None):
     """Add a new service record for a vehicle."""
@@ -219,6 +429,7 @@ def add_service_record(patente, fecha, km, tipo_service, taller, costo, descripc
         INSERT INTO historial_service (patente, fecha, km, tipo_service, taller, costo, descripcion, pdf_files)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         ''', (patente, fecha, km, tipo_service, taller, costo, descripcion, pdf_files))
+        _link_pdf_blobs(cursor, pdf_files, 'historial_service', cursor.lastrowid)
         
         # Update vehicle's current km and last service date
         cursor.execute('''
@@ -228,12 +439,14 @@ def add_service_record(patente, fecha, km, tipo_service, taller, costo, descripc
         ''', (km, fecha, taller, patente))
         
         conn.commit()
+        invalidate_cached_reads()
         return True
     except sqlite3.Error as e:
         print(f"Database error: {e}")
+        _discard_pdf_blobs(conn, pdf_files)
         return False
     finally:
-        conn.close()
+        release_connection(conn)
 
 def add_incident(patente, fecha, tipo, descripcion, estado, pdf_files=None):
     """Add a new incident record."""
@@ -245,27 +458,30 @@ def add_incident(patente, fecha, tipo, descripcion, estado, pdf_files=None):
         INSERT INTO incidentes (patente, fecha, tipo, descripcion, estado, pdf_files)
         VALUES (?, ?, ?, ?, ?, ?)
         ''', (patente, fecha, tipo, descripcion, estado, pdf_files))
+        _link_pdf_blobs(cursor, pdf_files, 'incidentes', cursor.lastrowid)
         
         conn.commit()
+        invalidate_cached_reads()
         return True
     except sqlite3.Error as e:
         print(f"Database error: {e}")
+        _discard_pdf_blobs(conn, pdf_files)
         return False
     finally:
-        conn.close()
+        release_connection(conn)
 
 def get_service_history(patente=None):
     """Get service history for a specific vehicle or all vehicles."""
-    engine = get_sqlalchemy_engine()
-    
+    params = ()
     if patente:
-        query = f'''
+        query = '''
         SELECT h.*, v.marca, v.modelo
         FROM historial_service h
         JOIN vehiculos v ON h.patente = v.patente
-        WHERE h.patente = '{patente}'
+        WHERE h.patente = ?
         ORDER BY h.fecha DESC, h.id DESC
         '''
+        params = (patente,)
     else:
         query = '''
         SELECT h.*, v.marca, v.modelo
@@ -275,21 +491,22 @@ def get_service_history(patente=None):
         '''
     
     try:
-        df = pd.read_sql(query, engine)
-        return df
+        df = _read_query(query, params)
+        return _shrink(df)
     except Exception as e:
         print(f"Error loading service history: {e}")
         return pd.DataFrame()
 
 def get_incidents(patente=None, estado=None):
     """Get incidents for a specific vehicle or all vehicles, optionally filtered by status."""
-    engine = get_sqlalchemy_engine()
-    
     conditions = []
+    params = []
     if patente:
-        conditions.append(f"i.patente = '{patente}'")
+        conditions.append("i.patente = ?")
+        params.append(patente)
     if estado:
-        conditions.append(f"i.estado = '{estado}'")
+        conditions.append("i.estado = ?")
+        params.append(estado)
     
     where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
     
@@ -302,58 +519,55 @@ def get_incidents(patente=None, estado=None):
     '''
     
     try:
-        df = pd.read_sql(query, engine)
+        df = _read_query(query, params)
         return df
     except Exception as e:
         print(f"Error loading incidents: {e}")
         return pd.DataFrame()
 
+@st.cache_data(ttl=READ_CACHE_TTL, show_spinner=False)
 def get_stats():
     """Get fleet statistics for reports."""
-    engine = get_sqlalchemy_engine()
-    
     try:
-        # Vehicles by status
-        status_query = '''
-        SELECT estado, COUNT(*) as cantidad
+        # Single round-trip: every aggregate tagged and stacked with UNION ALL
+        stats_query = '''
+        SELECT 'status' AS tag, estado AS k, COUNT(*) AS n, NULL AS total
         FROM vehiculos
         GROUP BY estado
-        '''
-        status_df = pd.read_sql(status_query, engine)
-        
-        # Vehicles by type
-        type_query = '''
-        SELECT tipo, COUNT(*) as cantidad
+        UNION ALL
+        SELECT 'type', tipo, COUNT(*), NULL
         FROM vehiculos
         GROUP BY tipo
-        '''
-        type_df = pd.read_sql(type_query, engine)
-        
-        # Vehicles by area
-        area_query = '''
-        SELECT area, COUNT(*) as cantidad
+        UNION ALL
+        SELECT 'area', area, COUNT(*), NULL
         FROM vehiculos
         GROUP BY area
-        '''
-        area_df = pd.read_sql(area_query, engine)
-        
-        # Service by month (last 12 months)
-        service_query = '''
-        SELECT strftime('%Y-%m', fecha) as mes, COUNT(*) as cantidad, SUM(costo) as costo_total
+        UNION ALL
+        SELECT 'service', strftime('%Y-%m', fecha), COUNT(*), SUM(costo)
         FROM historial_service
         WHERE fecha >= date('now', '-12 months')
         GROUP BY strftime('%Y-%m', fecha)
-        ORDER BY mes
-        '''
-        service_df = pd.read_sql(service_query, engine)
-        
-        # Incidents by status
-        incidents_query = '''
-        SELECT estado, COUNT(*) as cantidad
+        UNION ALL
+        SELECT 'incidents', estado, COUNT(*), NULL
         FROM incidentes
         GROUP BY estado
         '''
-        incidents_df = pd.read_sql(incidents_query, engine)
+        stats = _read_query(stats_query)
+        if stats.empty:
+            stats = pd.DataFrame(columns=['tag', 'k', 'n', 'total'])
+        
+        def _split(tag, key, with_total=False):
+            part = stats[stats['tag'] == tag]
+            columns = {'k': key, 'n': 'cantidad'}
+            if with_total:
+                columns['total'] = 'costo_total'
+            return part[list(columns)].rename(columns=columns).reset_index(drop=True)
+        
+        status_df = _split('status', 'estado')
+        type_df = _split('type', 'tipo')
+        area_df = _split('area', 'area')
+        service_df = _split('service', 'mes', with_total=True).sort_values('mes', ignore_index=True)
+        incidents_df = _split('incidents', 'estado')
         
         return {
             "status": status_df,
@@ -372,17 +586,31 @@ def get_stats():
             "incidents": pd.DataFrame()
         }
 
+def _to_int(series, extract_digits=True):
+    """Convert a column of mixed text to int32 in one pass; unparseable values become 0."""
+    values = series.astype('string')
+    if extract_digits:
+        # Extraer solo dígitos si hay texto mixto
+        values = values.str.extract(r'(\d+)', expand=False)
+    return pd.to_numeric(values, errors='coerce').fillna(0).astype('int32')
+
 def process_uploaded_file(uploaded_file):
     """Process an uploaded CSV file into a pandas DataFrame."""
     try:
         if uploaded_file.name.endswith('.csv'):
-            # Try UTF-8 first
+            # Use PyArrow's multithreaded parser when available; fall back to the C engine
+            # if pyarrow is missing or cannot parse the file (e.g. non UTF-8 encoding)
             try:
-                df = pd.read_csv(uploaded_file, sep=',', encoding='utf-8')
-            except UnicodeDecodeError:
-                # Try Latin-1 encoding if UTF-8 fails
+                df = pd.read_csv(uploaded_file, sep=',', encoding='utf-8', engine='pyarrow')
+            except Exception:
                 uploaded_file.seek(0)
-                df = pd.read_csv(uploaded_file, sep=',', encoding='latin1')
+                # Try UTF-8 first
+                try:
+                    df = pd.read_csv(uploaded_file, sep=',', encoding='utf-8')
+                except UnicodeDecodeError:
+                    # Try Latin-1 encoding if UTF-8 fails
+                    uploaded_file.seek(0)
+                    df = pd.read_csv(uploaded_file, sep=',', encoding='latin1')
             
             # Clean the DataFrame: remove empty rows and columns
             df = df.dropna(how='all').reset_index(drop=True)  # Drop rows where all values are NaN
@@ -390,12 +618,9 @@ def process_uploaded_file(uploaded_file):
             
             # Detección específica para formato SEC DE GOBIERNO con estructura especial
             # Buscar la fila que contiene "patente" como encabezado
-            header_row = None
-            for i, row in df.iterrows():
-                row_values = [str(x).lower().strip() for x in row.values if pd.notna(x)]
-                if 'patente' in row_values:
-                    header_row = i
-                    break
+            # (comparación vectorizada de todas las celdas, en lugar de recorrer fila por fila)
+            is_header = df.apply(lambda col: col.astype(str).str.strip().str.lower()).eq('patente').any(axis=1)
+            header_row = is_header.idxmax() if is_header.any() else None
             
             if header_row is not None:
                 # Usar esta fila como encabezados y usar solo los datos posteriores
@@ -424,21 +649,22 @@ def process_uploaded_file(uploaded_file):
                 'taller': ['taller']                # Columna 13 en SEC DE GOBIERNO
             }
             
-            # Create standardized dataframe
-            std_df = pd.DataFrame()
+            # Pick the first matching source column for each standard name in a single pass
+            available = set(df.columns)
+            source_cols = {
+                std_col: next((col for col in possible_cols if col in available), None)
+                for std_col, possible_cols in column_map.items()
+            }
             
-            # Map columns based on the standard names
-            for std_col, possible_cols in column_map.items():
-                for col in possible_cols:
-                    if col in df.columns:
-                        std_df[std_col] = df[col]
-                        break
-                if std_col not in std_df.columns:
-                    # Add empty column if not found
-                    if std_col == 'estado':
-                        std_df[std_col] = 'SERVICIO'  # Default value
-                    else:
-                        std_df[std_col] = ''
+            # Create standardized dataframe in one construction; columns not found get
+            # a default value (rows come from the patente column, as before)
+            std_df = pd.DataFrame(
+                {
+                    std_col: df[col] if col is not None else ('SERVICIO' if std_col == 'estado' else '')
+                    for std_col, col in source_cols.items()
+                },
+                index=df.index if source_cols['patente'] is not None else pd.RangeIndex(0)
+            )
             
             # Para el archivo SEC DE GOBIERNO, manejar columnas por posición si no las encontramos por nombre
             if len(std_df) > 0 and 'patente' in std_df.columns and std_df['patente'].notna().any():
@@ -473,26 +699,15 @@ def process_uploaded_file(uploaded_file):
             
             # Ensure numeric columns
             if 'año' in std_df.columns:
-                # Limpiar valores no numéricos y reemplazar valores como '-' con NaN
-                std_df['año'] = std_df['año'].astype(str).replace(['-', 'nan', 'null', ''], np.nan)
-                # Extraer solo dígitos si hay texto mixto
-                std_df['año'] = std_df['año'].str.extract('(\d+)').fillna(np.nan)
-                # Convertir a numérico con manejo de errores
-                std_df['año'] = pd.to_numeric(std_df['año'], errors='coerce').fillna(0).astype(int)
+                std_df['año'] = _to_int(std_df['año'])
                 
             if 'km' in std_df.columns:
-                # Limpiar y manejar valores no numéricos
-                std_df['km'] = std_df['km'].astype(str).replace(['-', 'nan', 'null', ''], np.nan)
-                std_df['km'] = pd.to_numeric(std_df['km'], errors='coerce').fillna(0).astype(int)
+                # Los valores no numéricos ('-', texto) quedan en 0
+                std_df['km'] = _to_int(std_df['km'], extract_digits=False)
                 
             # Manejar id_vehiculo que es donde el error ocurre principalmente
             if 'id_vehiculo' in std_df.columns:
-                # Reemplazar cualquier valor no numérico con NaN
-                std_df['id_vehiculo'] = std_df['id_vehiculo'].astype(str).replace(['-', 'nan', 'null', ''], np.nan)
-                # Intentar extraer solo la parte numérica si hay texto mixto
-                std_df['id_vehiculo'] = std_df['id_vehiculo'].str.extract('(\d+)').fillna(np.nan)
-                # Convertir a numérico con manejo de errores
-                std_df['id_vehiculo'] = pd.to_numeric(std_df['id_vehiculo'], errors='coerce').fillna(0).astype(int)
+                std_df['id_vehiculo'] = _to_int(std_df['id_vehiculo'])
                 
             # Remove duplicate vehicles
             std_df = std_df.drop_duplicates(subset=['patente'])
@@ -500,10 +715,11 @@ def process_uploaded_file(uploaded_file):
             # Remove rows where patente is empty or just whitespace
             std_df = std_df[std_df['patente'].astype(str).str.strip() != '']
             
-            # Validate estado
+            # Validate estado (unknown or empty values become SERVICIO)
             valid_states = ['SERVICIO', 'RECUPERAR', 'RADIADO']
-            std_df['estado'] = std_df['estado'].astype(str).str.strip().str.upper()
-            std_df.loc[~std_df['estado'].isin(valid_states), 'estado'] = 'SERVICIO'
+            estado = std_df['estado'].astype('string').str.strip().str.upper()
+            std_df['estado'] = pd.Categorical(estado.where(estado.isin(valid_states), 'SERVICIO'),
+                                              categories=valid_states)
             
             return std_df
         else:
@@ -515,8 +731,27 @@ def process_uploaded_file(uploaded_file):
         st.write(traceback.format_exc())
         return None
 
+# Columns imported from a DataFrame and the value inserted when the column is missing
+_IMPORT_COLUMNS = [
+    ('area', ''), ('tipo', ''), ('marca', ''), ('modelo', ''), ('año', 0),
+    ('estado', 'SERVICIO'), ('km', 0), ('taller', ''), ('rori', ''),
+    ('id_vehiculo', 0), ('vtv_vencimiento', '')
+]
+
 def import_vehicles_from_df(df):
-    """Import vehicles from a DataFrame into the database."""
+    """Import vehicles from a DataFrame into the database.
+
+    New plates are inserted and existing ones updated with batched executemany
+    calls. Updates only overwrite the columns that have a value in the DataFrame.
+    If a batch fails it is retried row by row to report the offending plates.
+    """
+    columns = [col for col, _ in _IMPORT_COLUMNS]
+    missing = {col: default for col, default in _IMPORT_COLUMNS if col not in df.columns}
+    
+    # Python objects with None instead of NaN, ready to bind
+    data = df.reindex(columns=['patente'] + columns).astype(object)
+    data = data.where(data.notna(), None)
+    
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -524,87 +759,173 @@ def import_vehicles_from_df(df):
     error_count = 0
     error_plates = []
     
-    for _, row in df.iterrows():
+    # Split rows into inserts and updates with a single lookup of the existing plates
+    existing = {row[0] for row in cursor.execute("SELECT patente FROM vehiculos")}
+    inserts = []
+    updates = []
+    for record in data.itertuples(index=False, name=None):
+        patente, values = record[0], record[1:]
+        if patente in existing:
+            if all(value is None for value in values):
+                error_count += 1
+                error_plates.append(patente)
+            else:
+                updates.append(values + (patente,))
+        else:
+            existing.add(patente)
+            inserts.append((patente,) + tuple(missing.get(col, value) for col, value in zip(columns, values)))
+    
+    insert_query = f'''
+    INSERT INTO vehiculos (patente, {', '.join(columns)})
+    VALUES ({', '.join('?' * (len(columns) + 1))})
+    '''
+    update_query = f'''
+    UPDATE vehiculos SET {', '.join(f"{col} = COALESCE(?, {col})" for col in columns)}
+    WHERE patente = ?
+    '''
+    
+    # Inserts first, so repeated plates in the same file update the row just inserted
+    for query, rows, patente_index in [(insert_query, inserts, 0), (update_query, updates, -1)]:
+        if not rows:
+            continue
+        cursor.execute("SAVEPOINT import_batch")
         try:
-            # Check if the vehicle already exists
-            cursor.execute("SELECT patente FROM vehiculos WHERE patente = ?", (row['patente'],))
-            exists = cursor.fetchone()
-            
-            if exists:
-                # Update existing vehicle
-                fields = []
-                values = []
-                
-                for col, db_col in [
-                    ('area', 'area'), ('tipo', 'tipo'), ('marca', 'marca'), ('modelo', 'modelo'),
-                    ('año', 'año'), ('estado', 'estado'), ('km', 'km'), ('taller', 'taller'),
-                    ('rori', 'rori'), ('id_vehiculo', 'id_vehiculo'), ('vtv_vencimiento', 'vtv_vencimiento')
-                ]:
-                    if col in row and not pd.isna(row[col]):
-                        fields.append(f"{db_col} = ?")
-                        values.append(row[col])
-                
-                if fields:
-                    # Add patente to values for WHERE clause
-                    values.append(row['patente'])
-                    
-                    query = f"UPDATE vehiculos SET {', '.join(fields)} WHERE patente = ?"
-                    cursor.execute(query, values)
+            cursor.executemany(query, rows)
+            cursor.execute("RELEASE import_batch")
+            success_count += len(rows)
+        except sqlite3.Error:
+            cursor.execute("ROLLBACK TO import_batch")
+            cursor.execute("RELEASE import_batch")
+            for row in rows:
+                try:
+                    cursor.execute(query, row)
                     success_count += 1
-                else:
+                except Exception as e:
+                    print(f"Error importing vehicle {row[patente_index]}: {e}")
                     error_count += 1
-                    error_plates.append(row['patente'])
-            else:
-                # Insert new vehicle
-                cursor.execute('''
-                INSERT INTO vehiculos (
-                    patente, area, tipo, marca, modelo, año, estado, km,
-                    taller, rori, id_vehiculo, vtv_vencimiento
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    row['patente'],
-                    row.get('area', ''),
-                    row.get('tipo', ''),
-                    row.get('marca', ''),
-                    row.get('modelo', ''),
-                    row.get('año', 0),
-                    row.get('estado', 'SERVICIO'),
-                    row.get('km', 0),
-                    row.get('taller', ''),
-                    row.get('rori', ''),
-                    row.get('id_vehiculo', 0),
-                    row.get('vtv_vencimiento', '')
-                ))
-                success_count += 1
-        except Exception as e:
-            print(f"Error importing vehicle {row.get('patente', 'unknown')}: {e}")
-            error_count += 1
-            error_plates.append(row.get('patente', 'unknown'))
+                    error_plates.append(row[patente_index])
     
     conn.commit()
-    conn.close()
+    invalidate_cached_reads()
+    
+    # Refresh the query planner statistics after a bulk load
+    if success_count:
+        conn.execute("ANALYZE")
+    release_connection(conn)
     
     return success_count, error_count, error_plates
 
 def process_pdf_files(uploaded_files):
-    """Process uploaded PDF files and return a JSON string with the file data."""
+    """Store uploaded PDF files as BLOBs and return a JSON string referencing them.
+    
+    The blobs stay unowned until the record that references them is saved (see
+    _link_pdf_blobs). Database errors are raised so the caller does not save the
+    record without its attachments.
+    """
     if not uploaded_files:
         return None
     
     pdf_data = []
+    conn = get_connection()
     
-    for uploaded_file in uploaded_files:
-        file_bytes = uploaded_file.read()
-        encoded = base64.b64encode(file_bytes).decode()
+    try:
+        for uploaded_file in uploaded_files:
+            # UploadedFile expone su contenido como memoryview, sin copiarlo
+            if hasattr(uploaded_file, 'getbuffer'):
+                file_bytes = uploaded_file.getbuffer()
+            else:
+                file_bytes = uploaded_file.read()
+            
+            cursor = conn.execute(
+                "INSERT INTO pdf_blobs (name, content, size) VALUES (?, ?, ?)",
+                (uploaded_file.name, file_bytes, len(file_bytes))
+            )
+            pdf_data.append({
+                "id": cursor.lastrowid,
+                "name": uploaded_file.name,
+                "type": "application/pdf",
+                "size": len(file_bytes)
+            })
         
-        pdf_data.append({
-            "name": uploaded_file.name,
-            "content": encoded,
-            "type": "application/pdf",
-            "size": len(file_bytes)
-        })
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        raise
+    finally:
+        release_connection(conn)
+    
+    return _json_dumps(pdf_data)
+
+def _pdf_blob_ids(pdf_files_json):
+    """Return the pdf_blobs ids referenced by a pdf_files JSON index."""
+    if not pdf_files_json:
+        return []
+    return [pdf["id"] for pdf in _json_loads(pdf_files_json) if pdf.get("id") is not None]
+
+def _link_pdf_blobs(cursor, pdf_files_json, entity_type, entity_id, replace=False):
+    """Assign the blobs of a pdf_files index to the record that owns them.
+    
+    Runs in the caller's transaction. With replace, blobs the record owned before
+    and that are no longer in the index are deleted.
+    """
+    blob_ids = _pdf_blob_ids(pdf_files_json)
+    placeholders = ", ".join("?" * len(blob_ids))
+    if replace:
+        cursor.execute(
+            f"DELETE FROM pdf_blobs WHERE entity_type = ? AND entity_id = ? AND id NOT IN ({placeholders})",
+            [entity_type, str(entity_id)] + blob_ids
+        )
+    if blob_ids:
+        cursor.execute(
+            f"UPDATE pdf_blobs SET entity_type = ?, entity_id = ? WHERE id IN ({placeholders})",
+            [entity_type, str(entity_id)] + blob_ids
+        )
+
+def _discard_pdf_blobs(conn, pdf_files_json):
+    """Roll back a failed write and delete the still unowned blobs of its pdf_files index."""
+    conn.rollback()
+    blob_ids = _pdf_blob_ids(pdf_files_json)
+    if not blob_ids:
+        return
     
-    return json.dumps(pdf_data)
+    try:
+        conn.execute(
+            f"DELETE FROM pdf_blobs WHERE entity_type IS NULL AND id IN ({', '.join('?' * len(blob_ids))})",
+            blob_ids
+        )
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+
+def get_pdf_blob(blob_id):
+    """Get the name and raw bytes of a stored PDF, or None if it does not exist."""
+    conn = get_connection()
+    
+    try:
+        row = conn.execute("SELECT name, content FROM pdf_blobs WHERE id = ?", (blob_id,)).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+    finally:
+        release_connection(conn)
+
+def _get_pdf_contents(blob_ids):
+    """Get the raw bytes of several stored PDFs in one query, keyed by id."""
+    if not blob_ids:
+        return {}
+    
+    conn = get_connection()
+    
+    try:
+        placeholders = ", ".join("?" * len(blob_ids))
+        rows = conn.execute(f"SELECT id, content FROM pdf_blobs WHERE id IN ({placeholders})", list(blob_ids))
+        return {blob_id: bytes(content) for blob_id, content in rows}
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return {}
+    finally:
+        release_connection(conn)
 
 def get_pdf_download_links(pdf_files_json):
     """Generate HTML download links for PDF files stored in the database."""
@@ -612,18 +933,25 @@ def get_pdf_download_links(pdf_files_json):
         return None
     
     try:
-        pdf_files = json.loads(pdf_files_json)
-        html_links = ""
+        pdf_files = _json_loads(pdf_files_json)
         
+        # Create a download link for each file, joined in one pass; stored blobs are read
+        # here with a single query, and entries saved before pdf_blobs carry inline base64
+        contents = _get_pdf_contents([pdf["id"] for pdf in pdf_files
+                                      if not pdf.get("content") and pdf.get("id") is not None])
+        
+        html_links = []
         for i, pdf in enumerate(pdf_files):
-            # Create a download link with base64 data
             file_name = pdf.get("name", f"documento_{i+1}.pdf")
             b64_content = pdf.get("content", "")
             
+            if not b64_content and pdf.get("id") in contents:
+                b64_content = _b64encode(contents[pdf["id"]])
+            
             if b64_content:
-                html_links += f'<p><a href="data:application/pdf;base64,{b64_content}" download="{file_name}" target="_blank">{file_name}</a></p>'
+                html_links.append(f'<p><a href="data:application/pdf;base64,{b64_content}" download="{file_name}" target="_blank">{file_name}</a></p>')
         
-        return html_links
+        return "".join(html_links)
     except Exception as e:
         print(f"Error generating PDF links: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -1,7 +1,25 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+from PyInstaller.utils.hooks import collect_submodules
+
 block_cipher = None
 
+# UPX solo en builds de distribución (python build_exe.py --release)
+use_upx = False
+upx_exclude = ['vcruntime140.dll', 'python3*.dll', '_ssl*.pyd', '_hashlib*.pyd', 'select*.pyd']
+
+# app.py y los módulos que lo acompañan se empaquetan como datos y no se analizan,
+# así que sus dependencias se declaran acá; de streamlit solo se agregan los
+# subpaquetes que carga dinámicamente al ejecutar `streamlit run`
+hiddenimports = (
+    ['pandas', 'sqlite3', 'yaml', 'importlib_metadata', 'streamlit_authenticator',
+     'pandas._libs.tslibs.base',
+     # Opcionales: codificación rápida de PDFs adjuntos
+     'pybase64', 'orjson', 'pyarrow']
+    + collect_submodules('streamlit.web')
+    + collect_submodules('streamlit.runtime')
+)
+
 a = Analysis(
     ['launcher.py'],
     pathex=[],
@@ -15,21 +33,21 @@ a = Analysis(
         ('standalone_assets/config.yaml', 'standalone_assets'),
         ('.streamlit', '.streamlit')
     ],
-    hiddenimports=[
-        'streamlit',
-        'pandas',
-        'sqlite3',
-        'yaml',
-        'sqlalchemy',
-        'importlib_metadata',
-        'streamlit.runtime',  # Nueva l�nea
-        'streamlit.web',      # Nueva l�nea  # Nueva l�nea
-        'streamlit_authenticator'
-    ],
+    hiddenimports=hiddenimports,
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=[
+        # Dependencias opcionales de pandas/streamlit que la aplicación empaquetada no usa
+        'matplotlib', 'tkinter', 'PyQt5', 'PyQt6', 'PySide2', 'PySide6',
+        'notebook', 'jupyter', 'jupyter_client', 'jupyterlab', 'IPython', 'ipykernel',
+        'scipy', 'sklearn', 'sympy', 'botocore', 'boto3',
+        # pandas lee de sqlite3 directamente; SQLAlchemy solo lo usa el backend PostgreSQL
+        'sqlalchemy', 'greenlet',
+        # Suites de tests y módulos de la biblioteca estándar sin uso
+        'pytest', 'numpy.tests', 'pandas.tests', 'pandas.plotting._matplotlib',
+        'tornado.test', 'lib2to3', 'curses', 'distutils.tests', 'test', 'unittest.test'
+    ],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -47,7 +65,8 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    upx=use_upx,
+    upx_exclude=upx_exclude,
     console=True,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -62,7 +81,7 @@ coll = COLLECT(
     a.zipfiles,
     a.datas,
     strip=False,
-    upx=True,
-    upx_exclude=[],
+    upx=use_upx,
+    upx_exclude=upx_exclude,
     name='Gestion_Flota_Vehicular',
 )
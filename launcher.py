@@ -4,8 +4,12 @@ import sqlite3
 import traceback
 import webbrowser
 import time
+import shutil
 from pathlib import Path
 
+# Directorio del lanzador, resuelto una sola vez al importar
+HERE = Path(__file__).resolve().parent
+
 def main():
     try:
         print("Iniciando aplicación de Gestión de Flota Vehicular...")
@@ -17,31 +21,29 @@ def main():
         os.environ['STREAMLIT_SERVER_ADDRESS'] = "localhost"
         
         # Crear directorio de datos si no existe
-        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
-        os.makedirs(data_dir, exist_ok=True)
+        data_dir = HERE / "data"
+        data_dir.mkdir(exist_ok=True)
         print(f"Directorio de datos creado en: {data_dir}")
         
         # Ruta a la base de datos SQLite
-        db_path = os.path.join(data_dir, "flota_vehicular.db")
-        os.environ['DATABASE_FILE'] = db_path
+        db_path = data_dir / "flota_vehicular.db"
+        os.environ['DATABASE_FILE'] = str(db_path)
         print(f"Base de datos configurada en: {db_path}")
         
         # Copiar config.yaml si no existe
-        config_dir = os.path.dirname(os.path.abspath(__file__))
-        config_path = os.path.join(config_dir, "config.yaml")
+        config_path = HERE / "config.yaml"
         
-        if not os.path.exists(config_path):
-            assets_config = os.path.join(config_dir, "standalone_assets", "config.yaml")
-            if os.path.exists(assets_config):
-                import shutil
+        if not config_path.exists():
+            assets_config = HERE / "standalone_assets" / "config.yaml"
+            if assets_config.exists():
                 shutil.copy(assets_config, config_path)
                 print(f"Archivo de configuración copiado de: {assets_config} a {config_path}")
             else:
                 print(f"ADVERTENCIA: No se encontró el archivo de configuración en: {assets_config}")
         
         # Obtener la ruta al script app.py
-        app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
-        if not os.path.exists(app_path):
+        app_path = HERE / "app.py"
+        if not app_path.exists():
             print(f"ERROR: No se encontró el archivo app.py en: {app_path}")
             input("Presione Enter para salir...")
             return
@@ -62,7 +64,7 @@ def main():
         # Iniciar Streamlit
         print("Iniciando servidor Streamlit...")
         import streamlit.web.cli as stcli
-        sys.argv = ["streamlit", "run", app_path]
+        sys.argv = ["streamlit", "run", str(app_path)]
         stcli.main()
         
     except Exception as e:
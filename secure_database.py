@@ -7,10 +7,13 @@ import json
 import base64
 import re
 import sqlite3
+import threading
 import traceback
 from io import StringIO, BytesIO
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import QueuePool
 from datetime import datetime, timedelta
+from functools import lru_cache
 from logger import get_logger, log_exception
 from validators import sanitizar_input, validar_patente, validar_entero_positivo, validar_fecha
 from cache_manager import cached
@@ -22,29 +25,68 @@ logger = get_logger('database')
 USE_POSTGRES = "DATABASE_URL" in os.environ
 DATABASE_URL = os.environ.get("DATABASE_URL", "")
 
-# Importar psycopg2 solo si estamos usando PostgreSQL
+# Importar psycopg solo si estamos usando PostgreSQL
 if USE_POSTGRES:
     try:
-        import psycopg2
-        from psycopg2.extras import RealDictCursor
+        import psycopg
+        from psycopg.rows import dict_row
         logger.info("Usando PostgreSQL como base de datos")
     except ImportError:
-        logger.error("Error al importar psycopg2, revise que esté instalado correctamente")
+        logger.error("Error al importar psycopg, revise que esté instalado correctamente")
 else:
     # Si no hay PostgreSQL, usamos la versión SQLite (standalone)
     logger.info("DATABASE_URL no encontrada, usando SQLite en modo standalone")
 
+# Pool de conexiones de PostgreSQL, compartido por todas las funciones del módulo
+POOL_SIZE = 10
+POOL_MAX_OVERFLOW = 5
+POOL_RECYCLE = 60  # Segundos antes de reemplazar una conexión del pool
+
+# Ejecuciones de una misma consulta tras las que psycopg la prepara en el servidor
+# (None lo desactiva: necesario con PgBouncer anterior a 1.22 en modo transaction)
+PREPARE_THRESHOLD = 3
+
+# Configuración de cada conexión SQLite: WAL (las lecturas no bloquean la escritura), un
+# fsync por checkpoint en lugar de por commit, temporales en memoria, mmap de 256 MB y
+# ~20 MB de caché de páginas
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-20000",
+)
+
+# Engine único por proceso; se crea en el primer uso
+_engine = None
+_engine_lock = threading.Lock()
+
 def get_database_path():
     """Get the path to the SQLite database file."""
     data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
     os.makedirs(data_dir, exist_ok=True)
     return os.path.join(data_dir, "flota_vehicular.db")
 
+# Índices para las consultas por vehículo (ordenadas por fecha) y el rango de fechas de las
+# estadísticas; la sintaxis sirve tanto para PostgreSQL como para SQLite
+_INDEX_STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS idx_hs_patente_fecha ON historial_service(patente, fecha DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_hs_fecha ON historial_service(fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_inc_patente_estado_fecha ON incidentes(patente, estado, fecha DESC, id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_prog_patente ON programacion_mantenimiento(patente)",
+]
+
+# Texto en el que busca load_vehicles; es la misma expresión del índice trigram de
+# PostgreSQL, así el planificador lo usa para los ILIKE '%término%'
+_VEHICLE_SEARCH_EXPR = (
+    "(patente || ' ' || coalesce(area, '') || ' ' || coalesce(marca, '') || ' ' || coalesce(modelo, ''))"
+)
+
 def init_database():
     """Initialize the database and create tables if they don't exist."""
     try:
         if USE_POSTGRES:
-            conn = psycopg2.connect(DATABASE_URL)
+            conn = psycopg.connect(DATABASE_URL, prepare_threshold=PREPARE_THRESHOLD)
             cursor = conn.cursor()
             
             # Crear tabla de vehículos
@@ -110,6 +152,22 @@ def init_database():
                 )
             ''')
             
+            # Crear índices
+            for statement in _INDEX_STATEMENTS:
+                cursor.execute(statement)
+            
+            # Índice trigram para la búsqueda por subcadena; si el usuario no puede crear la
+            # extensión se sigue sin él (el savepoint evita abortar el resto de la inicialización)
+            try:
+                with conn.transaction():
+                    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                    cursor.execute(
+                        "CREATE INDEX IF NOT EXISTS idx_vehiculos_busqueda_trgm ON vehiculos "
+                        f"USING gin ({_VEHICLE_SEARCH_EXPR} gin_trgm_ops)"
+                    )
+            except psycopg.Error as e:
+                logger.warning(f"No se pudo crear el índice trigram de búsqueda: {e}")
+            
             conn.commit()
             conn.close()
             logger.info("Base de datos PostgreSQL inicializada correctamente")
@@ -183,6 +241,10 @@ def init_database():
                 )
             ''')
             
+            # Crear índices
+            for statement in _INDEX_STATEMENTS:
+                cursor.execute(statement)
+            
             conn.commit()
             conn.close()
             logger.info(f"Base de datos SQLite inicializada correctamente en {db_path}")
@@ -193,29 +255,58 @@ def init_database():
         return False
 
 def get_connection():
-    """Get a database connection."""
+    """Get a database connection from the shared pool; close() returns it to the pool."""
     try:
-        if USE_POSTGRES:
-            conn = psycopg2.connect(DATABASE_URL)
-            return conn
-        else:
-            db_path = get_database_path()
-            conn = sqlite3.connect(db_path)
+        conn = get_sqlalchemy_engine().raw_connection()
+        if not USE_POSTGRES:
             # Configurar SQLite para devolver filas como diccionarios
-            conn.row_factory = sqlite3.Row
-            return conn
+            conn.dbapi_connection.row_factory = sqlite3.Row
+        return conn
     except Exception as e:
         log_exception(logger, e, "Error al obtener conexión a la base de datos")
         raise
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply SQLITE_PRAGMAS once to each new pooled SQLite connection."""
+    for pragma in SQLITE_PRAGMAS:
+        dbapi_connection.execute(pragma)
+
+def _reset_row_factory(dbapi_connection, connection_record):
+    """Restore plain tuples on SQLite connections returned to the pool, for pd.read_sql."""
+    dbapi_connection.row_factory = None
+
+def _sqlalchemy_url():
+    """Build the SQLAlchemy URL for DATABASE_URL using the psycopg (v3) driver."""
+    for prefix in ('postgresql://', 'postgres://'):
+        if DATABASE_URL.startswith(prefix):
+            return 'postgresql+psycopg://' + DATABASE_URL[len(prefix):]
+    return DATABASE_URL
+
 def get_sqlalchemy_engine():
-    """Get a SQLAlchemy engine."""
+    """Get the shared SQLAlchemy engine, creating it on first use."""
+    global _engine
     try:
-        if USE_POSTGRES:
-            return create_engine(DATABASE_URL)
-        else:
-            db_path = get_database_path()
-            return create_engine(f"sqlite:///{db_path}")
+        if _engine is None:
+            with _engine_lock:
+                if _engine is None:
+                    if USE_POSTGRES:
+                        _engine = create_engine(
+                            _sqlalchemy_url(),
+                            connect_args={'prepare_threshold': PREPARE_THRESHOLD},
+                            poolclass=QueuePool,
+                            pool_size=POOL_SIZE,
+                            max_overflow=POOL_MAX_OVERFLOW,
+                            pool_pre_ping=False,
+                            pool_recycle=POOL_RECYCLE
+                        )
+                    else:
+                        db_path = get_database_path()
+                        engine = create_engine(f"sqlite:///{db_path}",
+                                               connect_args={'check_same_thread': False})
+                        event.listen(engine, 'connect', _set_sqlite_pragmas)
+                        event.listen(engine, 'checkin', _reset_row_factory)
+                        _engine = engine
+        return _engine
     except Exception as e:
         log_exception(logger, e, "Error al crear engine de SQLAlchemy")
         raise
@@ -246,11 +337,10 @@ def load_vehicles(search_term=None):
             # Usando parámetros con SQLAlchemy para prevenir inyección SQL
             like_term = f"%{search_term}%"
             if USE_POSTGRES:
-                query += " WHERE patente ILIKE :term OR area ILIKE :term OR marca ILIKE :term OR modelo ILIKE :term"
-                vehicles = pd.read_sql(text(query), engine, params={"term": like_term})
+                query += f" WHERE {_VEHICLE_SEARCH_EXPR} ILIKE :term"
             else:
-                query += " WHERE patente LIKE :term OR area LIKE :term OR marca LIKE :term OR modelo LIKE :term"
-                vehicles = pd.read_sql(text(query), engine, params={"term": like_term})
+                query += f" WHERE {_VEHICLE_SEARCH_EXPR} LIKE :term"
+            vehicles = pd.read_sql(text(query), engine, params={"term": like_term})
         else:
             vehicles = pd.read_sql(query, engine)
         
@@ -381,6 +471,17 @@ def add_vehicle(patente, area, tipo, marca, modelo, año, estado, km=0, fecha_se
         st.error(f"Error al agregar vehículo: {str(e)}")
         return False
 
+@lru_cache(maxsize=64)
+def _update_vehicle_sql(keys, placeholder):
+    """
+    Build the UPDATE statement for a given set of vehicle columns.
+    
+    Memoized per column tuple, so repeated edits of the same form reuse the
+    exact same SQL text (and with it psycopg's prepared statement).
+    """
+    set_clause = ", ".join(f"{key} = {placeholder}" for key in keys)
+    return f"UPDATE vehiculos SET {set_clause} WHERE patente = {placeholder}"
+
 def update_vehicle(patente, **kwargs):
     """
     Update vehicle information.
@@ -442,13 +543,8 @@ def update_vehicle(patente, **kwargs):
             if isinstance(value, str) and key not in ['pdf_files']:  # No sanitizar JSON de PDFs
                 kwargs[key] = sanitizar_input(value)
         
-        # Preparar la consulta de actualización
-        fields = []
-        values = []
-        
-        for key, value in kwargs.items():
-            fields.append(f"{key} = ?")
-            values.append(value)
+        # Preparar los valores de la actualización (la consulta sale de _update_vehicle_sql)
+        values = list(kwargs.values())
         
         # Añadir patente al final de los valores para la condición WHERE
         values.append(patente)
@@ -458,8 +554,6 @@ def update_vehicle(patente, **kwargs):
         
         # Verificar si existe el vehículo
         if USE_POSTGRES:
-            # Adaptar campos para PostgreSQL
-            fields = [f.replace('?', '%s') for f in fields]
             cursor.execute("SELECT patente FROM vehiculos WHERE patente = %s", (patente,))
         else:
             cursor.execute("SELECT patente FROM vehiculos WHERE patente = ?", (patente,))
@@ -471,11 +565,7 @@ def update_vehicle(patente, **kwargs):
             return False
         
         # Ejecutar la actualización
-        query = f"UPDATE vehiculos SET {', '.join(fields)} WHERE patente = ?"
-        
-        if USE_POSTGRES:
-            query = query.replace('?', '%s')
-        
+        query = _update_vehicle_sql(tuple(kwargs), '%s' if USE_POSTGRES else '?')
         cursor.execute(query, values)
         conn.commit()
         conn.close()
@@ -596,7 +686,7 @@ def get_vehicle_by_patente(patente):
         
         if USE_POSTGRES:
             # Usar cursor con diccionario para PostgreSQL
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor = conn.cursor(row_factory=dict_row)
             cursor.execute("SELECT * FROM vehiculos WHERE patente = %s", (patente,))
         else:
             cursor = conn.cursor()
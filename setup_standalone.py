@@ -2,6 +2,7 @@ import os
 import shutil
 import sys
 import streamlit as st
+from build_exe import write_if_changed
 
 def setup_standalone_files():
     """
@@ -20,12 +21,17 @@ def setup_standalone_files():
         "auth.py", 
         "config.yaml",
         "build_exe.py",
-        "send_message.py"
+        "send_message.py",
+        "templates"         # Plantillas que build_exe.py renderiza
     ]
     
     for file in files_to_copy:
-        if os.path.exists(file):
-            shutil.copy(file, os.path.join(standalone_dir, file))
+        if os.path.isdir(file):
+            shutil.copytree(file, os.path.join(standalone_dir, file), dirs_exist_ok=True)
+            print(f"Copiado: {file}/")
+        elif os.path.exists(file):
+            # copy2 conserva la fecha de modificación del original
+            shutil.copy2(file, os.path.join(standalone_dir, file))
             print(f"Copiado: {file}")
         else:
             print(f"Advertencia: No se encontró {file}")
@@ -35,11 +41,10 @@ def setup_standalone_files():
         print("Creando archivo de base de datos para versión standalone...")
         
         # Ya se ha creado en build_exe.py, así que solo lo copiamos
-        with open("database_standalone.py", "r") as source_file:
+        with open("database_standalone.py", "r", encoding="utf-8") as source_file:
             database_content = source_file.read()
         
-        with open(os.path.join(standalone_dir, "database.py"), "w") as target_file:
-            target_file.write(database_content)
+        if write_if_changed(os.path.join(standalone_dir, "database.py"), database_content):
             print("Archivo database.py creado para modo standalone (SQLite)")
     
     # Crear directorio .streamlit si no existe
@@ -60,8 +65,7 @@ textColor = "#262730"
 font = "sans serif"
 """
     
-    with open(os.path.join(streamlit_dir, "config.toml"), "w") as f:
-        f.write(config_content)
+    if write_if_changed(os.path.join(streamlit_dir, "config.toml"), config_content):
         print("Archivo de configuración .streamlit/config.toml creado")
     
     # Crear un script de inicio simple para usuarios
@@ -70,8 +74,7 @@ echo Iniciando Gestión de Flota Vehicular...
 start "" "Gestion_Flota_Vehicular\\Gestion_Flota_Vehicular.exe"
 """
     
-    with open(os.path.join(standalone_dir, "iniciar_aplicacion.bat"), "w") as f:
-        f.write(startup_bat)
+    if write_if_changed(os.path.join(standalone_dir, "iniciar_aplicacion.bat"), startup_bat):
         print("Script de inicio iniciar_aplicacion.bat creado")
     
     # Crear un archivo README para instrucciones
@@ -105,8 +108,7 @@ dentro del directorio de la aplicación.
 Para realizar copias de seguridad, simplemente copie el archivo "flota_vehicular.db" de la carpeta "data".
 """
     
-    with open(os.path.join(standalone_dir, "README.md"), "w") as f:
-        f.write(readme_content)
+    if write_if_changed(os.path.join(standalone_dir, "README.md"), readme_content):
         print("Archivo README.md creado con instrucciones")
     
     print("\nConfiguración completada con éxito!")